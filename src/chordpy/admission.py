@@ -0,0 +1,371 @@
+import json
+import select
+import selectors
+import socket
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Final, Iterator, List, Optional, Tuple
+
+from protocol import END, KIND_MASK, Connection
+from logger import logger
+
+
+DEFAULT_WORKERS: Final[int] = 64
+DEFAULT_PRIORITY_WORKERS: Final[int] = 8
+DEFAULT_QUEUE_SIZE: Final[int] = 1024
+HEADER_TIMEOUT: Final[float] = 5.0
+RETRY_AFTER: Final[float] = 0.05
+OVERLOAD_RETRIES: Final[int] = 4
+
+# Requests that keep the ring itself healthy; they skip the queue of key reads
+# and writes and have workers of their own
+PRIORITY_REQUESTS: Final[frozenset[str]] = frozenset(
+    {
+        "GET_NEXT",
+        "SET_NEXT",
+        "GET_PREV",
+        "SET_PREV",
+        "FIND_SUCCESSOR",
+        "NOTIFY",
+        "JOIN",
+        "GET_ID",
+        "GET_STATE",
+        "GET_LOAD",
+        "PROFILE",
+    }
+)
+
+Process = Callable[[Dict, Optional[Iterator[bytes]]], Dict]
+Serve = Callable[[Connection, Dict, Optional[Iterator[bytes]], Process], None]
+
+
+class OverloadedError(RuntimeError):
+    def __init__(self, message: str, retry_after: float = RETRY_AFTER) -> None:
+        super().__init__(message)
+        self.retry_after: float = retry_after
+
+
+class _Client:
+    def __init__(
+        self, connection: Connection, addr: Any, process: Process, priority: bool
+    ) -> None:
+        self.connection: Connection = connection
+        self.addr: Any = addr
+        self.process: Process = process
+        self.priority: bool = priority
+        # Set while a request header or a refused body is partly read
+        self.deadline: Optional[float] = None
+        self.discarding: bool = False
+
+
+Job = Tuple[_Client, Dict, Optional[Iterator[bytes]]]
+
+# The pool and lane of the worker running on this thread, if any
+_worker = threading.local()
+
+
+# A worker that waits on another node hands its slot to a stand-in until the
+# answer comes back: nodes whose workers all forward to each other would
+# otherwise wait on requests queued behind their own for good
+@contextmanager
+def waiting_on_peer() -> Iterator[None]:
+    pool: Optional[RequestPool] = getattr(_worker, "pool", None)
+    if pool is None:
+        yield
+        return
+    priority_only: bool = _worker.priority_only
+    pool._wait_on_peer(priority_only)
+    try:
+        yield
+    finally:
+        pool._peer_answered(priority_only)
+
+
+# Serves requests with a fixed set of threads. Idle connections wait in a
+# selector instead of holding a thread; the dispatcher reads request headers
+# as they arrive without blocking, then queues each request in its lane, or
+# refuses it with an "overloaded" error when the lane is full so the client
+# can back off and retry.
+class RequestPool:
+    def __init__(
+        self,
+        serve: Serve,
+        workers: int = DEFAULT_WORKERS,
+        priority_workers: int = DEFAULT_PRIORITY_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        self._serve: Serve = serve
+        self._queue_size: int = queue_size
+        # Threads per lane, and how many of them wait on another node; stand-ins
+        # for waiting workers are bounded like the queue
+        self._limits: Dict[bool, int] = {True: priority_workers, False: workers}
+        self._threads: Dict[bool, int] = {True: 0, False: 0}
+        self._waiting: Dict[bool, int] = {True: 0, False: 0}
+        self._priority: Deque[Job] = deque()
+        self._normal: Deque[Job] = deque()
+        # Priority workers wait apart so that a normal job never wakes one of
+        # them in place of a worker that could take it
+        lock = threading.Lock()
+        self._ready: threading.Condition = threading.Condition(lock)
+        self._priority_ready: threading.Condition = threading.Condition(lock)
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._returned: List[_Client] = []
+        self._returned_lock: threading.Lock = threading.Lock()
+        self._wakeup, self._waker = socket.socketpair()
+        self._running: bool = False
+        self._start_lock: threading.Lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._running:
+                return
+            self._running = True
+            self._wakeup.setblocking(False)
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self._wakeup, selectors.EVENT_READ)
+
+            threading.Thread(target=self._dispatch_loop, daemon=True).start()
+            for priority_only, limit in self._limits.items():
+                self._threads[priority_only] = limit
+                for _ in range(limit):
+                    self._spawn(priority_only)
+
+    def _spawn(self, priority_only: bool) -> None:
+        threading.Thread(
+            target=self._work_loop, args=(priority_only,), daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        with self._start_lock:
+            if not self._running:
+                return
+            self._running = False
+        with self._ready:
+            pending = list(self._priority) + list(self._normal)
+            self._priority.clear()
+            self._normal.clear()
+            self._ready.notify_all()
+            self._priority_ready.notify_all()
+        for client, _, _ in pending:
+            client.connection.close()
+        self._waker.send(b"\0")
+
+    # Connections from other processes of this node, or otherwise trusted to
+    # be short, can be put entirely in the priority lane
+    def add(
+        self,
+        client_socket: socket.socket,
+        addr: Any,
+        process: Process,
+        compression: bool,
+        priority: bool = False,
+    ) -> None:
+        if not self._running:
+            # Accepted by a listener that was closed while blocked in accept
+            client_socket.close()
+            return
+        connection = Connection(client_socket, compression)
+        client = _Client(connection, addr, process, priority)
+        # Most clients send their request right after connecting; skip the
+        # trip through the selector when it is already here
+        readable, _, _ = select.select([client_socket], [], [], 0)
+        if readable:
+            self._read(client)
+        else:
+            self._park(client)
+
+    def _park(self, client: _Client) -> None:
+        if not self._running:
+            client.connection.close()
+            return
+        # The selector belongs to the dispatcher thread, so hand it over
+        with self._returned_lock:
+            self._returned.append(client)
+        self._waker.send(b"\0")
+
+    def _dispatch_loop(self) -> None:
+        selector = self._selector
+        assert selector is not None
+        while self._running:
+            for key, _ in selector.select(HEADER_TIMEOUT):
+                if key.fileobj is self._wakeup:
+                    self._register_returned(selector)
+                    continue
+                selector.unregister(key.fileobj)
+                self._read(key.data)
+            self._expire(selector)
+
+        for key in list(selector.get_map().values()):
+            if key.data is not None:
+                key.data.connection.close()
+        selector.close()
+
+    def _register_returned(self, selector: selectors.BaseSelector) -> None:
+        try:
+            while self._wakeup.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._returned_lock:
+            returned, self._returned = self._returned, []
+        for client in returned:
+            try:
+                selector.register(
+                    client.connection.socket, selectors.EVENT_READ, client
+                )
+            except (OSError, ValueError):
+                client.connection.close()
+
+    def _expire(self, selector: selectors.BaseSelector) -> None:
+        # Clients that stall halfway through a header or a refused body
+        now = time.monotonic()
+        for key in list(selector.get_map().values()):
+            client = key.data
+            if client is not None and client.deadline is not None:
+                if now > client.deadline:
+                    logger.error(f"Timed out reading request from {client.addr}")
+                    selector.unregister(key.fileobj)
+                    client.connection.close()
+
+    # For a client whose socket is readable, so the read does not block
+    def _read(self, client: _Client) -> None:
+        try:
+            if not client.connection.fill():
+                client.connection.close()
+                return
+        except OSError as e:
+            logger.error(f"Error reading request from {client.addr}: {e}")
+            client.connection.close()
+            return
+        self._process(client)
+
+    # Admits what has been read ahead, and waits in the selector for the rest
+    def _process(self, client: _Client) -> None:
+        connection = client.connection
+        try:
+            while True:
+                if client.discarding:
+                    self._discard(client)
+                    if client.discarding:
+                        break
+                if connection.buffered_frame() is None:
+                    break
+                if self._admit(client):
+                    return
+        except Exception as e:
+            logger.error(f"Error reading request from {client.addr}: {e}")
+            connection.close()
+            return
+
+        if not client.discarding and not connection.buffered:
+            client.deadline = None
+        elif client.deadline is None:
+            client.deadline = time.monotonic() + HEADER_TIMEOUT
+        self._park(client)
+
+    # Queues a request whose header has been read ahead; False if refused
+    def _admit(self, client: _Client) -> bool:
+        request, body = client.connection.recv()
+        assert request is not None
+        request["received"] = time.perf_counter()
+        client.deadline = None
+
+        priority = client.priority or request.get("type") in PRIORITY_REQUESTS
+        lane = self._priority if priority else self._normal
+        with self._ready:
+            if len(lane) < self._queue_size:
+                lane.append((client, request, body))
+                if priority:
+                    self._priority_ready.notify()
+                self._ready.notify()
+                return True
+
+        logger.warning(f"Refusing {request.get('type')} from {client.addr}: overloaded")
+        if body is None:
+            self._refuse(client)
+        else:
+            # Answered once the body is dropped, so that the connection is
+            # left at a frame boundary for the next request
+            client.discarding = True
+        return False
+
+    def _discard(self, client: _Client) -> None:
+        connection = client.connection
+        while True:
+            flags = connection.buffered_frame()
+            if flags is None:
+                return
+            connection.drop_frame()
+            if flags & KIND_MASK == END:
+                client.discarding = False
+                self._refuse(client)
+                return
+
+    @staticmethod
+    def _refuse(client: _Client) -> None:
+        response = {"error": "overloaded", "retry_after": RETRY_AFTER}
+        client.connection.send(json.dumps(response))
+
+    def _wait_on_peer(self, priority_only: bool) -> None:
+        with self._ready:
+            self._waiting[priority_only] += 1
+            working = self._threads[priority_only] - self._waiting[priority_only]
+            stand_ins = sum(self._threads.values()) - sum(self._limits.values())
+            stand_in = (
+                self._running
+                and working < self._limits[priority_only]
+                and stand_ins < self._queue_size
+            )
+            if stand_in:
+                self._threads[priority_only] += 1
+        if stand_in:
+            self._spawn(priority_only)
+
+    def _peer_answered(self, priority_only: bool) -> None:
+        with self._ready:
+            self._waiting[priority_only] -= 1
+            # An idle stand-in can go now; a busy one goes after its job
+            if self._surplus(priority_only):
+                (self._priority_ready if priority_only else self._ready).notify()
+
+    def _surplus(self, priority_only: bool) -> bool:
+        working = self._threads[priority_only] - self._waiting[priority_only]
+        return working > self._limits[priority_only]
+
+    def _next_job(self, priority_only: bool) -> Optional[Job]:
+        with self._ready:
+            while self._running:
+                if self._surplus(priority_only):
+                    self._threads[priority_only] -= 1
+                    return None
+                if self._priority:
+                    return self._priority.popleft()
+                if self._normal and not priority_only:
+                    return self._normal.popleft()
+                (self._priority_ready if priority_only else self._ready).wait()
+        return None
+
+    def _work_loop(self, priority_only: bool) -> None:
+        _worker.pool = self
+        _worker.priority_only = priority_only
+        while True:
+            job = self._next_job(priority_only)
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        client, request, body = job
+        try:
+            self._serve(client.connection, request, body, client.process)
+        except Exception as e:
+            logger.error(f"Error handling client {client.addr}: {e}")
+            client.connection.close()
+            return
+        if self._running:
+            self._process(client)
+        else:
+            client.connection.close()
@@ -0,0 +1,291 @@
+import asyncio
+import bisect
+import json
+import random
+import zlib
+
+from typing import Any, Dict, Final, List, Optional, Sequence, Tuple
+
+from address import Address
+from admission import OVERLOAD_RETRIES, RETRY_AFTER, OverloadedError
+from bulk import MAX_RING_SIZE
+from message import message
+from protocol import (
+    CHUNK,
+    END,
+    FLAG_ACCEPT_ZLIB,
+    FLAG_BODY,
+    FLAG_COMPRESSED,
+    FRAME_HEADER,
+    HEADER,
+    KIND_MASK,
+    chunk_frame,
+    chunked,
+    decode_value,
+    encode_value,
+)
+from transport import local_path
+from utils import Value, hash
+from logger import logger
+
+
+DEFAULT_CONCURRENCY: Final[int] = 256
+DEFAULT_POOL_SIZE: Final[int] = 8
+
+Response = Tuple[Dict[str, Any], Optional[bytes]]
+
+
+# One open connection speaking the node protocol; it carries one request at a
+# time and is handed back to the pool afterwards
+class _Connection:
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        compress: bool,
+    ) -> None:
+        self._reader: asyncio.StreamReader = reader
+        self._writer: asyncio.StreamWriter = writer
+        self._compress: bool = compress
+
+    async def request(self, header: str, body: Optional[bytes]) -> Response:
+        flags = HEADER
+        if body is not None:
+            flags |= FLAG_BODY
+        if self._compress:
+            flags |= FLAG_ACCEPT_ZLIB
+        payload = header.encode()
+        self._writer.write(FRAME_HEADER.pack(flags, len(payload)) + payload)
+        if body is not None:
+            for chunk in chunked(body):
+                flags, payload = chunk_frame(chunk, self._compress)
+                self._writer.write(FRAME_HEADER.pack(flags, len(payload)))
+                self._writer.write(payload)
+            self._writer.write(FRAME_HEADER.pack(END, 0))
+        await self._writer.drain()
+
+        flags, payload = await self._read_frame()
+        if flags & KIND_MASK != HEADER:
+            raise ValueError("Expected a header frame")
+        response = json.loads(payload)
+        if not flags & FLAG_BODY:
+            return response, None
+
+        parts: List[bytes] = []
+        while True:
+            flags, payload = await self._read_frame()
+            kind = flags & KIND_MASK
+            if kind == END:
+                return response, b"".join(parts)
+            if kind != CHUNK:
+                raise ValueError("Expected a chunk frame")
+            if flags & FLAG_COMPRESSED:
+                payload = zlib.decompress(payload)
+            parts.append(payload)
+
+    async def _read_frame(self) -> Tuple[int, bytes]:
+        head = await self._reader.readexactly(FRAME_HEADER.size)
+        flags, length = FRAME_HEADER.unpack(head)
+        payload = await self._reader.readexactly(length) if length else b""
+        return flags, payload
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+# Reads and writes keys without joining the ring: it learns the ring from a
+# seed, sends each request straight to the key's owner over pooled
+# connections and caps how many requests are in flight at once
+class AsyncChordClient:
+    def __init__(
+        self,
+        seeds: Sequence[Address],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        compression: bool = False,
+        unix_socket: bool = True,
+    ) -> None:
+        if not seeds:
+            raise ValueError("At least one seed node is required")
+        self._seeds: List[Address] = list(seeds)
+        self._slots: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+        self._pool_size: int = pool_size
+        self._compression: bool = compression
+        self._unix_socket: bool = unix_socket
+        self._idle: Dict[Address, List[_Connection]] = {}
+        self._ids: List[int] = []
+        self._owners: List[Address] = []
+        self._refreshing: Optional[asyncio.Future] = None
+
+    async def __aenter__(self) -> "AsyncChordClient":
+        await self.refresh()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    @property
+    def ring(self) -> List[Tuple[int, Address]]:
+        return list(zip(self._ids, self._owners))
+
+    async def get(self, key: str) -> Optional[Value]:
+        response, body = await self._routed(key, "LOOKUP", None, key=key)
+        if not self._checked(response)["found"]:
+            return None
+        return decode_value(response["value_type"], body or b"")
+
+    async def put(self, key: str, value: Value, ttl: Optional[float] = None) -> None:
+        value_type, data = encode_value(value)
+        response, _ = await self._routed(
+            key, "PUT", data, key=key, value_type=value_type, ttl=ttl
+        )
+        self._checked(response)
+
+    # Failures raise as they do in RemoteNode; a missing key is not one
+    @staticmethod
+    def _checked(response: Dict[str, Any]) -> Dict[str, Any]:
+        if response.get("success") is False:
+            raise ValueError(response["message"])
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    async def refresh(self) -> None:
+        # Concurrent callers that hit a stale ring share a single crawl
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._learn_ring())
+        await self._refreshing
+
+    async def close(self) -> None:
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+    def _owner(self, key: str) -> Address:
+        index = bisect.bisect_left(self._ids, hash(key)) % len(self._ids)
+        return self._owners[index]
+
+    async def _routed(
+        self, key: str, type: str, body: Optional[bytes], /, **params: Any
+    ) -> Response:
+        async with self._slots:
+            if not self._ids:
+                await self.refresh()
+            owner = self._owner(key)
+            try:
+                return await self._call(owner, type, body, **params)
+            except Exception as e:
+                # The owner may have left the ring; learn it again and retry once
+                logger.warning(f"{type} for key '{key}' failed, refreshing ring: {e}")
+                await self.refresh()
+
+            if self._owner(key) != owner:
+                try:
+                    return await self._call(self._owner(key), type, body, **params)
+                except Exception as e:
+                    logger.warning(f"{type} for key '{key}' failed again: {e}")
+
+            # Successor lists can still name a departed node for a few rounds,
+            # so let the seeds route the request in the meantime
+            for seed in self._seeds[:-1]:
+                try:
+                    return await self._call(seed, type, body, **params)
+                except Exception as e:
+                    logger.warning(f"Seed {seed} could not serve {type}: {e}")
+            return await self._call(self._seeds[-1], type, body, **params)
+
+    async def _learn_ring(self) -> None:
+        for seed in self._seeds:
+            try:
+                members = await self._crawl(seed)
+            except Exception as e:
+                logger.warning(f"Could not learn the ring from {seed}: {e}")
+                continue
+            members.sort(key=lambda member: member[0])
+            self._ids = [node_id for node_id, _ in members]
+            self._owners = [address for _, address in members]
+            logger.info(f"Learned a ring of {len(members)} nodes from {seed}")
+            return
+        raise RuntimeError("No seed node is reachable")
+
+    async def _crawl(self, seed: Address) -> List[Tuple[int, Address]]:
+        # Successor lists let each round trip skip several nodes ahead
+        state, _ = await self._call(seed, "GET_STATE", None, successors=True)
+        start = state["id"]
+        members: Dict[int, Address] = {start: seed}
+        while len(members) < MAX_RING_SIZE:
+            refs = [ref for ref in state["successors"] or [state["next"]] if ref]
+            last: Optional[Address] = None
+            for ref in refs:
+                if ref["id"] == start:
+                    return list(members.items())
+                if ref["id"] not in members:
+                    last = Address(ref["address"][0], ref["address"][1])
+                    members[ref["id"]] = last
+            if last is None:
+                break
+            state, _ = await self._call(last, "GET_STATE", None, successors=True)
+        return list(members.items())
+
+    async def _call(
+        self, address: Address, type: str, body: Optional[bytes], **params: Any
+    ) -> Response:
+        # Back off while the node refuses requests for being overloaded
+        attempt = 0
+        while True:
+            response = await self._call_once(address, type, body, **params)
+            if response[0].get("error") != "overloaded":
+                return response
+            if attempt >= OVERLOAD_RETRIES:
+                raise OverloadedError(f"Node at {address} is overloaded")
+            retry_after = response[0].get("retry_after", RETRY_AFTER)
+            await asyncio.sleep(retry_after * 2**attempt * random.uniform(0.5, 1.5))
+            attempt += 1
+
+    async def _call_once(
+        self, address: Address, type: str, body: Optional[bytes], **params: Any
+    ) -> Response:
+        header = message(type, **params).to_json()
+        idle = self._idle.get(address)
+        if idle:
+            connection = idle.pop()
+            try:
+                response = await connection.request(header, body)
+            except (OSError, asyncio.IncompleteReadError):
+                # The node may have dropped an idle connection; use a fresh one
+                connection.close()
+            except BaseException:
+                connection.close()
+                raise
+            else:
+                self._release(address, connection)
+                return response
+
+        reader, writer = await self._open(address)
+        connection = _Connection(reader, writer, self._compression)
+        try:
+            response = await connection.request(header, body)
+        except BaseException:
+            connection.close()
+            raise
+        self._release(address, connection)
+        return response
+
+    async def _open(
+        self, address: Address
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        path = local_path(address) if self._unix_socket else None
+        if path is not None:
+            try:
+                return await asyncio.open_unix_connection(path)
+            except OSError as e:
+                logger.debug(f"Unix socket {path} unusable, falling back to TCP: {e}")
+        return await asyncio.open_connection(address.ip, address.port)
+
+    def _release(self, address: Address, connection: _Connection) -> None:
+        idle = self._idle.setdefault(address, [])
+        if len(idle) < self._pool_size:
+            idle.append(connection)
+        else:
+            connection.close()
@@ -0,0 +1,219 @@
+import argparse
+import json
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from address import Address
+from netem import DEFAULT_TIMEOUT, NetworkEmulator
+from node.local import LocalNode
+from node.remote import RemoteNode
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Mede um anel local sob latência, perda e partições emuladas"
+    )
+    parser.add_argument("--nodes", type=int, default=8, help="Nós do anel")
+    parser.add_argument("--base-port", type=int, default=9500, help="Porta do 1º nó")
+    parser.add_argument(
+        "--keys", type=int, default=500, help="Chaves escritas e lidas"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="Requisições simultâneas"
+    )
+    parser.add_argument(
+        "--delay", type=float, default=0.02, help="Latência de ida, em segundos"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.005,
+        help="Variação da latência, em segundos",
+    )
+    parser.add_argument(
+        "--drop", type=float, default=0.0, help="Fração das mensagens perdidas"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="Espera por uma mensagem perdida, em segundos",
+    )
+    parser.add_argument(
+        "--partition",
+        type=int,
+        default=0,
+        help="Nós isolados do restante do anel durante uma rodada extra de leituras",
+    )
+    parser.add_argument(
+        "--churn",
+        action="store_true",
+        help="Um nó sai e volta ao anel sob as condições emuladas",
+    )
+    parser.add_argument("--seed", type=int, help="Semente das perdas e da variação")
+    parser.add_argument("--output", help="Grava o relatório em JSON neste arquivo")
+    return parser.parse_args(argv)
+
+
+def run_phase(
+    network: NetworkEmulator,
+    name: str,
+    nodes: List[LocalNode],
+    workers: int,
+    operations: List[Callable[[LocalNode], Any]],
+) -> Dict[str, Any]:
+    network.reset_stats()
+    failures = 0
+    lock = threading.Lock()
+
+    def run(index: int) -> None:
+        nonlocal failures
+        node = nodes[index % len(nodes)]
+        try:
+            with network.acting_as(node.address):
+                operations[index](node)
+        except Exception:
+            with lock:
+                failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(run, range(len(operations))))
+    elapsed = time.perf_counter() - started
+
+    phase = {
+        "operations": len(operations),
+        "failures": failures,
+        "seconds": elapsed,
+        "per_second": len(operations) / elapsed if elapsed else 0.0,
+        "requests": network.report(),
+    }
+    print(
+        f"\n{name}: {len(operations)} operações em {elapsed:.2f}s "
+        f"({phase['per_second']:.1f}/s), {failures} falhas"
+    )
+    for type, stats in phase["requests"].items():
+        print(
+            f"  {type:<16} {stats['requests']:>6} req  "
+            f"timeouts {stats['timeout_rate']:6.1%}  "
+            f"p50 {stats['p50_ms']:7.1f}ms  p99 {stats['p99_ms']:7.1f}ms  "
+            f"p99.9 {stats['p999_ms']:7.1f}ms  máx {stats['max_ms']:7.1f}ms"
+        )
+    return phase
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    network = NetworkEmulator(args.timeout, args.seed)
+    # Process-wide settings, put back for whoever runs the benchmark in-process
+    unix_socket, previous_network = LocalNode.unix_socket, RemoteNode.network
+    LocalNode.unix_socket = False
+    RemoteNode.network = network
+    try:
+        nodes = [
+            LocalNode(
+                host="127.0.0.1",
+                port=args.base_port + i,
+                advertise=Address("127.0.0.1", args.base_port + i),
+            )
+            for i in range(args.nodes)
+        ]
+        for node in nodes:
+            threading.Thread(target=node.server_start, daemon=True).start()
+        try:
+            run_phases(args, network, nodes)
+        finally:
+            for node in nodes:
+                node.server_stop()
+    finally:
+        LocalNode.unix_socket = unix_socket
+        RemoteNode.network = previous_network
+    return 0
+
+
+def run_phases(
+    args: argparse.Namespace, network: NetworkEmulator, nodes: List[LocalNode]
+) -> None:
+    time.sleep(0.2)
+
+    # The ring is built over a clean network and then degraded
+    nodes[0].join()
+    for node in nodes[1:]:
+        node.join(RemoteNode(nodes[0].address))
+    for _ in range(3):
+        for node in nodes:
+            node._stabilize()
+    network.set_link(delay=args.delay, jitter=args.jitter, drop=args.drop)
+
+    keys = [f"bench-{i}" for i in range(args.keys)]
+    report: Dict[str, Any] = {}
+    report["put"] = run_phase(
+        network,
+        "Escritas",
+        nodes,
+        args.workers,
+        [lambda node, key=key: node.put(key, key) for key in keys],
+    )
+    report["get"] = run_phase(
+        network,
+        "Leituras",
+        nodes,
+        args.workers,
+        [lambda node, key=key: node.get(key, None) for key in keys],
+    )
+
+    if args.partition:
+        isolated = [node.address for node in nodes[: args.partition]]
+        rest = [node.address for node in nodes[args.partition :]]
+        network.partition(isolated, rest)
+        report["partitioned_get"] = run_phase(
+            network,
+            f"Leituras com {args.partition} nós isolados",
+            nodes,
+            args.workers,
+            [lambda node, key=key: node.get(key, None) for key in keys],
+        )
+        network.heal()
+
+    if args.churn:
+        leaving = nodes[-1]
+        steps: List[Callable[[], Any]] = [
+            leaving.exit_network,
+            lambda: leaving.join(RemoteNode(nodes[0].address)),
+        ]
+        seconds: List[float] = []
+        errors: List[str] = []
+        # A lossy network can fail either step; the run reports it and goes on
+        with network.acting_as(leaving.address):
+            for step in steps:
+                started = time.perf_counter()
+                try:
+                    step()
+                except Exception as error:
+                    errors.append(f"{type(error).__name__}: {error}")
+                seconds.append(time.perf_counter() - started)
+        report["churn"] = {
+            "operations": len(steps),
+            "failures": len(errors),
+            "errors": errors,
+            "leave_seconds": seconds[0],
+            "join_seconds": seconds[1],
+        }
+        print(
+            f"\nSaída em {seconds[0]:.2f}s, reentrada em {seconds[1]:.2f}s, "
+            f"{len(errors)} falhas"
+        )
+        for error in errors:
+            print(f"  {error}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,216 @@
+import base64
+import bisect
+import csv
+import json
+import sys
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Final, IO, Iterable, Iterator, List, Optional, Tuple
+
+from address import Address
+from node.interface import Node
+from node.remote import RemoteNode
+from utils import KEY_SPACE, Value, hash, in_interval
+from logger import logger
+
+
+DEFAULT_BATCH_SIZE: Final[int] = 1000
+DEFAULT_IN_FLIGHT: Final[int] = 8
+DEFAULT_PAGE_SIZE: Final[int] = 1000
+MAX_RING_SIZE: Final[int] = 2**16
+
+Record = Tuple[str, Value, Optional[float]]
+
+
+def ring_members(entry: Node) -> List[Node]:
+    members: List[Node] = [entry]
+    node = entry.get_state()["next"]
+    while node is not None and node != entry and len(members) < MAX_RING_SIZE:
+        members.append(node)
+        node = node.get_state()["next"]
+    return sorted(members, key=lambda member: member.id)
+
+
+def import_records(
+    entry: Node,
+    records: Iterable[Record],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_in_flight: int = DEFAULT_IN_FLIGHT,
+) -> int:
+    members = ring_members(entry)
+    ids = [member.id for member in members]
+    logger.info(f"Importing records into a ring of {len(members)} nodes")
+
+    batches: Dict[int, Tuple[Dict[str, Value], Dict[str, float]]] = {}
+    # Caps the batches held in memory or on the wire at any moment
+    slots = threading.BoundedSemaphore(max_in_flight)
+    failures: List[BaseException] = []
+    count = 0
+
+    def send(owner: Node, values: Dict[str, Value], ttls: Dict[str, float]) -> None:
+        try:
+            owner.put_batch(values, ttls)
+        except Exception as e:
+            failures.append(e)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_in_flight) as pool:
+
+        def flush(index: int) -> None:
+            values, ttls = batches.pop(index)
+            slots.acquire()
+            pool.submit(send, members[index], values, ttls)
+
+        for key, value, ttl in records:
+            if failures:
+                break
+            # The owner is the first node whose id is at or after the key hash
+            index = bisect.bisect_left(ids, hash(key)) % len(ids)
+            values, ttls = batches.setdefault(index, ({}, {}))
+            values[key] = value
+            if ttl is not None:
+                ttls[key] = ttl
+            count += 1
+            if len(values) >= batch_size:
+                flush(index)
+
+        for index in list(batches):
+            flush(index)
+
+    if failures:
+        raise RuntimeError(f"Import failed: {failures[0]}")
+    logger.info(f"Imported {count} records")
+    return count
+
+
+def export_records(entry: Node, workers: int = DEFAULT_IN_FLIGHT) -> Iterator[Record]:
+    members = ring_members(entry)
+    logger.info(f"Exporting data from a ring of {len(members)} nodes")
+
+    # Replicas hold copies of their predecessors' keys; each key is exported
+    # only by the member that owns it
+    owners = [(members[i - 1].id, member.id) for i, member in enumerate(members)]
+
+    with ThreadPoolExecutor(workers) as pool:
+        pending: List[Tuple[Future, Tuple[int, int]]] = []
+        for member, owned in zip(members, owners):
+            pending.append((pool.submit(member.snapshot), owned))
+            if len(pending) < workers:
+                continue
+            future, owned = pending.pop(0)
+            yield from _snapshot_records(future.result(), owned)
+
+        for future, owned in pending:
+            yield from _snapshot_records(future.result(), owned)
+
+
+def start_cursor(
+    entry: Node, start: int = 0, end: Optional[int] = None
+) -> Dict[str, Any]:
+    ring_size = 2**KEY_SPACE
+    start %= ring_size
+    # An end equal to the start, or no end at all, means the whole ring
+    span = (end - start) % ring_size if end is not None else 0
+    return {
+        "node": entry.find_successor(start).address.as_tuple,
+        "start": start,
+        "span": span or ring_size,
+        "offset": 0,
+        "after": None,
+    }
+
+
+def scan_page(
+    entry: Node, cursor: Dict[str, Any], page_size: int = DEFAULT_PAGE_SIZE
+) -> Tuple[Dict[str, Value], Optional[Dict[str, Any]]]:
+    address = Address(cursor["node"][0], cursor["node"][1])
+    node = entry if address == entry.address else RemoteNode(address)
+    return node.scan(cursor, page_size)
+
+
+def scan_pages(
+    entry: Node,
+    cursor: Dict[str, Any],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    prefetch: bool = True,
+) -> Iterator[Tuple[Dict[str, Value], Optional[Dict[str, Any]]]]:
+    def fetch(
+        page_cursor: Dict[str, Any],
+    ) -> Tuple[Dict[str, Value], Optional[Dict[str, Any]]]:
+        return scan_page(entry, page_cursor, page_size)
+
+    with ThreadPoolExecutor(1) as pool:
+        pending: Optional[Future] = pool.submit(fetch, cursor)
+        while pending is not None:
+            items, next_cursor = pending.result()
+            pending = None
+            if next_cursor is not None and prefetch:
+                # The next page is on its way while the caller handles this one
+                pending = pool.submit(fetch, next_cursor)
+            yield items, next_cursor
+            if next_cursor is not None and not prefetch:
+                pending = pool.submit(fetch, next_cursor)
+
+
+def _snapshot_records(
+    snapshot: Tuple[Dict[str, Value], Dict[str, float]], owned: Tuple[int, int]
+) -> Iterator[Record]:
+    data, ttls = snapshot
+    start, end = owned
+    for key, value in data.items():
+        # A single member owns the whole ring
+        if start == end or in_interval(hash(key), start, end):
+            yield key, value, ttls.get(key)
+
+
+@contextmanager
+def open_text(path: str, mode: str) -> Iterator[IO[str]]:
+    if path == "-":
+        yield sys.stdin if mode == "r" else sys.stdout
+        return
+    with open(path, mode, newline="") as file:
+        yield file
+
+
+def read_records(file: IO[str], format: str) -> Iterator[Record]:
+    if format == "csv":
+        for row in csv.reader(file):
+            if len(row) < 2 or not row[0]:
+                continue
+            ttl = float(row[2]) if len(row) > 2 and row[2] else None
+            yield row[0], row[1], ttl
+        return
+
+    for line in file:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if "value_base64" in record:
+            value: Value = base64.b64decode(record["value_base64"])
+        else:
+            value = record["value"]
+        yield record["key"], value, record.get("ttl")
+
+
+def write_records(file: IO[str], records: Iterable[Record], format: str) -> int:
+    count = 0
+    writer = csv.writer(file) if format == "csv" else None
+    for key, value, ttl in records:
+        if writer is not None:
+            if isinstance(value, bytes):
+                raise ValueError(f"Key '{key}' holds bytes, which CSV cannot represent")
+            writer.writerow([key, value, "" if ttl is None else ttl])
+        else:
+            record = {"key": key}
+            if isinstance(value, bytes):
+                record["value_base64"] = base64.b64encode(value).decode()
+            else:
+                record["value"] = value
+            if ttl is not None:
+                record["ttl"] = ttl
+            file.write(json.dumps(record) + "\n")
+        count += 1
+    return count
@@ -107,17 +107,22 @@ utilizando o formato <chave> = <valor>:\n>""")
 
             case "3":
                 key = input("\nInsira a chave a ser buscada:\n>")
-                result = chord.get(key)
+                result = chord.get(key, trace=True)
                 if result["success"]:
                     print(
                         f"{key} = {result['value']}\n(Armazenado no nó: {result['node']})"
                     )
-                    if "history" in result:
-                        print("Histórico de busca:")
-                        for entry in result["history"]:
-                            print(f" - {entry}")
-                    else:
-                        print("\nChave não encontrada.")
+                else:
+                    print("\nChave não encontrada.")
+                if result.get("trace"):
+                    print("Rota da busca:")
+                    for hop in result["trace"]:
+                        print(
+                            f" {hop['hop']}. {hop['node']} (id {hop['id']}):"
+                            f" {hop['action']}, {hop['elapsed_ms']:.2f} ms"
+                            f" (roteamento {hop['route_ms']:.2f} ms,"
+                            f" fila {hop.get('queue_ms', 0.0):.2f} ms)"
+                        )
 
                 input("\nPressione Enter para continuar...")
                 clear_screen()
@@ -172,6 +177,48 @@ utilizando o formato <chave> = <valor>:\n>""")
             case "9":
                 log()
 
+            case "10":
+                path = input("\nInsira o caminho do arquivo (.jsonl ou .csv):\n>")
+                format = "csv" if path.endswith(".csv") else "jsonl"
+                result = chord.import_file(path, format)
+                if result["success"]:
+                    print(f"{result['count']} registros importados\n")
+                else:
+                    print(f"Erro: {result['message']}\n")
+                input("Pressione Enter para continuar...")
+                clear_screen()
+
+            case "11":
+                path = input("\nInsira o caminho do arquivo (.jsonl ou .csv):\n>")
+                format = "csv" if path.endswith(".csv") else "jsonl"
+                result = chord.export_file(path, format)
+                if result["success"]:
+                    print(f"{result['count']} registros exportados\n")
+                else:
+                    print(f"Erro: {result['message']}\n")
+                input("Pressione Enter para continuar...")
+                clear_screen()
+
+            case "12":
+                path = input("\nInsira o caminho do arquivo de retrato (.jsonl):\n>")
+                result = chord.topology(path)
+                if result["success"]:
+                    print(
+                        f"{result['nodes']} nós, {len(result['unreachable'])}"
+                        f" inacessíveis, {result['inconsistent']} com roteamento"
+                        " inconsistente"
+                    )
+                    print(
+                        "Maior parcela sobre a justa:"
+                        f" chaves {result['max_keys_ratio']},"
+                        f" intervalo {result['max_width_ratio']},"
+                        f" requisições {result['max_rate_ratio']}\n"
+                    )
+                else:
+                    print(f"Erro: {result['message']}\n")
+                input("Pressione Enter para continuar...")
+                clear_screen()
+
             # Adicionado caso default para opções inválidas
             case _:
                 print("Opção inválida")
@@ -194,6 +241,9 @@ def print_menu_network() -> None:
         "7. Obter Finger Table",
         "8. Obter ID do Nó",
         "9. Ver Log",
+        "10. Importar Dados",
+        "11. Exportar Dados",
+        "12. Retrato do Anel",
         "",
     ]
     for line in entries:
@@ -0,0 +1,244 @@
+import argparse
+import json
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Tuple
+
+from address import Address
+from bulk import (
+    export_records,
+    import_records,
+    open_text,
+    read_records,
+    scan_pages,
+    start_cursor,
+    write_records,
+)
+from node.remote import RemoteNode
+from topology import DEFAULT_CRAWL_WORKERS, ring_snapshot, write_snapshot
+
+
+def parse_address(address: str) -> Address:
+    ip, port = address.rsplit(":", 1)
+    return Address(ip, int(port))
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cliente não interativo do ChordPy")
+    parser.add_argument(
+        "--node", required=True, help="Endereço IP:PORTA do nó usado como entrada"
+    )
+    parser.add_argument(
+        "--compression", action="store_true", help="Habilita compressão zlib"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    get = commands.add_parser("get", help="Busca o valor de uma chave")
+    get.add_argument("key")
+    get.add_argument("--output", help="Grava o valor bruto neste arquivo")
+    get.add_argument("-r", type=int, help="Réplicas que devem responder à leitura")
+    get.add_argument(
+        "--trace", action="store_true", help="Mostra os saltos da busca em stderr"
+    )
+
+    put = commands.add_parser("put", help="Armazena um valor")
+    put.add_argument("key")
+    put.add_argument("value", nargs="?", help="Valor; omita para usar --file")
+    put.add_argument("--file", help="Lê o valor, em bytes, deste arquivo")
+    put.add_argument("--ttl", type=float, help="Tempo de vida da chave, em segundos")
+    put.add_argument("-w", type=int, help="Réplicas que devem confirmar a escrita")
+
+    mput = commands.add_parser(
+        "mput", help="Armazena linhas <chave> = <valor> lidas da entrada padrão"
+    )
+    mput.add_argument("--ttl", type=float, help="Tempo de vida das chaves, em segundos")
+    mput.add_argument(
+        "--workers", type=int, default=8, help="Requisições simultâneas"
+    )
+
+    mget = commands.add_parser("mget", help="Busca as chaves lidas da entrada padrão")
+    mget.add_argument(
+        "--workers", type=int, default=8, help="Requisições simultâneas"
+    )
+
+    bulk_import = commands.add_parser(
+        "import", help="Importa registros de um arquivo JSONL ou CSV ('-' para stdin)"
+    )
+    bulk_import.add_argument("path")
+    bulk_import.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    bulk_import.add_argument("--batch-size", type=int, default=1000)
+    bulk_import.add_argument("--in-flight", type=int, default=8)
+
+    bulk_export = commands.add_parser(
+        "export", help="Exporta os dados de todo o anel ('-' para stdout)"
+    )
+    bulk_export.add_argument("path")
+    bulk_export.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    bulk_export.add_argument("--workers", type=int, default=8)
+
+    scan = commands.add_parser("scan", help="Percorre as chaves em ordem de hash")
+    scan.add_argument("--start", type=int, default=0, help="Hash inicial")
+    scan.add_argument("--end", type=int, help="Hash final (exclusivo)")
+    scan.add_argument("--page-size", type=int, default=1000)
+    scan.add_argument("--cursor", help="Cursor JSON para retomar uma varredura")
+
+    topology = commands.add_parser(
+        "topology",
+        help="Grava um retrato da topologia e da carga do anel ('-' para stdout)",
+    )
+    topology.add_argument("path")
+    topology.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_CRAWL_WORKERS,
+        help="Nós sondados por vez",
+    )
+
+    profile = commands.add_parser(
+        "profile", help="Liga ou desliga o profiler de um nó em execução"
+    )
+    profile.add_argument("action", choices=("start", "stop", "status"))
+    profile.add_argument(
+        "--mode",
+        choices=("sample", "cprofile"),
+        default="sample",
+        help="Amostragem de pilhas ou cProfile",
+    )
+    profile.add_argument(
+        "--interval", type=float, default=0.005, help="Intervalo entre amostras"
+    )
+    profile.add_argument("--limit", type=int, default=40, help="Linhas do relatório")
+
+    return parser.parse_args(argv)
+
+
+def read_pairs(lines: Iterator[str]) -> Iterator[Tuple[str, str]]:
+    for line in lines:
+        line = line.rstrip("\n")
+        if " = " not in line:
+            continue
+        key, value = line.split(" = ", 1)
+        if key and value:
+            yield key, value
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    RemoteNode.compression = args.compression
+    node = RemoteNode(parse_address(args.node))
+
+    try:
+        match args.command:
+            case "get":
+                value, _, trace = node.get(
+                    args.key, [] if args.trace else None, args.r
+                )
+                if args.trace and trace is not None:
+                    for hop in trace:
+                        print(json.dumps(hop), file=sys.stderr)
+                if value == "Key not found":
+                    print(f"Chave '{args.key}' não encontrada", file=sys.stderr)
+                    return 1
+                if args.output:
+                    with open(args.output, "wb") as output:
+                        if isinstance(value, str):
+                            value = value.encode()
+                        output.write(value)
+                elif isinstance(value, bytes):
+                    sys.stdout.buffer.write(value)
+                else:
+                    print(value)
+
+            case "put":
+                if args.file:
+                    with open(args.file, "rb") as source:
+                        node.put(args.key, source.read(), args.ttl, args.w)
+                elif args.value:
+                    node.put(args.key, args.value, args.ttl, args.w)
+                else:
+                    print("Informe um valor ou --file", file=sys.stderr)
+                    return 2
+
+            case "mput":
+                with ThreadPoolExecutor(args.workers) as pool:
+                    results = pool.map(
+                        lambda pair: node.put(pair[0], pair[1], args.ttl),
+                        read_pairs(sys.stdin),
+                    )
+                    count = sum(1 for _ in results)
+                print(f"{count} chaves armazenadas", file=sys.stderr)
+
+            case "mget":
+                keys = [line.strip() for line in sys.stdin if line.strip()]
+                with ThreadPoolExecutor(args.workers) as pool:
+                    results = pool.map(lambda key: node.get(key, None), keys)
+                    for key, (value, _, _) in zip(keys, results):
+                        print(f"{key} = {value}")
+
+            case "import":
+                with open_text(args.path, "r") as source:
+                    count = import_records(
+                        node,
+                        read_records(source, args.format),
+                        args.batch_size,
+                        args.in_flight,
+                    )
+                print(f"{count} registros importados", file=sys.stderr)
+
+            case "export":
+                with open_text(args.path, "w") as target:
+                    count = write_records(
+                        target, export_records(node, args.workers), args.format
+                    )
+                print(f"{count} registros exportados", file=sys.stderr)
+
+            case "scan":
+                if args.cursor:
+                    cursor = json.loads(args.cursor)
+                else:
+                    cursor = start_cursor(node, args.start, args.end)
+                for page, next_cursor in scan_pages(node, cursor, args.page_size):
+                    for key, value in page.items():
+                        print(f"{key} = {value}")
+                    if next_cursor is not None:
+                        print(f"cursor: {json.dumps(next_cursor)}", file=sys.stderr)
+
+            case "topology":
+                snapshot = ring_snapshot(node, args.workers)
+                with open_text(args.path, "w") as target:
+                    write_snapshot(target, snapshot)
+                summary = snapshot["summary"]
+                print(
+                    f"{summary['nodes']} nós em {summary['crawl_seconds']:.2f}s,"
+                    f" {len(summary['unreachable'])} inacessíveis,"
+                    f" {summary['inconsistent']} com roteamento inconsistente",
+                    file=sys.stderr,
+                )
+                print(
+                    f"Maior parcela sobre a justa: chaves {summary['max_keys_ratio']},"
+                    f" intervalo {summary['max_width_ratio']},"
+                    f" requisições {summary['max_rate_ratio']}",
+                    file=sys.stderr,
+                )
+
+            case "profile":
+                report = node.profile(args.action, args.mode, args.interval, args.limit)
+                if "report" in report:
+                    print(report["report"])
+                elif "stacks" in report:
+                    # Collapsed stack format, ready for flame graph tools
+                    for stack, count in report["stacks"]:
+                        print(f"{stack} {count}")
+                else:
+                    print(json.dumps(report))
+
+    except (RuntimeError, TimeoutError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,74 @@
+import threading
+
+from typing import Dict, Final, Optional
+
+from address import Address
+from node.interface import Node
+from utils import Value
+from logger import logger
+
+
+DEFAULT_WINDOW: Final[float] = 0.002
+DEFAULT_MAX_BATCH: Final[int] = 256
+
+
+class _Batch:
+    def __init__(self, owner: Node) -> None:
+        self.owner: Node = owner
+        self.values: Dict[str, Value] = {}
+        self.ttls: Dict[str, float] = {}
+        self.full: threading.Event = threading.Event()
+        self.done: threading.Event = threading.Event()
+        self.error: Optional[Exception] = None
+
+
+# Merges puts headed to the same owner within a short window into one
+# PUT_BATCH. The first put of a batch sends it; every caller blocks until its
+# batch is acknowledged and sees the batch's error, if any.
+class WriteCoalescer:
+    def __init__(
+        self, window: float = DEFAULT_WINDOW, max_batch: int = DEFAULT_MAX_BATCH
+    ) -> None:
+        self._window: float = window
+        self._max_batch: int = max_batch
+        self._open: Dict[Address, _Batch] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def put(self, owner: Node, key: str, value: Value, ttl: Optional[float]) -> None:
+        with self._lock:
+            batch = self._open.get(owner.address)
+            leader = batch is None
+            if batch is None:
+                batch = self._open[owner.address] = _Batch(owner)
+            # A later put of the same key replaces the earlier one, TTL included
+            batch.values[key] = value
+            if ttl is None:
+                batch.ttls.pop(key, None)
+            else:
+                batch.ttls[key] = ttl
+            if len(batch.values) >= self._max_batch:
+                del self._open[owner.address]
+                batch.full.set()
+
+        if leader:
+            self._send(batch)
+        else:
+            batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+
+    def _send(self, batch: _Batch) -> None:
+        batch.full.wait(self._window)
+        with self._lock:
+            if self._open.get(batch.owner.address) is batch:
+                del self._open[batch.owner.address]
+
+        logger.debug(
+            f"Sending {len(batch.values)} coalesced puts to {batch.owner.address}"
+        )
+        try:
+            batch.owner.put_batch(batch.values, batch.ttls)
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
@@ -1,19 +1,67 @@
 import re
 import sys
+import threading
 from typing import Dict, Any, Optional
 
 from address import Address
+from admission import DEFAULT_QUEUE_SIZE, DEFAULT_WORKERS
+from utils import Value
 from node.local import LocalNode
 from node.remote import RemoteNode
+from node.sharded import ShardCoordinator
+from bulk import (
+    export_records,
+    import_records,
+    open_text,
+    read_records,
+    scan_page,
+    start_cursor,
+    write_records,
+)
+from storage import load_snapshot, save_snapshot
+from topology import DEFAULT_CRAWL_WORKERS, ring_snapshot, write_snapshot
+from latency import latency_tracker
+from tracing import tracer
 from logger import logger
 
 
 class ChordController:
-    def __init__(self, port: Optional[int] = 8008) -> None:
-        if port is not None:
-            self._node = LocalNode(port=port)
+    def __init__(
+        self,
+        port: Optional[int] = 8008,
+        compression: bool = False,
+        host: str = "0.0.0.0",
+        advertise: Optional[Address] = None,
+        workers: int = 1,
+        routing_hints: bool = False,
+        coalesce_window: Optional[float] = None,
+        unix_socket: bool = True,
+        replicas: int = 1,
+        read_quorum: Optional[int] = None,
+        write_quorum: Optional[int] = None,
+        trace_sample_rate: float = 0.0,
+        server_workers: int = DEFAULT_WORKERS,
+        request_queue: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        if port is None:
+            port = 8008
+        LocalNode.unix_socket = unix_socket
+        LocalNode.server_workers = server_workers
+        LocalNode.request_queue = request_queue
+        RemoteNode.unix_socket = unix_socket
+        if workers > 1:
+            self._node = ShardCoordinator(host, port, compression, advertise, workers)
         else:
-            self._node = LocalNode()
+            self._node = LocalNode(
+                host=host, port=port, compression=compression, advertise=advertise
+            )
+        RemoteNode.compression = compression
+        RemoteNode.hints = routing_hints
+        tracer.sample_rate = trace_sample_rate
+        if coalesce_window:
+            self._node.enable_write_coalescing(coalesce_window)
+        if replicas > 1:
+            self._node.enable_replication(replicas, read_quorum, write_quorum)
         logger.info(
             f"Controller initialized with node ID: {self._node.id} at {self._node.address}"
         )
@@ -30,7 +78,7 @@ class ChordController:
 
     def getLocalDict(self) -> Dict[str, Any]:
         try:
-            data = self._node._data.copy()
+            data, _ = self._node.snapshot()
             logger.info(f"Retrieved local dictionary with {len(data)} entries")
             return {"success": True, "data": data}
         except Exception as e:
@@ -57,6 +105,91 @@ class ChordController:
         self._node.server_start()
         logger.info(f"Server started at {self._node.address}")
 
+    def start_maintenance(
+        self, interval: float = 1.0, sync_interval: Optional[float] = 30.0
+    ) -> None:
+        maintenance_thread = threading.Thread(
+            target=self._node.maintenance_loop, args=(interval, sync_interval)
+        )
+        maintenance_thread.daemon = True
+        maintenance_thread.start()
+
+    def save_data(self, path: str) -> Dict[str, Any]:
+        try:
+            data, ttls = self._node.snapshot()
+            save_snapshot(path, data, ttls)
+            logger.info(f"Saved {len(data)} keys to {path}")
+            return {"success": True, "count": len(data)}
+        except Exception as e:
+            logger.error(f"Failed to save data to {path}: {e}")
+            return {"success": False, "message": str(e)}
+
+    def load_data(self, path: str) -> Dict[str, Any]:
+        try:
+            snapshot = load_snapshot(path)
+            if snapshot is None:
+                return {"success": True, "count": 0}
+
+            # Keys are routed again since the ring may have changed since the save
+            data, ttls = snapshot
+            for key, value in data.items():
+                self._node.put(key, value, ttls.get(key))
+            logger.info(f"Loaded {len(data)} keys from {path}")
+            return {"success": True, "count": len(data)}
+        except Exception as e:
+            logger.error(f"Failed to load data from {path}: {e}")
+            return {"success": False, "message": str(e)}
+
+    def import_file(
+        self, path: str, format: str = "jsonl", batch_size: int = 1000
+    ) -> Dict[str, Any]:
+        try:
+            logger.info(f"Importing {format} records from {path}")
+            with open_text(path, "r") as source:
+                count = import_records(
+                    self._node, read_records(source, format), batch_size
+                )
+            return {"success": True, "count": count}
+        except Exception as e:
+            logger.error(f"Failed to import {path}: {e}")
+            return {"success": False, "message": str(e)}
+
+    def export_file(self, path: str, format: str = "jsonl") -> Dict[str, Any]:
+        try:
+            logger.info(f"Exporting ring data to {path} as {format}")
+            with open_text(path, "w") as target:
+                count = write_records(target, export_records(self._node), format)
+            return {"success": True, "count": count}
+        except Exception as e:
+            logger.error(f"Failed to export to {path}: {e}")
+            return {"success": False, "message": str(e)}
+
+    def scan(
+        self,
+        start: int = 0,
+        end: Optional[int] = None,
+        limit: int = 1000,
+        cursor: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        try:
+            if cursor is None:
+                cursor = start_cursor(self._node, start, end)
+            items: Dict[str, Any] = {}
+            next_cursor: Optional[Dict[str, Any]] = cursor
+            # Nodes with nothing in range return empty pages, so keep walking;
+            # each page asks only for what is still missing, so the cursor
+            # resumes right after the last item returned
+            while next_cursor is not None and len(items) < limit:
+                page, next_cursor = scan_page(
+                    self._node, next_cursor, limit - len(items)
+                )
+                items.update(page)
+            logger.info(f"Scanned {len(items)} keys")
+            return {"success": True, "items": items, "cursor": next_cursor}
+        except Exception as e:
+            logger.error(f"Failed to scan: {e}")
+            return {"success": False, "message": str(e)}
+
     def get_address(self) -> str:
         address = str(self._node.address)
         logger.info(f"Retrieved node address: {address}")
@@ -88,25 +221,35 @@ class ChordController:
         self._node.join()
         logger.info("New network started successfully")
 
-    def join_network(self, address: str) -> Dict[str, Any]:
+    def join_network(self, address: str, balanced: bool = False) -> Dict[str, Any]:
         try:
             logger.info(f"Attempting to join network at {address}")
             validated_address = self.validate_address(address)
-            self._node.join(RemoteNode(validated_address))
+            self._node.join(RemoteNode(validated_address), balanced)
             logger.info(f"Successfully joined network at {validated_address}")
             return {"success": True, "message": f"Conectado à rede {validated_address}"}
         except Exception as e:
             logger.error(f"Failed to join network at {address}: {e}")
             return {"success": False, "message": str(e)}
 
-    def put(self, key: str, value: str) -> Dict[str, Any]:
+    def put(
+        self,
+        key: str,
+        value: Value,
+        ttl: Optional[float] = None,
+        w: Optional[int] = None,
+    ) -> Dict[str, Any]:
         if not key or not value:
             logger.warning("Attempted to put with empty key or value")
             return {"success": False, "message": "Chave e valor não podem ser vazios"}
 
+        if ttl is not None and ttl <= 0:
+            logger.warning(f"Attempted to put key '{key}' with non-positive TTL")
+            return {"success": False, "message": "O TTL deve ser positivo"}
+
         try:
             logger.info(f"Putting key-value pair: '{key}' = '{value}'")
-            self._node.put(key, value)
+            self._node.put(key, value, ttl, w)
             logger.info(f"Successfully stored key '{key}'")
             return {"success": True, "message": f"Chave '{key}' armazenada com sucesso"}
         except TimeoutError as e:
@@ -116,35 +259,60 @@ class ChordController:
             logger.error(f"Failed to put key '{key}': {e}")
             return {"success": False, "message": str(e)}
 
-    def get(self, key: str) -> Dict[str, Any]:
+    def get(
+        self, key: str, r: Optional[int] = None, trace: bool = False
+    ) -> Dict[str, Any]:
         if not key:
             logger.warning("Attempted to get with empty key")
             return {"success": False, "message": "A chave não pode ser vazia"}
 
         try:
             logger.info(f"Getting value for key: '{key}'")
-            value, node_address, history = self._node.get(key)
+            # Without an explicit request the tracer decides whether to trace
+            value, node_address, hops = self._node.get(key, [] if trace else None, r)
             if value and value != "Key not found":
                 logger.info(f"Key '{key}' found with value '{value}' at {node_address}")
                 node_str = str(node_address) if node_address else "Unknown"
-                return {
+                result = {
                     "success": True,
                     "key": key,
                     "value": value,
                     "node": node_str,
-                    "history": history,
                 }
             else:
                 logger.warning(f"Key '{key}' not found")
-                return {
+                result = {
                     "success": False,
                     "message": f"Chave '{key}' não encontrada",
-                    "history": history,
                 }
+            if hops is not None:
+                result["trace"] = hops
+            return result
         except Exception as e:
             logger.error(f"Error retrieving key '{key}': {e}")
             return {"success": False, "message": str(e)}
 
+    def profile(self, action: str, mode: str = "sample") -> Dict[str, Any]:
+        try:
+            report = self._node.profile(action, mode)
+            return {"success": True, "message": f"Profiler: {action}", **report}
+        except (RuntimeError, ValueError) as e:
+            logger.error(f"Profiler {action} failed: {e}")
+            return {"success": False, "message": str(e)}
+
+    def topology(
+        self, path: str, workers: int = DEFAULT_CRAWL_WORKERS
+    ) -> Dict[str, Any]:
+        try:
+            logger.info(f"Crawling the ring into {path}")
+            snapshot = ring_snapshot(self._node, workers)
+            with open_text(path, "w") as target:
+                write_snapshot(target, snapshot)
+            return {"success": True, **snapshot["summary"]}
+        except Exception as e:
+            logger.error(f"Failed to crawl the ring: {e}")
+            return {"success": False, "message": str(e)}
+
     def get_node_inf(self) -> Dict[str, Any]:
         try:
             logger.info("Retrieving complete node information")
@@ -159,7 +327,8 @@ class ChordController:
                 "finger_table": {
                     i: str(n.address) for i, n in node.finger_table.items()
                 },
-                "data": node._data.copy(),
+                "data": node.snapshot()[0],
+                "rtt": latency_tracker.snapshot(),
             }
             logger.info("Node information retrieved successfully")
             return {"success": True, "node_info": info}
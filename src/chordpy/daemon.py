@@ -0,0 +1,177 @@
+import argparse
+import select
+import signal
+import socket
+import sys
+import threading
+
+from address import Address
+from admission import DEFAULT_QUEUE_SIZE, DEFAULT_WORKERS
+from controller import ChordController
+from logger import logger
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Executa um nó ChordPy sem interface interativa"
+    )
+    parser.add_argument("--bind", default="0.0.0.0", help="IP em que o servidor escuta")
+    parser.add_argument("--port", type=int, default=8008, help="Porta do servidor")
+    parser.add_argument(
+        "--advertise", help="Endereço IP:PORTA anunciado aos outros nós"
+    )
+    parser.add_argument("--seed", help="Endereço IP:PORTA de um nó da rede existente")
+    parser.add_argument(
+        "--storage", help="Arquivo usado para persistir os dados do nó"
+    )
+    parser.add_argument(
+        "--save-interval",
+        type=float,
+        default=30.0,
+        help="Intervalo entre salvamentos, em segundos",
+    )
+    parser.add_argument(
+        "--stabilize-interval",
+        type=float,
+        default=1.0,
+        help="Intervalo de estabilização, em segundos",
+    )
+    parser.add_argument(
+        "--sync-interval",
+        type=float,
+        default=30.0,
+        help="Intervalo entre verificações anti-entropia, em segundos",
+    )
+    parser.add_argument(
+        "--replicas", type=int, default=1, help="Nós que guardam cada chave (N)"
+    )
+    parser.add_argument(
+        "--read-quorum", type=int, help="Réplicas que respondem a uma leitura (R)"
+    )
+    parser.add_argument(
+        "--write-quorum", type=int, help="Réplicas que confirmam uma escrita (W)"
+    )
+    parser.add_argument(
+        "--server-workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Threads que atendem requisições de chaves",
+    )
+    parser.add_argument(
+        "--request-queue",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help="Requisições em espera antes de o nó recusar novas por sobrecarga",
+    )
+    parser.add_argument(
+        "--trace-sample-rate",
+        type=float,
+        default=0.0,
+        help="Fração das buscas cujo caminho é registrado no log (0 a 1)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processos que dividem os dados do nó (usa SO_REUSEPORT)",
+    )
+    parser.add_argument(
+        "--balanced-join",
+        action="store_true",
+        help="Escolhe o ID para dividir o intervalo mais carregado da rede",
+    )
+    parser.add_argument(
+        "--compression", action="store_true", help="Habilita compressão zlib"
+    )
+    parser.add_argument(
+        "--coalesce-window",
+        type=float,
+        help="Agrupa escritas para o mesmo nó dentro desta janela, em segundos",
+    )
+    parser.add_argument(
+        "--no-unix-socket",
+        action="store_true",
+        help="Usa apenas TCP, mesmo entre nós na mesma máquina",
+    )
+    parser.add_argument(
+        "--routing-hints",
+        action="store_true",
+        help="Atualiza a finger table com os vizinhos informados nas respostas",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+
+    advertise = None
+    if args.advertise:
+        ip, port = args.advertise.rsplit(":", 1)
+        advertise = Address(ip, int(port))
+
+    controller = ChordController(
+        args.port,
+        compression=args.compression,
+        host=args.bind,
+        advertise=advertise,
+        workers=args.workers,
+        routing_hints=args.routing_hints,
+        coalesce_window=args.coalesce_window,
+        unix_socket=not args.no_unix_socket,
+        replicas=args.replicas,
+        read_quorum=args.read_quorum,
+        write_quorum=args.write_quorum,
+        trace_sample_rate=args.trace_sample_rate,
+        server_workers=args.server_workers,
+        request_queue=args.request_queue,
+    )
+    server_thread = threading.Thread(target=controller.start_server)
+    server_thread.daemon = True
+    server_thread.start()
+
+    if args.seed:
+        result = controller.join_network(args.seed, args.balanced_join)
+        if not result["success"]:
+            print(f"Erro: {result['message']}", file=sys.stderr)
+            return 1
+    else:
+        controller.start_network()
+
+    if args.storage:
+        result = controller.load_data(args.storage)
+        if not result["success"]:
+            print(f"Erro: {result['message']}", file=sys.stderr)
+            return 1
+
+    controller.start_maintenance(args.stabilize_interval, args.sync_interval)
+
+    # Signals only wake the loop below through a socket: setting an Event from
+    # a handler deadlocks when the signal lands while the main thread holds
+    # the Event's own lock inside wait()
+    wakeup, signalled = socket.socketpair()
+    signalled.setblocking(False)
+    signal.set_wakeup_fd(signalled.fileno())
+    signal.signal(signal.SIGTERM, lambda *_: None)
+    signal.signal(signal.SIGINT, lambda *_: None)
+    logger.info(f"Daemon running at {controller.get_address()}")
+    print(
+        f"Nó {controller.getId()} em execução em {controller.get_address()}",
+        flush=True,
+    )
+
+    while not select.select([wakeup], [], [], args.save_interval)[0]:
+        if args.storage:
+            controller.save_data(args.storage)
+
+    if args.storage:
+        controller.save_data(args.storage)
+    try:
+        controller.exit_network()
+    except Exception as e:
+        logger.error(f"Failed to leave the network cleanly: {e}")
+    controller.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
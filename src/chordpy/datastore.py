@@ -0,0 +1,97 @@
+import bisect
+
+from typing import Any, Iterable, List, Optional, Tuple
+
+from merkle import MerkleTree, Span, item_digest, range_spans
+from utils import Value, hash
+
+
+# A dict that keeps its keys sorted by hash as they are written, for scans and
+# range reads, and a Merkle tree of its contents up to date for anti-entropy.
+class DataStore(dict[str, Value]):
+    def __init__(self) -> None:
+        super().__init__()
+        self._index: List[Tuple[int, str]] = []
+        self._merkle: MerkleTree = MerkleTree()
+
+    def __setitem__(self, key: str, value: Value) -> None:
+        self._store(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self._unstore(key)
+        super().__delitem__(key)
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key in self:
+            self._unstore(key)
+        return super().pop(key, *default)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self._store(key, value)
+
+    def clear(self) -> None:
+        super().clear()
+        self._index.clear()
+        self._merkle.clear()
+
+    def _store(self, key: str, value: Value) -> None:
+        key_hash = hash(key)
+        if key in self:
+            self._merkle.toggle(key_hash, item_digest(key, self[key]))
+        else:
+            bisect.insort(self._index, (key_hash, key))
+        self._merkle.toggle(key_hash, item_digest(key, value))
+        super().__setitem__(key, value)
+
+    def _unstore(self, key: str) -> None:
+        key_hash = hash(key)
+        self._merkle.toggle(key_hash, item_digest(key, self[key]))
+        del self._index[bisect.bisect_left(self._index, (key_hash, key))]
+
+    def keys_in(self, start: int, end: int) -> List[str]:
+        # Keys whose hash lies in the ring interval (start, end]
+        index = self.hash_index()
+        keys: List[str] = []
+        for lo, hi in range_spans(start, end):
+            first = bisect.bisect_left(index, (lo,))
+            last = bisect.bisect_left(index, (hi,))
+            keys.extend(key for _, key in index[first:last])
+        return keys
+
+    def merkle_digests(self, start: int, end: int, indices: List[int]) -> List[int]:
+        # Digests of the given tree nodes, counting only keys in (start, end]
+        spans = range_spans(start, end)
+        return [
+            self._merkle.digest(index, spans, self._span_digest) for index in indices
+        ]
+
+    def _span_digest(self, span: Span) -> int:
+        index = self.hash_index()
+        result = 0
+        for i in range(bisect.bisect_left(index, (span[0],)), len(index)):
+            key_hash, key = index[i]
+            if key_hash >= span[1]:
+                break
+            result ^= item_digest(key, self[key])
+        return result
+
+    def hash_index(self) -> List[Tuple[int, str]]:
+        # Keys sorted by (hash, key)
+        return self._index
+
+    def ring_order(
+        self, position: int, after: Optional[str]
+    ) -> Iterable[Tuple[int, str]]:
+        # Walks the index clockwise from a hash position, wrapping at the top
+        index = self.hash_index()
+        if after is None:
+            start = bisect.bisect_left(index, (position,))
+        else:
+            start = bisect.bisect_right(index, (position, after))
+        for i in range(start, len(index)):
+            yield index[i]
+        for i in range(0, start):
+            if index[i][0] >= position:
+                break
+            yield index[i]
@@ -0,0 +1,36 @@
+import threading
+
+from typing import Dict, Final, Optional
+
+from address import Address
+
+
+# Requests answered by the peer itself; forwarded ones would time the whole chain
+DIRECT_REQUESTS: Final[frozenset[str]] = frozenset(
+    {"GET_ID", "GET_STATE", "GET_NEXT", "GET_PREV", "SET_NEXT", "SET_PREV", "NOTIFY"}
+)
+
+
+class LatencyTracker:
+    def __init__(self, alpha: float = 0.2) -> None:
+        self._alpha: float = alpha
+        self._rtts: Dict[Address, float] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def record(self, address: Address, seconds: float) -> None:
+        with self._lock:
+            current = self._rtts.get(address)
+            if current is None:
+                self._rtts[address] = seconds
+            else:
+                self._rtts[address] = current + self._alpha * (seconds - current)
+
+    def rtt(self, address: Address) -> Optional[float]:
+        return self._rtts.get(address)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {str(address): rtt for address, rtt in self._rtts.items()}
+
+
+latency_tracker = LatencyTracker()
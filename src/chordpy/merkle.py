@@ -0,0 +1,86 @@
+import hashlib
+
+from typing import Callable, Final, List, Tuple
+
+from utils import KEY_SPACE, Value
+
+
+LEAF_BITS: Final[int] = 10
+LEAVES: Final[int] = 2**LEAF_BITS
+LEAF_WIDTH: Final[int] = 2 ** (KEY_SPACE - LEAF_BITS)
+ROOT: Final[int] = 1
+
+Span = Tuple[int, int]
+
+
+def item_digest(key: str, value: Value) -> int:
+    tag, data = (b"s", value.encode()) if isinstance(value, str) else (b"b", value)
+    digest = hashlib.sha1(key.encode() + b"\0" + tag + data).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def range_spans(start: int, end: int) -> List[Span]:
+    # The ring interval (start, end] as half-open [lo, hi) hash spans
+    ring_size = 2**KEY_SPACE
+    if start == end:
+        return [(0, ring_size)]
+    lo, hi = (start + 1) % ring_size, (end + 1) % ring_size
+    if lo < hi:
+        return [(lo, hi)]
+    spans = [(lo, ring_size)]
+    if hi:
+        spans.append((0, hi))
+    return spans
+
+
+def node_span(index: int) -> Span:
+    # Tree nodes are heap ordered: the root is 1 and node i has children 2i, 2i+1
+    depth = index.bit_length() - 1
+    width = 2 ** (KEY_SPACE - depth)
+    lo = (index - 2**depth) * width
+    return lo, lo + width
+
+
+def clip(span: Span, spans: List[Span]) -> List[Span]:
+    return [
+        (max(span[0], lo), min(span[1], hi))
+        for lo, hi in spans
+        if max(span[0], lo) < min(span[1], hi)
+    ]
+
+
+# XOR of item digests per bucket of hashes, folded up a binary tree. XOR lets
+# a write patch its leaf and ancestors in place, and the digest of disjoint
+# stores is the XOR of their digests.
+class MerkleTree:
+    def __init__(self) -> None:
+        self._nodes: List[int] = [0] * (2 * LEAVES)
+
+    def toggle(self, key_hash: int, digest: int) -> None:
+        index = LEAVES + key_hash // LEAF_WIDTH
+        while index:
+            self._nodes[index] ^= digest
+            index //= 2
+
+    def clear(self) -> None:
+        self._nodes = [0] * (2 * LEAVES)
+
+    def digest(
+        self, index: int, spans: List[Span], partial: Callable[[Span], int]
+    ) -> int:
+        # Digest of the keys under a node whose hashes fall in spans; leaves cut
+        # by a span boundary are hashed from the keys themselves
+        span = node_span(index)
+        parts = clip(span, spans)
+        if not parts:
+            return 0
+        if parts == [span]:
+            return self._nodes[index]
+        if index >= LEAVES:
+            result = 0
+            for part in parts:
+                result ^= partial(part)
+            return result
+        return self.digest(2 * index, spans, partial) ^ self.digest(
+            2 * index + 1, spans, partial
+        )
@@ -0,0 +1,32 @@
+import threading
+import time
+
+
+# Events per second, smoothed over one-second buckets
+class RateMeter:
+    def __init__(self, alpha: float = 0.2) -> None:
+        self._alpha: float = alpha
+        self._rate: float = 0.0
+        self._count: int = 0
+        self._bucket_start: float = time.monotonic()
+        self._lock: threading.Lock = threading.Lock()
+
+    def mark(self, count: int = 1) -> None:
+        with self._lock:
+            self._roll(time.monotonic())
+            self._count += count
+
+    def rate(self) -> float:
+        with self._lock:
+            self._roll(time.monotonic())
+            return self._rate
+
+    def _roll(self, now: float) -> None:
+        elapsed = int(now - self._bucket_start)
+        if elapsed < 1:
+            return
+        self._rate += self._alpha * (self._count - self._rate)
+        # Buckets that passed without any event pull the rate towards zero
+        self._rate *= (1 - self._alpha) ** (elapsed - 1)
+        self._count = 0
+        self._bucket_start += elapsed
@@ -0,0 +1,171 @@
+import contextlib
+import random
+import socket
+import threading
+import time
+
+from collections import deque
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Final,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from address import Address
+
+
+DEFAULT_TIMEOUT: Final[float] = 1.0
+LATENCY_SAMPLES: Final[int] = 100_000
+
+Link = Tuple[Optional[Address], Optional[Address]]
+
+
+class LinkConditions:
+    def __init__(
+        self, delay: float = 0.0, jitter: float = 0.0, drop: float = 0.0
+    ) -> None:
+        self.delay: float = delay
+        self.jitter: float = jitter
+        self.drop: float = drop
+
+
+class _RequestStats:
+    def __init__(self) -> None:
+        self.requests: int = 0
+        self.timeouts: int = 0
+        self.failures: int = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+
+# Emulates a slower, lossy network under RemoteNode: every request and every
+# response crosses a link with its own delay, jitter and drop rate, and links
+# across a partition lose everything. A lost message costs the sender a full
+# timeout, as it would on a real network. Links are directed pairs of
+# addresses where None stands for any node; the sending side is the node whose
+# request is being served on the current thread, or default_source.
+class NetworkEmulator:
+    def __init__(
+        self, timeout: float = DEFAULT_TIMEOUT, seed: Optional[int] = None
+    ) -> None:
+        self.timeout: float = timeout
+        self.default_source: Optional[Address] = None
+        self._links: Dict[Link, LinkConditions] = {}
+        self._partitions: Set[Tuple[Address, Address]] = set()
+        self._random: random.Random = random.Random(seed)
+        self._local: threading.local = threading.local()
+        self._stats: Dict[str, _RequestStats] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def set_link(
+        self,
+        source: Optional[Address] = None,
+        target: Optional[Address] = None,
+        delay: float = 0.0,
+        jitter: float = 0.0,
+        drop: float = 0.0,
+    ) -> None:
+        with self._lock:
+            self._links[(source, target)] = LinkConditions(delay, jitter, drop)
+
+    def partition(self, side: Iterable[Address], other: Iterable[Address]) -> None:
+        side, other = list(side), list(other)
+        with self._lock:
+            for a in side:
+                for b in other:
+                    self._partitions.update({(a, b), (b, a)})
+
+    def heal(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._links.clear()
+            self._partitions.clear()
+            self._stats.clear()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    @contextlib.contextmanager
+    def acting_as(self, address: Address) -> Iterator[None]:
+        previous = getattr(self._local, "source", None)
+        self._local.source = address
+        try:
+            yield
+        finally:
+            self._local.source = previous
+
+    def transmit(self, target: Address, reply: bool = False) -> None:
+        source = getattr(self._local, "source", None) or self.default_source
+        if reply:
+            source, target = target, source
+        with self._lock:
+            conditions = self._conditions(source, target)
+            lost = (source, target) in self._partitions or (
+                self._random.random() < conditions.drop
+            )
+            delay = conditions.delay + self._random.uniform(
+                -conditions.jitter, conditions.jitter
+            )
+        if lost:
+            time.sleep(self.timeout)
+            raise socket.timeout(f"Message from {source} to {target} was lost")
+        if delay > 0:
+            time.sleep(delay)
+
+    # Failed requests count towards the latencies too, since their callers
+    # waited all the same
+    def record(
+        self, type: str, seconds: float, timed_out: bool = False, failed: bool = False
+    ) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(type, _RequestStats())
+            stats.requests += 1
+            stats.timeouts += timed_out
+            stats.failures += failed and not timed_out
+            stats.latencies.append(seconds)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            snapshot = [
+                (type, s.requests, s.timeouts, s.failures, list(s.latencies))
+                for type, s in sorted(self._stats.items())
+            ]
+        report: Dict[str, Dict[str, Any]] = {}
+        for type, requests, timeouts, failures, samples in snapshot:
+            latencies = sorted(samples)
+            entry: Dict[str, Any] = {
+                "requests": requests,
+                "timeouts": timeouts,
+                "failures": failures,
+                "timeout_rate": timeouts / requests if requests else 0.0,
+            }
+            for name, quantile in (("p50", 0.5), ("p99", 0.99), ("p999", 0.999)):
+                entry[f"{name}_ms"] = _quantile(latencies, quantile) * 1000
+            entry["max_ms"] = latencies[-1] * 1000 if latencies else 0.0
+            report[type] = entry
+        return report
+
+    def _conditions(
+        self, source: Optional[Address], target: Optional[Address]
+    ) -> LinkConditions:
+        for link in ((source, target), (source, None), (None, target), (None, None)):
+            conditions = self._links.get(link)
+            if conditions is not None:
+                return conditions
+        return LinkConditions()
+
+
+def _quantile(ordered: List[float], quantile: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(quantile * len(ordered)), len(ordered) - 1)]
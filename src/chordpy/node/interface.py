@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, List, Tuple
+from typing import Any, Dict, Iterable, Iterator, Optional, List, Tuple
 
 from address import Address
+from tracing import DEFAULT_REPORT_LIMIT, DEFAULT_SAMPLE_INTERVAL, Trace
+from utils import Value
 
 
 class Node(ABC):
@@ -35,20 +37,100 @@ class Node(ABC):
     def address(self) -> Address:
         pass
 
+    @abstractmethod
+    def get_state(
+        self, successors: bool = False, fingers: bool = False
+    ) -> Dict[str, Any]:
+        pass
+
     @abstractmethod
     def find_successor(self, key: int, iterations: int) -> "Node":
         pass
 
     @abstractmethod
-    def get(self, key: str, history: Optional[List[str]]) -> Tuple[str, Optional[Address], List[str]]:
+    def get(self, key: str, trace: Optional[Trace], r: Optional[int] = None) -> Tuple[Value, Optional[Address], Optional[Trace]]:
+        pass
+
+    @abstractmethod
+    def get_stream(
+        self, key: str, trace: Optional[Trace], r: Optional[int] = None
+    ) -> Tuple[Dict[str, Any], Optional[Iterator[bytes]]]:
+        pass
+
+    @abstractmethod
+    def put(
+        self,
+        key: str,
+        value: Value,
+        ttl: Optional[float] = None,
+        w: Optional[int] = None,
+    ) -> None:
+        pass
+
+    @abstractmethod
+    def put_stream(
+        self,
+        key: str,
+        value_type: str,
+        chunks: Iterable[bytes],
+        ttl: Optional[float] = None,
+        w: Optional[int] = None,
+    ) -> None:
+        pass
+
+    @abstractmethod
+    def put_batch(self, values: Dict[str, Value], ttls: Dict[str, float]) -> None:
+        pass
+
+    @abstractmethod
+    def snapshot(self) -> Tuple[Dict[str, Value], Dict[str, float]]:
+        pass
+
+    @abstractmethod
+    def scan(
+        self, cursor: Dict[str, Any], limit: int
+    ) -> Tuple[Dict[str, Value], Optional[Dict[str, Any]]]:
+        pass
+
+    @abstractmethod
+    def get_load(self) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def profile(
+        self,
+        action: str,
+        mode: str = "sample",
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+        limit: int = DEFAULT_REPORT_LIMIT,
+    ) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def replica_put(
+        self,
+        values: Dict[str, Value],
+        ttls: Dict[str, float],
+        versions: Dict[str, int],
+    ) -> None:
+        pass
+
+    @abstractmethod
+    def replica_get(self, key: str) -> Optional[Tuple[Value, int, Optional[float]]]:
+        pass
+
+    @abstractmethod
+    def read_range(
+        self, start: int, end: int
+    ) -> Tuple[Dict[str, Value], Dict[str, float], Dict[str, int]]:
         pass
 
     @abstractmethod
-    def put(self, key: str, value: str) -> None:
+    def merkle_digests(self, start: int, end: int, indices: List[int]) -> List[int]:
         pass
 
     @abstractmethod
-    def join(self, existing_node: "RemoteNode") -> None:  # type: ignore  # noqa: F821
+    def join(self, existing_node: "RemoteNode", balanced: bool = False) -> None:  # type: ignore  # noqa: F821
         pass
 
     @abstractmethod
@@ -56,7 +138,12 @@ class Node(ABC):
         pass
 
     @abstractmethod
-    def update_data(self, new_data: Dict[str, str]) -> None:
+    def update_data(
+        self,
+        new_data: Dict[str, Value],
+        ttls: Optional[Dict[str, float]] = None,
+        overwrite: bool = True,
+    ) -> None:
         pass
 
     @abstractmethod
@@ -1,33 +1,120 @@
+import contextlib
 import json
 import random
 import socket
 import threading
-
-from typing import Dict, List, Optional, Final, Tuple
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Final,
+    Tuple,
+)
 from address import Address
-from utils import hash, in_interval
+from admission import (
+    DEFAULT_PRIORITY_WORKERS,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_WORKERS,
+    RequestPool,
+    waiting_on_peer,
+)
+from coalescer import DEFAULT_MAX_BATCH, DEFAULT_WINDOW, WriteCoalescer
+from datastore import DataStore
+from protocol import (
+    Connection,
+    chunked,
+    decode_value,
+    encode_value,
+    pack_values,
+    unpack_values,
+)
+from utils import Value, hash, in_interval
 from node.interface import Node
 from node.remote import RemoteNode
+from latency import latency_tracker
+from merkle import LEAVES, ROOT, Span, clip, item_digest, node_span, range_spans
+from metrics import RateMeter
+from routing import routing_hints
 from logger import logger
+from timer_wheel import TimerWheel
+from tracing import (
+    DEFAULT_REPORT_LIMIT,
+    DEFAULT_SAMPLE_INTERVAL,
+    Trace,
+    format_trace,
+    profiler,
+    tracer,
+)
+from transport import listen_unix, remove_unix, unix_path
 
 
 KEY_SPACE: Final[int] = 16
+SUCCESSOR_LIST_SIZE: Final[int] = 4
+LOAD_SAMPLES: Final[int] = 5
+EXPIRY_BATCH_SIZE: Final[int] = 256
+MAX_REPLICAS: Final[int] = SUCCESSOR_LIST_SIZE + 1
+REPLICA_WORKERS: Final[int] = 32
+HANDOFF_WORKERS: Final[int] = 8
+HANDOFF_BATCH: Final[int] = 1000
 
 
 class LocalNode(Node):
-    def __init__(self, host: str = "0.0.0.0", port: int = 8008) -> None:
-        self._address: Address = Address(self.get_ip(), port)
+    # Also serve peers on this host through a Unix socket
+    unix_socket: bool = True
+    # Threads and queued requests allowed per node, shared by all its listeners
+    server_workers: int = DEFAULT_WORKERS
+    priority_workers: int = DEFAULT_PRIORITY_WORKERS
+    request_queue: int = DEFAULT_QUEUE_SIZE
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8008,
+        compression: bool = False,
+        advertise: Optional[Address] = None,
+    ) -> None:
+        self._address: Address = advertise or Address(self.get_ip(), port)
         self._host: Address = Address(host, port)
         self._server_socket: Optional[socket.socket] = None
+        self._unix_sockets: List[Tuple[socket.socket, str]] = []
         self._running: bool = True
-
-        self._id: Final[int] = hash(str(self._address))
-        self._data: Dict[str, str] = {}
+        self._compression: bool = compression
+        self._reuse_port: bool = False
+        self._pool: RequestPool = RequestPool(
+            self._serve_request,
+            LocalNode.server_workers,
+            LocalNode.priority_workers,
+            LocalNode.request_queue,
+        )
+
+        self._id: int = hash(str(self._address))
+        self._data: DataStore = DataStore()
+        self._expiry: Dict[str, float] = {}
+        # Versions of keys written through quorum writes; others count as 0
+        self._versions: Dict[str, int] = {}
+        self._expiry_wheel: TimerWheel = TimerWheel(self._expire_keys)
         self._prev: Optional[Node] = None
-        self._next: Optional[Node]
+        self._next: Optional[Node] = None
+        self._successors: List[Node] = []
+        # Where this node's keys went when it last left the ring
+        self._handed_to: Optional[Node] = None
 
         self._finger_table: Dict[int, Node] = {}
         self._lock: threading.Lock = threading.Lock()
+        self._request_rate: RateMeter = RateMeter()
+        self._coalescer: Optional[WriteCoalescer] = None
+        self._replicas: int = 1
+        self._read_quorum: int = 1
+        self._write_quorum: int = 1
+        self._replica_pool: Optional[ThreadPoolExecutor] = None
 
         logger.info(f"LocalNode initialized with ID: {self._id} at {self._address}")
 
@@ -57,14 +144,20 @@ class LocalNode(Node):
 
     @prev.setter
     def prev(self, new_prev: Address | Node) -> None:
+        if not isinstance(new_prev, Node):
+            new_prev = RemoteNode(new_prev)
+        if new_prev == self:
+            new_prev = self
+        else:
+            # Read outside the lock, as the id of a remote node may cost a round
+            # trip and subclasses may need it to publish the change
+            new_prev.id
         with self._lock:
-            if isinstance(new_prev, Node):
-                if new_prev == self:
-                    self._prev = self
-                else:
-                    self._prev = new_prev
-            else:
-                self._prev = RemoteNode(new_prev)
+            self._set_prev(new_prev)
+
+    # Every change of predecessor goes through here, with the lock held
+    def _set_prev(self, new_prev: Optional[Node]) -> None:
+        self._prev = new_prev
 
     @property
     def address(self) -> Address:
@@ -79,14 +172,34 @@ class LocalNode(Node):
         return self._finger_table
 
     @property
-    def data(self) -> Dict[str, str]:
+    def data(self) -> Dict[str, Value]:
         return self._data
 
     @data.setter
-    def data(self, new_data: Dict[str, str]) -> None:
+    def data(self, new_data: Dict[str, Value]) -> None:
         with self._lock:
             self._data.update(new_data)
 
+    def get_state(
+        self, successors: bool = False, fingers: bool = False
+    ) -> Dict[str, Any]:
+        successor_list: List[Node] = []
+        if successors:
+            successor_list = list(self._successors) or (
+                [self._next] if self._next else []
+            )
+        finger_list: List[Optional[Node]] = []
+        if fingers:
+            with self._lock:
+                finger_list = [self._finger_table.get(i) for i in range(KEY_SPACE)]
+        return {
+            "id": self.id,
+            "prev": self._prev,
+            "next": self._next,
+            "successors": successor_list,
+            "fingers": finger_list,
+        }
+
     def get_ip(self) -> str:
         s = None
         try:
@@ -103,14 +216,119 @@ class LocalNode(Node):
 
     def _update_finger_table(self, existingNode=None) -> None:
         logger.info(f"Updating finger table for node {self.address}")
-        for i in range(KEY_SPACE):
+        if not existingNode:
+            existingNode = self
+
+        def find_finger(i: int) -> Node:
             target = (self.id + 2**i) % (2**KEY_SPACE)
+            return self._proximate_finger(i, existingNode.find_successor(target))
 
-            if not existingNode:
-                existingNode = self
+        # Each finger costs a lookup and a probe, so they are resolved together
+        with ThreadPoolExecutor(HANDOFF_WORKERS) as pool:
+            fingers = list(pool.map(find_finger, range(KEY_SPACE)))
+        with self._lock:
+            for i, finger in enumerate(fingers):
+                self.finger_table[i] = finger
 
-            with self._lock:
-                self.finger_table[i] = existingNode.find_successor(target)
+    def _proximate_finger(self, i: int, successor: Node) -> Node:
+        # Any node in [id + 2**i, id + 2**(i+1)) keeps lookups at O(log n) hops,
+        # so among those we know of pick the one with the lowest measured RTT
+        if i == 0 or successor == self:
+            return successor
+
+        target = (self.id + 2**i) % (2**KEY_SPACE)
+        interval_end = (self.id + 2 ** (i + 1)) % (2**KEY_SPACE)
+        try:
+            state = successor.get_state(successors=True)
+        except Exception as e:
+            logger.warning(f"Could not fetch candidates from {successor.address}: {e}")
+            return successor
+
+        best, best_rtt = successor, latency_tracker.rtt(successor.address)
+        for candidate in state["successors"]:
+            if candidate == self or not in_interval(
+                candidate.id, target, interval_end, True, False
+            ):
+                continue
+            rtt = latency_tracker.rtt(candidate.address)
+            if rtt is None and isinstance(candidate, RemoteNode):
+                # Nodes only ever routed through have no samples yet
+                try:
+                    candidate.ping()
+                except Exception as e:
+                    logger.debug(f"Could not probe {candidate.address}: {e}")
+                    continue
+                rtt = latency_tracker.rtt(candidate.address)
+            if rtt is not None and (best_rtt is None or rtt < best_rtt):
+                best, best_rtt = candidate, rtt
+
+        if best != successor:
+            logger.info(
+                f"Finger {i} set to {best.address} instead of {successor.address}"
+            )
+        return best
+
+    def _fold_hints(self, refs: List[Dict[str, Any]]) -> None:
+        # A known node between a finger's target and the finger itself is a
+        # closer successor of that target. Fingers already in their interval
+        # [id + 2**i, id + 2**(i+1)) may have been picked for their latency, so
+        # they only give way to a hinted node measured to be faster. Finger 0
+        # is left to stabilization.
+        hints = [
+            RemoteNode.from_ref(ref)
+            for ref in refs
+            if ref is not None and Address(*ref["address"]) != self.address
+        ]
+        if not hints:
+            return
+        with self._lock:
+            fingers = [(i, self._finger_table.get(i)) for i in range(1, KEY_SPACE)]
+
+        # Ids of remote fingers may cost a round trip, so they are read unlocked
+        ring_size = 2**KEY_SPACE
+        moves: Dict[int, Tuple[Node, Node]] = {}
+        for i, finger in fingers:
+            if finger is None:
+                continue
+            try:
+                finger_id = finger.id
+            except (RuntimeError, OSError):
+                continue
+            target = (self.id + 2**i) % ring_size
+            interval_end = (self.id + 2 ** (i + 1)) % ring_size
+            placed = in_interval(finger_id, target, interval_end, True, False)
+            best, best_id = finger, finger_id
+            for hint in hints:
+                if hint.id == best_id:
+                    continue
+                if placed:
+                    inside = in_interval(hint.id, target, interval_end, True, False)
+                    if inside and self._faster(hint, best):
+                        best, best_id = hint, hint.id
+                elif in_interval(hint.id, target, best_id, True, False):
+                    best, best_id = hint, hint.id
+            if best is not finger:
+                moves[i] = (finger, best)
+
+        with self._lock:
+            for i, (finger, hint) in moves.items():
+                # Unless fix_fingers got there first
+                if self._finger_table.get(i) is finger:
+                    self._finger_table[i] = hint
+                    logger.debug(f"Routing hint moved finger {i} to {hint.address}")
+
+    @staticmethod
+    def _faster(node: Node, than: Node) -> bool:
+        rtt = latency_tracker.rtt(node.address)
+        other = latency_tracker.rtt(than.address)
+        return rtt is not None and (other is None or rtt < other)
+
+    def _neighbourhood(self) -> List[Optional[Dict[str, Any]]]:
+        return [
+            self._node_ref(self),
+            self._node_ref(self._prev),
+            self._node_ref(self._next),
+        ]
 
     def find_successor(self, key: int, iterations: int = 0) -> Node:
         logger.debug(f"Finding successor for key: {key}")
@@ -119,15 +337,23 @@ class LocalNode(Node):
             logger.error(f"Recursion error: Successor not found for key {key}")
             raise RecursionError("Successor not found")
 
-        if self.prev and in_interval(
-            key, self.prev.id, self.id, include_start=False, include_end=True
+        # Peers may route here through stale fingers after this node has left;
+        # its former successor holds the keys now
+        handed_to = self._handed_to
+        if handed_to is not None:
+            return handed_to.find_successor(key, iterations + 1)
+
+        # Either link may be unset for a moment while the ring stabilizes
+        prev, next = self._prev, self._next
+        if prev is not None and in_interval(
+            key, prev.id, self.id, include_start=False, include_end=True
         ):
             return self
 
-        if self.next and in_interval(
-            key, self.id, self.next.id, include_start=False, include_end=True
+        if next is not None and in_interval(
+            key, self.id, next.id, include_start=False, include_end=True
         ):
-            return self.next
+            return next
 
         closest_preceding = self._closest_preceding_node(key)
 
@@ -148,48 +374,511 @@ class LocalNode(Node):
 
         return self
 
+    def _get_local(self, key: str) -> Optional[Value]:
+        with self._lock:
+            deadline = self._expiry.get(key)
+            if deadline is not None and deadline <= time.monotonic():
+                del self._expiry[key]
+                self._data.pop(key, None)
+                self._versions.pop(key, None)
+                logger.info(f"Key '{key}' expired")
+                return None
+            return self._data.get(key)
+
+    def _set_expiry(self, key: str, ttl: Optional[float]) -> None:
+        if ttl is None:
+            self._expiry.pop(key, None)
+            return
+        deadline = time.monotonic() + ttl
+        self._expiry[key] = deadline
+        self._expiry_wheel.schedule(key, deadline)
+
+    def _expire_keys(self, keys: List[str]) -> None:
+        expired = 0
+        now = time.monotonic()
+        # Small batches keep the lock free for request handling between them
+        for start in range(0, len(keys), EXPIRY_BATCH_SIZE):
+            with self._lock:
+                for key in keys[start : start + EXPIRY_BATCH_SIZE]:
+                    deadline = self._expiry.get(key)
+                    if deadline is not None and deadline <= now:
+                        del self._expiry[key]
+                        self._data.pop(key, None)
+                        self._versions.pop(key, None)
+                        expired += 1
+        if expired:
+            logger.info(f"Expired {expired} keys at {self.address}")
+
+    def snapshot(self) -> Tuple[Dict[str, Value], Dict[str, float]]:
+        with self._lock:
+            data = self._data.copy()
+            ttls = self._remaining_ttls(list(data))
+        return data, ttls
+
+    def _remaining_ttls(self, keys: List[str]) -> Dict[str, float]:
+        now = time.monotonic()
+        return {
+            key: max(self._expiry[key] - now, 0.0)
+            for key in keys
+            if key in self._expiry
+        }
+
     def get(
-        self, key: str, history: Optional[List[str]] = None
-    ) -> Tuple[str, Optional[Address], List[str]]:
+        self, key: str, trace: Optional[Trace] = None, r: Optional[int] = None
+    ) -> Tuple[Value, Optional[Address], Optional[Trace]]:
+        # Lookups started here are traced when the tracer samples them
+        if trace is None:
+            trace = tracer.sampled()
+        result, chunks = self.get_stream(key, trace, r)
+        data = b"".join(chunks) if chunks is not None else b""
+        if trace is not None:
+            logger.info(f"Trace for key '{key}': {format_trace(trace)}")
+        if not result["found"]:
+            return ("Key not found", None, trace)
+
+        node_address = result["node_address"]
+        return (
+            decode_value(result["value_type"], data),
+            Address(node_address[0], node_address[1]),
+            trace,
+        )
+
+    def get_stream(
+        self, key: str, trace: Optional[Trace] = None, r: Optional[int] = None
+    ) -> Tuple[Dict[str, Any], Optional[Iterator[bytes]]]:
         logger.info(f"GET request - Key: {key}")
-        if history and str(self.address) in history:
-            logger.warning(f"Circular lookup detected for key {key}")
-            return ("Key not found", None, history)
-
-        if history is None:
-            history = []
+        if trace is not None:
+            started = time.perf_counter()
+            hop: Dict[str, Any] = {
+                "hop": len(trace),
+                "node": str(self.address),
+                "id": self.id,
+            }
+            trace.append(hop)
 
         key_hash = hash(key)
         responsible_node = self.find_successor(key_hash)
+        if trace is not None:
+            hop["route_ms"] = (time.perf_counter() - started) * 1000
 
         if responsible_node == self:
-            value = self.data.get(key, "Key not found")
-            if value == "Key not found":
-                logger.info(f"Key '{key}' not found locally")
-                history.append(f"Key not found locally at {self.address}")
-                return (value, None, history)
+            if self._replicas > 1:
+                answer = self._quorum_read(key, r)
+                value = answer[0] if answer is not None else None
             else:
-                logger.info(f"Key '{key}' found locally with value '{value}'")
-                history.append(f"Key found locally at {self.address}")
-                return (value, self.address, history)
+                value = self._get_local(key)
+            if trace is not None:
+                hop["action"] = "found" if value is not None else "missing"
+                hop["elapsed_ms"] = (time.perf_counter() - started) * 1000
+            if value is None:
+                logger.info(f"Key '{key}' not found locally")
+                return {"found": False, "node_address": None}, None
 
-        logger.info(f"Forwarding GET request to {responsible_node.address}")
-        return responsible_node.get(key, history)
+            logger.info(f"Key '{key}' found locally")
+            value_type, data = encode_value(value)
+            return {
+                "found": True,
+                "value_type": value_type,
+                "node_address": self.address.as_tuple,
+            }, chunked(data)
 
-    def put(self, key: str, value: str) -> None:
+        # Chunks are relayed as they arrive instead of being joined on this hop
+        logger.info(f"Forwarding GET request to {responsible_node.address}")
+        result = responsible_node.get_stream(key, trace, r)
+        if trace is not None:
+            hop["action"] = "forward"
+            hop["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    def put(
+        self,
+        key: str,
+        value: Value,
+        ttl: Optional[float] = None,
+        w: Optional[int] = None,
+    ) -> None:
         key_hash: int = hash(key)
         logger.info(f"PUT request - Key: {key} | Hash: {key_hash}")
         responsible_node: Node = self.find_successor(key_hash)
 
-        if responsible_node == self:
+        if responsible_node == self and self._replicas > 1:
+            self._quorum_write({key: value}, {} if ttl is None else {key: ttl}, w)
+        elif responsible_node == self:
             logger.info(f"Storing key '{key}' locally at {self.address}")
             with self._lock:
                 self.data[key] = value
+                self._set_expiry(key, ttl)
+                self._versions.pop(key, None)
+        elif w is not None:
+            logger.info(f"Forwarding key '{key}' to node {responsible_node.address}")
+            responsible_node.put(key, value, ttl, w)
         else:
             logger.info(f"Forwarding key '{key}' to node {responsible_node.address}")
-            responsible_node.put(key, value)
+            self._forward_put(responsible_node, key, value, ttl)
+
+    def _forward_put(
+        self, node: Node, key: str, value: Value, ttl: Optional[float]
+    ) -> None:
+        if self._coalescer is None:
+            node.put(key, value, ttl)
+        else:
+            self._coalescer.put(node, key, value, ttl)
+
+    def enable_write_coalescing(
+        self, window: float = DEFAULT_WINDOW, max_batch: int = DEFAULT_MAX_BATCH
+    ) -> None:
+        logger.info(f"Coalescing forwarded puts within {window}s, up to {max_batch}")
+        self._coalescer = WriteCoalescer(window, max_batch)
+
+    def enable_replication(
+        self,
+        replicas: int,
+        read_quorum: Optional[int] = None,
+        write_quorum: Optional[int] = None,
+    ) -> None:
+        if not 1 <= replicas <= MAX_REPLICAS:
+            raise ValueError(f"Replicas must be between 1 and {MAX_REPLICAS}")
+        majority = replicas // 2 + 1
+        self._replicas = replicas
+        self._read_quorum = read_quorum or majority
+        self._write_quorum = write_quorum or majority
+        self._quorum(None, self._read_quorum, replicas)
+        self._quorum(None, self._write_quorum, replicas)
+        if self._replica_pool is None:
+            self._replica_pool = ThreadPoolExecutor(REPLICA_WORKERS)
+        logger.info(
+            f"Replicating keys on {replicas} nodes "
+            f"(R={self._read_quorum}, W={self._write_quorum})"
+        )
+
+    def _replica_set(self) -> List[Node]:
+        # The owner followed by the next distinct nodes of its successor list
+        nodes: List[Node] = [self]
+        for node in self._successors or ([self._next] if self._next else []):
+            if len(nodes) == self._replicas:
+                break
+            if node not in nodes:
+                nodes.append(node)
+        return nodes
+
+    def _quorum(self, requested: Optional[int], default: int, available: int) -> int:
+        quorum = requested or default
+        error = self._quorum_error(quorum)
+        if error is not None:
+            raise ValueError(error)
+        # A ring smaller than the replication factor has fewer replicas to ask
+        return min(quorum, available)
+
+    # Checked where a request enters the ring, so that the client is told why
+    # instead of seeing the connection drop when the owner rejects it
+    def _quorum_error(self, requested: Optional[int]) -> Optional[str]:
+        if requested is None or 1 <= requested <= self._replicas:
+            return None
+        return f"O quórum deve estar entre 1 e N={self._replicas}"
+
+    def _await_quorum(self, futures: List[Future], quorum: int) -> List[Any]:
+        # Returns as soon as enough replicas answered; the rest finish unobserved
+        results: List[Any] = []
+        errors: List[Exception] = []
+        with waiting_on_peer():
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+                if len(results) >= quorum:
+                    return results
+                if len(errors) > len(futures) - quorum:
+                    break
+        raise RuntimeError(
+            f"Only {len(results)} of {quorum} replicas answered: {errors[0]}"
+        )
+
+    def _quorum_write(
+        self, values: Dict[str, Value], ttls: Dict[str, float], w: Optional[int]
+    ) -> None:
+        assert self._replica_pool is not None
+        replicas = self._replica_set()
+        quorum = self._quorum(w, self._write_quorum, len(replicas))
+        # Wall-clock versions: the last writer wins across replicas
+        version = time.time_ns()
+        versions = {key: version for key in values}
+        futures = [
+            self._replica_pool.submit(node.replica_put, values, ttls, versions)
+            for node in replicas
+        ]
+        self._await_quorum(futures, quorum)
+        logger.info(f"Wrote {len(values)} keys to {quorum}/{len(replicas)} replicas")
+
+    def _quorum_read(
+        self, key: str, r: Optional[int]
+    ) -> Optional[Tuple[Value, int, Optional[float]]]:
+        assert self._replica_pool is not None
+        replicas = self._replica_set()
+        quorum = self._quorum(r, self._read_quorum, len(replicas))
+        futures = {
+            self._replica_pool.submit(node.replica_get, key): node for node in replicas
+        }
+        answers = [
+            answer
+            for answer in self._await_quorum(list(futures), quorum)
+            if answer is not None
+        ]
+        if not answers:
+            return None
+
+        best = max(answers, key=lambda answer: answer[1])
+        self._replica_pool.submit(self._read_repair, key, futures, best)
+        return best
+
+    def _read_repair(
+        self,
+        key: str,
+        futures: Dict[Future, Node],
+        best: Tuple[Value, int, Optional[float]],
+    ) -> None:
+        # Replicas that answered late or with an older version get the winner
+        value, version, ttl = best
+        wait(futures)
+        for future, node in futures.items():
+            if future.exception() is not None:
+                continue
+            answer = future.result()
+            if answer is not None and answer[1] >= version:
+                continue
+            try:
+                ttls = {} if ttl is None else {key: ttl}
+                node.replica_put({key: value}, ttls, {key: version})
+                logger.info(f"Repaired key '{key}' at {node.address}")
+            except Exception as e:
+                logger.warning(f"Read repair of '{key}' at {node.address} failed: {e}")
+
+    def replica_put(
+        self,
+        values: Dict[str, Value],
+        ttls: Dict[str, float],
+        versions: Dict[str, int],
+    ) -> None:
+        with self._lock:
+            for key, value in values.items():
+                version = versions.get(key, 0)
+                if key in self._data and not self._supersedes(key, value, version):
+                    continue
+                self._data[key] = value
+                self._set_expiry(key, ttls.get(key))
+                self._versions[key] = version
+
+    def _supersedes(self, key: str, value: Value, version: int) -> bool:
+        # Equal versions fall back to the value digest so every replica keeps
+        # the same value
+        current = self._versions.get(key, 0)
+        if version != current:
+            return version > current
+        return item_digest(key, value) > item_digest(key, self._data[key])
+
+    def replica_get(self, key: str) -> Optional[Tuple[Value, int, Optional[float]]]:
+        value = self._get_local(key)
+        if value is None:
+            return None
+        with self._lock:
+            ttl = self._remaining_ttls([key]).get(key)
+            return value, self._versions.get(key, 0), ttl
+
+    def read_range(
+        self, start: int, end: int
+    ) -> Tuple[Dict[str, Value], Dict[str, float], Dict[str, int]]:
+        with self._lock:
+            keys = self._data.keys_in(start, end)
+            data = {key: self._data[key] for key in keys}
+            versions = {
+                key: self._versions[key] for key in keys if key in self._versions
+            }
+            return data, self._remaining_ttls(keys), versions
+
+    def _owns(self, key_hash: int) -> bool:
+        prev = self._prev
+        if prev is None or prev == self:
+            return True
+        return in_interval(key_hash, prev.id, self.id)
+
+    def put_batch(self, values: Dict[str, Value], ttls: Dict[str, float]) -> None:
+        foreign: Dict[str, Value] = {}
+        if self._replicas > 1:
+            owned: Dict[str, Value] = {}
+            for key, value in values.items():
+                (owned if self._owns(hash(key)) else foreign)[key] = value
+            if owned:
+                owned_ttls = {key: ttls[key] for key in owned if key in ttls}
+                self._quorum_write(owned, owned_ttls, None)
+        else:
+            with self._lock:
+                for key, value in values.items():
+                    if not self._owns(hash(key)):
+                        foreign[key] = value
+                        continue
+                    self._data[key] = value
+                    self._set_expiry(key, ttls.get(key))
+                    self._versions.pop(key, None)
+        logger.info(f"Stored batch of {len(values) - len(foreign)} keys locally")
+
+        # The batch was addressed with a stale view of the ring
+        for key, value in foreign.items():
+            self.put(key, value, ttls.get(key))
+
+    def scan(
+        self, cursor: Dict[str, Any], limit: int
+    ) -> Tuple[Dict[str, Value], Optional[Dict[str, Any]]]:
+        # Offsets are clockwise distances from the scan start, so the page
+        # order is the same hash order the whole scan follows
+        ring_size = 2**KEY_SPACE
+        offset = cursor["offset"]
+        position, segment_end = self._scan_segment(cursor)
+
+        items: Dict[str, Value] = {}
+        last: Optional[Tuple[int, str]] = None
+        more = False
+        now = time.monotonic()
+        with self._lock:
+            for key_hash, key in self._data.ring_order(position, cursor["after"]):
+                key_offset = offset + (key_hash - position) % ring_size
+                if key_offset > segment_end:
+                    break
+                if not self._owns(key_hash) or self._expiry.get(key, now + 1) <= now:
+                    continue
+                if len(items) == limit:
+                    more = True
+                    break
+                items[key] = self._data[key]
+                last = (key_offset, key)
 
-    def join(self, existing_node: Optional[RemoteNode] = None) -> None:
+        if more and last is not None:
+            next_cursor = dict(cursor, offset=last[0], after=last[1])
+        else:
+            next_cursor = self._scan_next_node(cursor, segment_end)
+        logger.info(f"SCAN returned {len(items)} keys from {self.address}")
+        return items, next_cursor
+
+    def _scan_segment(self, cursor: Dict[str, Any]) -> Tuple[int, int]:
+        ring_size = 2**KEY_SPACE
+        start, span, offset = cursor["start"], cursor["span"], cursor["offset"]
+        own_end = (self.id - start) % ring_size
+        segment_end = min(own_end if own_end >= offset else ring_size - 1, span - 1)
+        return (start + offset) % ring_size, segment_end
+
+    def _scan_next_node(
+        self, cursor: Dict[str, Any], segment_end: int
+    ) -> Optional[Dict[str, Any]]:
+        if segment_end >= cursor["span"] - 1:
+            return None
+        return dict(
+            cursor,
+            node=self.next.address.as_tuple,
+            offset=segment_end + 1,
+            after=None,
+        )
+
+    def put_stream(
+        self,
+        key: str,
+        value_type: str,
+        chunks: Iterable[bytes],
+        ttl: Optional[float] = None,
+        w: Optional[int] = None,
+    ) -> None:
+        key_hash: int = hash(key)
+        responsible_node: Node = self.find_successor(key_hash)
+
+        if responsible_node == self:
+            self.put(key, decode_value(value_type, b"".join(chunks)), ttl, w)
+        else:
+            logger.info(f"Relaying key '{key}' to node {responsible_node.address}")
+            responsible_node.put_stream(key, value_type, chunks, ttl, w)
+
+    def get_load(self) -> Dict[str, Any]:
+        ring_size = 2**KEY_SPACE
+        prev = self._prev
+        prev_id = self.id if prev is None or prev == self else prev.id
+        start = (prev_id + 1) % ring_size
+        with self._lock:
+            hashes = [
+                key_hash
+                for key_hash, _ in self._data.ring_order(start, None)
+                if self._owns(key_hash)
+            ]
+
+        # The hash that leaves the first half of the owned keys to a new node
+        split: Optional[int] = None
+        if len(hashes) >= 2 and hashes[len(hashes) // 2 - 1] != self.id:
+            split = hashes[len(hashes) // 2 - 1]
+        elif not hashes:
+            width = (self.id - prev_id) % ring_size or ring_size
+            if width > 1:
+                split = (prev_id + width // 2) % ring_size
+
+        return {
+            "id": self.id,
+            "keys": len(hashes),
+            "rate": self._request_rate.rate(),
+            "split": split,
+        }
+
+    # The profiler covers the whole process, so on a sharded node it sees the
+    # coordinator and not the shard workers
+    def profile(
+        self,
+        action: str,
+        mode: str = "sample",
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+        limit: int = DEFAULT_REPORT_LIMIT,
+    ) -> Dict[str, Any]:
+        match action:
+            case "start":
+                profiler.start(mode, interval)
+                logger.info(f"Profiler started in {mode} mode")
+                return {"running": True, "mode": mode}
+            case "stop":
+                report = profiler.stop(limit)
+                logger.info(f"Profiler stopped after {report['seconds']:.1f}s")
+                return {"running": False, **report}
+            case "status":
+                return {"running": profiler.mode is not None, "mode": profiler.mode}
+        raise ValueError(f"Unknown profiler action: {action}")
+
+    def _choose_balanced_id(self, existing_node: Node) -> int:
+        candidates: Dict[Address, Node] = {}
+        for _ in range(LOAD_SAMPLES):
+            node = existing_node.find_successor(random.randrange(2**KEY_SPACE))
+            candidates[node.address] = node
+
+        loads: List[Dict[str, Any]] = []
+        for node in candidates.values():
+            try:
+                loads.append(node.get_load())
+            except Exception as e:
+                logger.warning(f"Could not sample load of {node.address}: {e}")
+
+        loads = [load for load in loads if load["split"] is not None]
+        if not loads:
+            logger.warning("No splittable range found, keeping the address based ID")
+            return self.id
+
+        total_keys = sum(load["keys"] for load in loads) or 1
+        total_rate = sum(load["rate"] for load in loads) or 1
+        heaviest = max(
+            loads,
+            key=lambda load: load["keys"] / total_keys + load["rate"] / total_rate,
+        )
+        logger.info(
+            f"Splitting range of node {heaviest['id']} "
+            f"({heaviest['keys']} keys, {heaviest['rate']:.1f} req/s) "
+            f"at {heaviest['split']}"
+        )
+        return heaviest["split"]
+
+    def join(
+        self, existing_node: Optional[RemoteNode] = None, balanced: bool = False
+    ) -> None:
+        self._handed_to = None
         if existing_node is None:
             logger.info(f"Starting new Chord network with node {self.address}")
             self.prev = self
@@ -197,27 +886,37 @@ class LocalNode(Node):
             self._update_finger_table(self)
         else:
             logger.info(f"Joining network through {existing_node.address}")
+            if balanced:
+                self._id = self._choose_balanced_id(existing_node)
+                logger.info(f"Node {self.address} takes ID {self._id}")
             self.next = existing_node.find_successor(self.id)
-            self.prev = self.next.prev
-            self.next.pass_data(self)
-            self._update_finger_table(existing_node)
-            self.next.prev.next = self
-            self.next.prev = self
-            logger.info(f"Node {self.address} joined the network")
+            state = self.next.get_state(successors=True)
+            self.prev = state["prev"]
+            self._successors = ([self.next] + state["successors"])[:SUCCESSOR_LIST_SIZE]
+            # The successor keeps serving our range while we copy it and build
+            # the finger table; the range changes hands when the links switch
+            with ThreadPoolExecutor(HANDOFF_WORKERS + 1) as pool:
+                fingers = pool.submit(self._update_finger_table, existing_node)
+                copied = self._copy_range(pool, self.next, self.prev.id, self.id)
+                fingers.result()
+            self._concurrently(
+                partial(setattr, self.prev, "next", self),
+                partial(setattr, self.next, "prev", self),
+            )
+            self._claim_range(self.next, self.prev.id, self.id)
+            logger.info(f"Node {self.address} joined the network with {copied} keys")
 
     def fix_fingers(self) -> None:
         i = random.randrange(KEY_SPACE)
         target = (self.id + 2**i) % (2**KEY_SPACE)
-        self.finger_table[i] = self.find_successor(target)
+        self.finger_table[i] = self._proximate_finger(i, self.find_successor(target))
 
     def pass_data(self, receiver: Node) -> None:
-        if receiver == self or (self.prev == self and self.next == self):
+        if receiver == self:
             logger.info("Receiver is self, no data transfer needed")
             return
 
         logger.info(f"Transferring data to node {receiver.address}")
-        data_to_transfer: Dict[str, str] = {}
-        keys = list(self.data.keys())
 
         if self.next.id != receiver.id:
             responsible_node = self.find_successor(receiver.id)
@@ -231,74 +930,309 @@ class LocalNode(Node):
         if self.prev == receiver:
             interval_end = self.id
 
-        with self._lock:
-            for key in keys:
-                if in_interval(hash(key), self.prev.id, interval_end):
-                    data_to_transfer[key] = self.data.pop(key)
-
-        receiver.update_data(data_to_transfer)
+        data_to_transfer, ttls = self._take_range(self.prev.id, interval_end)
+        try:
+            receiver.update_data(data_to_transfer, ttls)
+        except Exception:
+            # Keep the keys rather than lose them; the receiver pulls them
+            # back later through anti-entropy
+            self.update_data(data_to_transfer, ttls, overwrite=False)
+            raise
         logger.info(f"Transferred {len(data_to_transfer)} keys to {receiver.address}")
 
-    def update_data(self, new_data: Dict[str, str]) -> None:
+    def _copy_range(
+        self, pool: ThreadPoolExecutor, node: Node, start: int, end: int
+    ) -> int:
+        copied = 0
+        for data, ttls, versions in pool.map(
+            lambda span: node.read_range(*span), self._handoff_spans(start, end)
+        ):
+            self._install(data, ttls, versions)
+            copied += len(data)
+        return copied
+
+    def _claim_range(self, node: Node, start: int, end: int) -> None:
+        # Keys written to the old owner while the range was being copied
+        if isinstance(node, RemoteNode):
+            for span in self._differing_ranges(node, start, end, True):
+                self._install(*node.read_range(*span))
+        # With replication on, the old owner is now one of the range's replicas
+        if self._replicas == 1:
+            node.drop_range(start, end)
+
+    def _hand_over(
+        self, node: Node, start: int, end: int, overwrite: bool = False
+    ) -> int:
+        data, ttls, versions = self.read_range(start, end)
+        keys = list(data)
+        batches = [
+            keys[offset : offset + HANDOFF_BATCH]
+            for offset in range(0, len(keys), HANDOFF_BATCH)
+        ]
+
+        def send(batch: List[str]) -> None:
+            values = {key: data[key] for key in batch}
+            batch_ttls = {key: ttls[key] for key in batch if key in ttls}
+            if self._replicas > 1:
+                versions_of = {key: versions[key] for key in batch if key in versions}
+                node.replica_put(values, batch_ttls, versions_of)
+            else:
+                node.update_data(values, batch_ttls, overwrite)
+
+        with ThreadPoolExecutor(HANDOFF_WORKERS) as pool:
+            list(pool.map(send, batches))
+        return len(keys)
+
+    def _install(
+        self, data: Dict[str, Value], ttls: Dict[str, float], versions: Dict[str, int]
+    ) -> None:
+        if self._replicas > 1:
+            self.replica_put(data, ttls, versions)
+        else:
+            self.update_data(data, ttls)
+
+    @staticmethod
+    def _handoff_spans(start: int, end: int) -> List[Tuple[int, int]]:
+        # Splits the ring interval (start, end] so it can be copied in parallel
+        ring_size = 2**KEY_SPACE
+        width = (end - start) % ring_size or ring_size
+        step = -(-width // HANDOFF_WORKERS)
+        bounds = list(range(0, width, step)) + [width]
+        return [
+            ((start + lo) % ring_size, (start + hi) % ring_size)
+            for lo, hi in zip(bounds, bounds[1:])
+        ]
+
+    @staticmethod
+    def _concurrently(*calls: Callable[[], Any]) -> None:
+        with ThreadPoolExecutor(len(calls)) as pool:
+            for future in [pool.submit(call) for call in calls]:
+                future.result()
+
+    def drop_range(self, start: int, end: int) -> int:
+        dropped, _ = self._take_range(start, end)
+        logger.info(f"Dropped {len(dropped)} keys in ({start}, {end}]")
+        return len(dropped)
+
+    def _take_range(
+        self, start: int, end: int
+    ) -> Tuple[Dict[str, Value], Dict[str, float]]:
+        taken: Dict[str, Value] = {}
+        with self._lock:
+            for key in list(self._data):
+                if in_interval(hash(key), start, end):
+                    taken[key] = self._data.pop(key)
+                    self._versions.pop(key, None)
+            ttls = self._remaining_ttls(list(taken))
+            for key in ttls:
+                del self._expiry[key]
+        return taken, ttls
+
+    def update_data(
+        self,
+        new_data: Dict[str, Value],
+        ttls: Optional[Dict[str, float]] = None,
+        overwrite: bool = True,
+    ) -> None:
         with self._lock:
+            if not overwrite:
+                new_data = {
+                    key: value
+                    for key, value in new_data.items()
+                    if key not in self._data
+                }
             self.data.update(new_data)
+            for key in new_data:
+                self._set_expiry(key, (ttls or {}).get(key))
+                self._versions.pop(key, None)
         logger.info(f"Node {self.address} updated data with {len(new_data)} new keys")
 
+    def merkle_digests(self, start: int, end: int, indices: List[int]) -> List[int]:
+        with self._lock:
+            return self._data.merkle_digests(start, end, indices)
+
+    def anti_entropy(self) -> int:
+        prev, successor = self._prev, self._next
+        if prev is None or successor is None or prev == self:
+            return 0
+
+        pulled = 0
+        replicas = self._replica_set()[1:] if self._replicas > 1 else []
+        peers = [prev] if successor == prev else [prev, successor]
+        for peer in peers:
+            # Replicas hold copies of this range by design
+            if not isinstance(peer, RemoteNode) or peer in replicas:
+                continue
+            for start, end in self._differing_ranges(peer, prev.id, self.id, False):
+                data, ttls = peer.take_range(start, end)
+                self.update_data(data, ttls, overwrite=False)
+                pulled += len(data)
+        if pulled:
+            logger.info(f"Anti-entropy pulled {pulled} keys into {self.address}")
+
+        for peer in replicas:
+            if isinstance(peer, RemoteNode):
+                pulled += self._sync_replica(peer, prev.id, self.id)
+        return pulled
+
+    def _sync_replica(self, peer: RemoteNode, start: int, end: int) -> int:
+        # Both sides apply the other's keys of the differing buckets and keep
+        # the newer version of each
+        synced = 0
+        for range_start, range_end in self._differing_ranges(peer, start, end, True):
+            theirs = peer.read_range(range_start, range_end)
+            ours = self.read_range(range_start, range_end)
+            self.replica_put(*theirs)
+            peer.replica_put(*ours)
+            synced += len(theirs[0]) + len(ours[0])
+        if synced:
+            logger.info(f"Synchronized {synced} replica keys with {peer.address}")
+        return synced
+
+    def _differing_ranges(
+        self, peer: RemoteNode, start: int, end: int, local: bool
+    ) -> List[Tuple[int, int]]:
+        # Walks down only the subtrees whose digests differ, either from ours
+        # or, for strays, from an empty store (digest 0)
+        spans = range_spans(start, end)
+        pieces: List[Span] = []
+        indices = [ROOT]
+        while indices:
+            digests = peer.merkle_digests(start, end, indices)
+            expected = (
+                self.merkle_digests(start, end, indices)
+                if local
+                else [0] * len(indices)
+            )
+            children: List[int] = []
+            for index, digest, own in zip(indices, digests, expected):
+                if digest == own:
+                    continue
+                if index >= LEAVES:
+                    pieces.extend(clip(node_span(index), spans))
+                else:
+                    children += [2 * index, 2 * index + 1]
+            indices = children
+
+        # Adjacent buckets are taken in a single request
+        merged: List[Span] = []
+        for lo, hi in sorted(pieces):
+            if merged and merged[-1][1] == lo:
+                merged[-1] = (merged[-1][0], hi)
+            else:
+                merged.append((lo, hi))
+        ring_size = 2**KEY_SPACE
+        return [((lo - 1) % ring_size, (hi - 1) % ring_size) for lo, hi in merged]
+
     def exit_network(self) -> None:
         logger.info(f"Node {self.address} is exiting the network")
-        if self.prev and self.next and self.prev != self and self.next != self:
-            self.prev.next = self.next
-            self.next.prev = self.prev
-            self.pass_data(self.next)
+        prev, successor = self._prev, self._next
+        if prev is not None and successor is not None and self not in (prev, successor):
+            # Keys stay readable here until the successor holds a copy of them
+            # and the links have switched
+            handed = self._hand_over(successor, prev.id, self.id)
+            self._concurrently(
+                partial(setattr, prev, "next", successor),
+                partial(setattr, successor, "prev", prev),
+            )
+            # Keys written here during the copy follow and overwrite the
+            # successor's copies, which it has owned only since the switch
+            if isinstance(successor, RemoteNode):
+                for start, end in self._differing_ranges(
+                    successor, prev.id, self.id, True
+                ):
+                    handed += self._hand_over(successor, start, end, overwrite=True)
+            logger.info(f"Handed {handed} keys over to {successor.address}")
+            self._handed_to = successor
 
-        self._prev = None
+        with self._lock:
+            self._set_prev(None)
         self._next = None
         self._finger_table.clear()
         self._data.clear()
+        self._expiry.clear()
+        self._versions.clear()
         logger.info(f"Node {self.address} has exited the network")
 
     def _stabilize(self) -> None:
-        with self._lock:
-            if self.next is self:
-                self._update_finger_table()
-                return
+        if self.next == self:
+            self._update_finger_table()
+            return
 
-            x = self.next.prev
+        successor = self.next
+        state = successor.get_state(successors=True)
+        chain: List[Node] = [successor] + state["successors"]
 
-            if x and in_interval(x.id, self.id, self.next.id):
-                self.next = x
+        x = state["prev"]
+        if x and in_interval(x.id, self.id, successor.id):
+            self.next = x
+            if x != successor:
+                chain.insert(0, x)
 
-            self.next.notify(self)
+        with self._lock:
+            self._successors = chain[:SUCCESSOR_LIST_SIZE]
 
+        self.next.notify(self)
         self.fix_fingers()
 
+    def maintenance_loop(
+        self, interval: float = 1.0, sync_interval: Optional[float] = 30.0
+    ) -> None:
+        logger.info(f"Starting ring maintenance every {interval}s")
+        last_sync = time.monotonic()
+        while self._running:
+            time.sleep(interval)
+            if self._next is None:
+                continue
+            try:
+                with self._acting():
+                    self._stabilize()
+            except Exception as e:
+                logger.error(f"Stabilization failed at {self.address}: {e}")
+
+            if sync_interval is None or time.monotonic() - last_sync < sync_interval:
+                continue
+            last_sync = time.monotonic()
+            try:
+                with self._acting():
+                    self.anti_entropy()
+            except Exception as e:
+                logger.error(f"Anti-entropy failed at {self.address}: {e}")
+
+    @contextlib.contextmanager
+    def _acting(self) -> Iterator[None]:
+        # Lets an emulated network tell which node its messages come from, and
+        # routing hints in the answers reach this node only
+        network = RemoteNode.network
+        with routing_hints.acting_for(self._fold_hints):
+            if network is None:
+                yield
+                return
+            with network.acting_as(self.address):
+                yield
+
     def notify(self, potential_prev: Node) -> None:
+        # Ids of remote nodes may cost a round trip, so they are read before
+        # taking the lock, and prev only moves if nobody changed it meanwhile
+        candidate_id = potential_prev.id
+        prev = self._prev
+        prev_id = prev.id if prev is not None else None
+        if prev_id is not None and not in_interval(candidate_id, prev_id, self.id):
+            return
         with self._lock:
-            if not self.prev or in_interval(potential_prev.id, self.prev.id, self.id):
-                self.prev = potential_prev
+            if self._prev is prev:
+                self._set_prev(self if potential_prev == self else potential_prev)
 
     def server_start(self) -> None:
         logger.info(f"Starting server at {self._host}")
-        self._server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self._server_socket.bind(self._host.as_tuple)
-        self._server_socket.listen(5)
+        self._server_socket = self._listen(self._host, self._reuse_port)
+        self._serve_unix(self._address)
 
         self._running = True
         logger.info(f"Server listening at {self._host}")
 
         try:
-            while self._running:
-                client_socket, addr = self._server_socket.accept()
-
-                client_thread = threading.Thread(
-                    target=self._server_handle_client,
-                    args=(client_socket, addr),
-                )
-
-                client_thread.daemon = True
-                client_thread.start()
-
+            self._accept_loop(self._server_socket, self._process_request)
         except KeyboardInterrupt:
             logger.info("Server shutting down due to keyboard interrupt")
         finally:
@@ -309,30 +1243,83 @@ class LocalNode(Node):
         self._running = False
         if self._server_socket:
             self._server_socket.close()
-
-    def _server_handle_client(self, client_socket: socket.socket, addr: str) -> None:
-        try:
-            while self._running:
-                data = client_socket.recv(1024).decode()
-
-                if not data:
-                    break
-
-                logger.debug(f"Received data from {addr}: {data}")
-                response = self._process_request(json.loads(data))
-                logger.debug(f"Sending response to {addr}: {response}")
-
-                client_socket.send(json.dumps(response).encode())
-
-        except Exception as e:
-            logger.error(f"Error handling client {addr}: {e}")
-
-        finally:
-            logger.debug(f"Closing client socket {addr}")
-            client_socket.close()
-
-    def _process_request(self, request: Dict) -> Dict:
+        for server_socket, path in self._unix_sockets:
+            server_socket.close()
+            remove_unix(path)
+        self._unix_sockets.clear()
+        self._pool.stop()
+
+    def _listen(self, address: Address, reuse_port: bool = False) -> socket.socket:
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server_socket.bind(address.as_tuple)
+        server_socket.listen(socket.SOMAXCONN)
+        return server_socket
+
+    def _serve_unix(self, address: Address, priority: bool = False) -> None:
+        if not LocalNode.unix_socket:
+            return
+        path = unix_path(address)
+        server_socket = listen_unix(address)
+        if path is None or server_socket is None:
+            return
+        self._unix_sockets.append((server_socket, path))
+        logger.info(f"Serving local peers at {path}")
+
+        unix_thread = threading.Thread(
+            target=self._accept_loop,
+            args=(server_socket, self._process_request, priority),
+        )
+        unix_thread.daemon = True
+        unix_thread.start()
+
+    def _accept_loop(
+        self,
+        server_socket: socket.socket,
+        process: Callable[[Dict, Optional[Iterator[bytes]]], Dict],
+        priority: bool = False,
+    ) -> None:
+        self._pool.start()
+        while self._running:
+            try:
+                client_socket, addr = server_socket.accept()
+            except OSError:
+                # The listening socket was closed by server_stop
+                if not self._running:
+                    return
+                raise
+
+            self._pool.add(client_socket, addr, process, self._compression, priority)
+
+    def _serve_request(
+        self,
+        connection: Connection,
+        request: Dict,
+        body: Optional[Iterator[bytes]],
+        process: Callable[[Dict, Optional[Iterator[bytes]]], Dict],
+    ) -> None:
+        logger.debug(f"Received request: {request}")
+        with self._acting():
+            response = process(request, body)
+        if body is not None:
+            # Leave the connection at a frame boundary for the next request
+            for _ in body:
+                pass
+
+        if request["parameters"].get("hints") and "hints" not in response:
+            response["hints"] = self._neighbourhood()
+
+        stream = response.pop("body", None)
+        logger.debug(f"Sending response: {response}")
+        connection.send(json.dumps(response), stream)
+
+    def _process_request(
+        self, request: Dict, body: Optional[Iterator[bytes]] = None
+    ) -> Dict:
         logger.info(f"Processing request: {request.get('type')}")
+        self._request_rate.mark()
 
         match request["type"]:
             case "GET_NEXT":
@@ -352,20 +1339,43 @@ class LocalNode(Node):
                 return {"status": "success"}
 
             case "LOOKUP":
+                error = self._quorum_error(request["parameters"].get("r"))
+                if error is not None:
+                    return {"success": False, "message": error}
                 key = request["parameters"]["key"]
-                history = request["parameters"].get("history", [])
+                # Traced lookups carry the index their first hop here takes
+                first_hop = request["parameters"].get("trace")
+                trace: Optional[Trace] = None if first_hop is None else []
+                if trace is not None:
+                    queued = time.perf_counter() - request["received"]
                 logger.info(f"LOOKUP request - Key: {key}")
-                value, node_address, _ = self.get(key, history=history)
-                return {
-                    "value": value,
-                    "node_address": node_address.as_tuple if node_address else None,
+                result, chunks = self.get_stream(
+                    key, trace, request["parameters"].get("r")
+                )
+                response = {
+                    "found": result["found"],
+                    "value_type": result.get("value_type"),
+                    "node_address": result["node_address"],
+                    "body": chunks,
                 }
+                if trace:
+                    trace[0]["queue_ms"] = queued * 1000
+                    for hop in trace:
+                        hop["hop"] += first_hop
+                    response["trace"] = trace
+                return response
 
             case "PUT":
+                error = self._quorum_error(request["parameters"].get("w"))
+                if error is not None:
+                    return {"success": False, "message": error}
                 key = request["parameters"]["key"]
-                value = request["parameters"]["value"]
-                logger.info(f"PUT request - Key: {key}, Value: {value}")
-                self.put(key, value)
+                value_type = request["parameters"].get("value_type", "str")
+                ttl = request["parameters"].get("ttl")
+                logger.info(f"PUT request - Key: {key}, Type: {value_type}")
+                self.put_stream(
+                    key, value_type, body or (), ttl, request["parameters"].get("w")
+                )
                 return {"status": "success"}
 
             case "FIND_SUCCESSOR":
@@ -373,7 +1383,10 @@ class LocalNode(Node):
                     request["parameters"]["key"],
                     request["parameters"].get("iterations", 0),
                 )
-                return {"successor": successor.address.as_tuple}
+                return {
+                    "successor": successor.address.as_tuple,
+                    "successor_id": successor.id,
+                }
 
             case "NOTIFY":
                 potential_prev_addr = request["parameters"]["potential_prev"]
@@ -385,7 +1398,8 @@ class LocalNode(Node):
             case "JOIN":
                 potential_prev_addr = request["parameters"]["potential_prev"]
                 self.join(
-                    RemoteNode(Address(potential_prev_addr[0], potential_prev_addr[1]))
+                    RemoteNode(Address(potential_prev_addr[0], potential_prev_addr[1])),
+                    request["parameters"].get("balanced", False),
                 )
                 return {"status": "success"}
 
@@ -393,16 +1407,126 @@ class LocalNode(Node):
                 receiver_addr = request["parameters"]["receiver"]
                 self.pass_data(RemoteNode(Address(receiver_addr[0], receiver_addr[1])))
 
+            case "PUT_BATCH":
+                values = unpack_values(request["parameters"]["entries"], body)
+                self.put_batch(values, request["parameters"].get("ttls") or {})
+                return {"status": "success"}
+
+            case "SCAN":
+                items, cursor = self.scan(
+                    request["parameters"]["cursor"], request["parameters"]["limit"]
+                )
+                entries, chunks = pack_values(items)
+                return {"entries": entries, "cursor": cursor, "body": chunks}
+
+            case "SNAPSHOT":
+                data, ttls = self.snapshot()
+                entries, chunks = pack_values(data)
+                return {"entries": entries, "ttls": ttls, "body": chunks}
+
             case "UPDATE_DATA":
-                new_data = request["parameters"]["new_data"]
-                self.update_data(new_data)
+                new_data = unpack_values(request["parameters"]["entries"], body)
+                self.update_data(
+                    new_data,
+                    request["parameters"].get("ttls"),
+                    request["parameters"].get("overwrite", True),
+                )
                 return {"status": "success"}
 
+            case "DROP_RANGE":
+                dropped = self.drop_range(
+                    request["parameters"]["start"], request["parameters"]["end"]
+                )
+                return {"dropped": dropped}
+
+            case "TAKE_RANGE":
+                data, ttls = self._take_range(
+                    request["parameters"]["start"], request["parameters"]["end"]
+                )
+                entries, chunks = pack_values(data)
+                return {"entries": entries, "ttls": ttls, "body": chunks}
+
+            case "REPLICA_PUT":
+                values = unpack_values(request["parameters"]["entries"], body)
+                self.replica_put(
+                    values,
+                    request["parameters"].get("ttls") or {},
+                    request["parameters"].get("versions") or {},
+                )
+                return {"status": "success"}
+
+            case "REPLICA_GET":
+                answer = self.replica_get(request["parameters"]["key"])
+                if answer is None:
+                    return {"found": False}
+                value, version, ttl = answer
+                value_type, data = encode_value(value)
+                return {
+                    "found": True,
+                    "value_type": value_type,
+                    "version": version,
+                    "ttl": ttl,
+                    "body": chunked(data),
+                }
+
+            case "READ_RANGE":
+                data, ttls, versions = self.read_range(
+                    request["parameters"]["start"], request["parameters"]["end"]
+                )
+                entries, chunks = pack_values(data)
+                return {
+                    "entries": entries,
+                    "ttls": ttls,
+                    "versions": versions,
+                    "body": chunks,
+                }
+
+            case "MERKLE":
+                digests = self.merkle_digests(
+                    request["parameters"]["start"],
+                    request["parameters"]["end"],
+                    request["parameters"]["indices"],
+                )
+                return {"digests": digests}
+
             case "GET_ID":
                 return {"id": self.id}
 
+            case "GET_LOAD":
+                return self.get_load()
+
+            case "PROFILE":
+                try:
+                    return self.profile(
+                        request["parameters"]["action"],
+                        request["parameters"].get("mode", "sample"),
+                        request["parameters"].get("interval", DEFAULT_SAMPLE_INTERVAL),
+                        request["parameters"].get("limit", DEFAULT_REPORT_LIMIT),
+                    )
+                except (RuntimeError, ValueError) as e:
+                    return {"error": str(e)}
+
+            case "GET_STATE":
+                state = self.get_state(
+                    request["parameters"].get("successors", False),
+                    request["parameters"].get("fingers", False),
+                )
+                return {
+                    "id": state["id"],
+                    "prev": self._node_ref(state["prev"]),
+                    "next": self._node_ref(state["next"]),
+                    "successors": [self._node_ref(n) for n in state["successors"]],
+                    "fingers": [self._node_ref(n) for n in state["fingers"]],
+                }
+
         return {"error": "Unknown request type"}
 
+    @staticmethod
+    def _node_ref(node: Optional[Node]) -> Optional[Dict[str, Any]]:
+        if node is None:
+            return None
+        return {"address": node.address.as_tuple, "id": node.id}
+
     def __eq__(self, value: object) -> bool:
         if not isinstance(value, Node):
             return False
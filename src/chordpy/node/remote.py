@@ -1,19 +1,57 @@
-import socket
 import json
+import random
+import socket
+import time
 
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Final, Iterable, Iterator, Optional, Tuple
 
 from address import Address
+from admission import OVERLOAD_RETRIES, RETRY_AFTER, OverloadedError, waiting_on_peer
 from message import message
+from netem import NetworkEmulator
 from node.interface import List, Node
+from latency import DIRECT_REQUESTS, latency_tracker
+from routing import HINTED_REQUESTS, routing_hints
+from tracing import DEFAULT_REPORT_LIMIT, DEFAULT_SAMPLE_INTERVAL, Trace, tracer
+from transport import connect
+from protocol import (
+    Connection,
+    chunked,
+    decode_value,
+    encode_value,
+    pack_values,
+    unpack_values,
+)
+from utils import Value
 from logger import logger
 
 
+REQUEST_TIMEOUT: Final[float] = 30.0
+
+
 class RemoteNode(Node):
-    def __init__(self, address: Address) -> None:
+    compression: bool = False
+    # Longest wait for any one read or write before a request fails
+    timeout: Optional[float] = REQUEST_TIMEOUT
+    # Ask responders to piggyback their neighbourhood on routed requests
+    hints: bool = False
+    # Emulated network conditions for benchmarks; None sends requests as is
+    network: Optional[NetworkEmulator] = None
+    # Reach nodes on this host through their Unix socket when they have one
+    unix_socket: bool = True
+
+    def __init__(self, address: Address, node_id: Optional[int] = None) -> None:
         self._address: Address = address
+        self._id: Optional[int] = node_id
         logger.info(f"RemoteNode initialized at {address}")
 
+    @staticmethod
+    def from_ref(ref: Optional[Dict[str, Any]]) -> Optional["RemoteNode"]:
+        if ref is None:
+            return None
+        address_tuple = ref["address"]
+        return RemoteNode(Address(address_tuple[0], address_tuple[1]), ref.get("id"))
+
     @property
     def next(self) -> "RemoteNode":
         next_address_tuple: list = self._request("GET_NEXT", self.address)["next"]
@@ -48,92 +86,399 @@ class RemoteNode(Node):
 
     @property
     def id(self) -> int:
-        node_id = self._request("GET_ID", self.address)["id"]
-        return node_id
+        # Cached once known. A node that rejoins at the same address may take a
+        # new id, so answers that carry the id replace the cached one.
+        if self._id is None:
+            self._id = self._request("GET_ID", self.address)["id"]
+        return self._id
+
+    # A direct request, so that its round trip is measured
+    def ping(self) -> None:
+        self._id = self._request("GET_ID", self.address)["id"]
 
-    def _request(self, type: str, address: Address | list, **params) -> Dict[str, Any]:
+    def get_state(
+        self, successors: bool = False, fingers: bool = False
+    ) -> Dict[str, Any]:
+        logger.debug(f"Fetching state of node {self.address}")
+        state = self._request(
+            "GET_STATE", self.address, successors=successors, fingers=fingers
+        )
+        if self._id is not None and self._id != state["id"]:
+            logger.info(f"Node at {self.address} changed id to {state['id']}")
+        self._id = state["id"]
+        return {
+            "id": state["id"],
+            "prev": RemoteNode.from_ref(state["prev"]),
+            "next": RemoteNode.from_ref(state["next"]),
+            "successors": [RemoteNode.from_ref(ref) for ref in state["successors"]],
+            "fingers": [RemoteNode.from_ref(ref) for ref in state.get("fingers", [])],
+        }
+
+    def _exchange(
+        self,
+        type: str,
+        address: Address | list,
+        body: Optional[Iterable[bytes]] = None,
+        **params,
+    ) -> Tuple[Connection, Dict[str, Any], Optional[Iterator[bytes]]]:
+        # An overloaded peer is retried with backoff, unless the body has been
+        # consumed already and the request cannot be sent again
+        attempt = 0
+        while True:
+            try:
+                with waiting_on_peer():
+                    return self._exchange_once(type, address, body, **params)
+            except OverloadedError as e:
+                if body is not None or attempt >= OVERLOAD_RETRIES:
+                    raise
+                with waiting_on_peer():
+                    time.sleep(e.retry_after * 2**attempt * random.uniform(0.5, 1.5))
+                attempt += 1
+
+    def _exchange_once(
+        self,
+        type: str,
+        address: Address | list,
+        body: Optional[Iterable[bytes]] = None,
+        **params,
+    ) -> Tuple[Connection, Dict[str, Any], Optional[Iterator[bytes]]]:
+        connection: Optional[Connection] = None
+        result: Optional[Dict[str, Any]] = None
+        network = RemoteNode.network
+        timed_out = False
+        started = time.perf_counter()
         try:
             if isinstance(address, list):
                 address = Address(address[0], address[1])
 
-            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client_socket.connect(address.as_tuple)
+            if network is not None:
+                network.transmit(address)
+            client_socket = connect(
+                address, RemoteNode.unix_socket, RemoteNode.timeout
+            )
+            connection = Connection(client_socket, RemoteNode.compression)
 
+            if RemoteNode.hints and type in HINTED_REQUESTS:
+                params["hints"] = True
             data: str = message(type, **params).to_json()
             logger.debug(f"Sending {type} request to {address}")
 
-            client_socket.send(data.encode())
-
-            response = client_socket.recv(1024).decode()
+            connection.send(data, body)
 
             try:
-                result = json.loads(response)
-                return result
+                response, response_body = connection.recv()
             except json.JSONDecodeError as e:
                 logger.error(f"Invalid JSON response: {e}")
                 raise ValueError(f"Invalid JSON message: {e}")
+            if network is not None:
+                network.transmit(address, reply=True)
+            result = response
 
+            if result is None:
+                raise ConnectionError("Connection closed before a response")
+            if result.get("error") == "overloaded":
+                retry_after = result.get("retry_after", RETRY_AFTER)
+                result = None
+                raise OverloadedError(f"Node at {address} is overloaded", retry_after)
+            if type in DIRECT_REQUESTS:
+                latency_tracker.record(address, time.perf_counter() - started)
+            if result.get("hints"):
+                routing_hints.offer(result["hints"])
+            if network is not None:
+                network.record(type, time.perf_counter() - started)
+            return connection, result, response_body
+
+        except OverloadedError:
+            logger.warning(f"Node at {address} refused {type}: overloaded")
+            raise
         except ConnectionRefusedError:
             logger.error(f"Connection refused by {address}")
             raise RuntimeError(f"Node at {address} is not reachable")
         except socket.timeout:
+            timed_out = True
             logger.error(f"Connection to {address} timed out")
             raise TimeoutError(f"Connection to {address} timed out")
         except Exception as e:
             logger.error(f"Error when requesting {type} from {address}: {e}")
             raise RuntimeError(f"Error when requesting {address}: {e}")
+        finally:
+            if connection is not None and result is None:
+                connection.close()
+            if network is not None and result is None:
+                elapsed = time.perf_counter() - started
+                network.record(type, elapsed, timed_out, failed=True)
 
-    def update_data(self, new_data: Dict[str, str]) -> None:
+    def _request(
+        self,
+        type: str,
+        address: Address | list,
+        body: Optional[Iterable[bytes]] = None,
+        **params,
+    ) -> Dict[str, Any]:
+        connection, result, response_body = self._exchange(
+            type, address, body, **params
+        )
+        try:
+            if response_body is not None:
+                result["body"] = b"".join(response_body)
+            return result
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _stream(
+        connection: Connection, body: Optional[Iterator[bytes]]
+    ) -> Iterator[bytes]:
+        try:
+            if body is not None:
+                yield from body
+        finally:
+            connection.close()
+
+    def update_data(
+        self,
+        new_data: Dict[str, Value],
+        ttls: Optional[Dict[str, float]] = None,
+        overwrite: bool = True,
+    ) -> None:
         logger.info(
             f"Updating data at remote node {self.address} with {len(new_data)} items"
         )
         try:
-            self._request("UPDATE_DATA", self.address, new_data=new_data)
+            entries, body = pack_values(new_data)
+            self._request(
+                "UPDATE_DATA",
+                self.address,
+                body=body,
+                entries=entries,
+                ttls=ttls,
+                overwrite=overwrite,
+            )
         except Exception as e:
             logger.error(f"Failed to update data: {e}")
             raise
 
-    def put(self, key: str, value: str) -> None:
+    def put(
+        self,
+        key: str,
+        value: Value,
+        ttl: Optional[float] = None,
+        w: Optional[int] = None,
+    ) -> None:
+        value_type, data = encode_value(value)
+        self.put_stream(key, value_type, chunked(data), ttl, w)
+
+    def put_stream(
+        self,
+        key: str,
+        value_type: str,
+        chunks: Iterable[bytes],
+        ttl: Optional[float] = None,
+        w: Optional[int] = None,
+    ) -> None:
         logger.info(f"Storing key '{key}' at remote node {self.address}")
         try:
-            self._request("PUT", self.address, key=key, value=value)
+            result = self._request(
+                "PUT",
+                self.address,
+                body=chunks,
+                key=key,
+                value_type=value_type,
+                ttl=ttl,
+                w=w,
+            )
+            if result.get("success") is False:
+                raise ValueError(result["message"])
         except Exception as e:
             logger.error(f"Failed to store key '{key}': {e}")
             raise
 
+    def put_batch(self, values: Dict[str, Value], ttls: Dict[str, float]) -> None:
+        logger.info(f"Storing {len(values)} keys at remote node {self.address}")
+        try:
+            entries, body = pack_values(values)
+            self._request(
+                "PUT_BATCH", self.address, body=body, entries=entries, ttls=ttls
+            )
+        except Exception as e:
+            logger.error(f"Failed to store batch: {e}")
+            raise
+
+    def snapshot(self) -> Tuple[Dict[str, Value], Dict[str, float]]:
+        logger.info(f"Fetching data snapshot from {self.address}")
+        try:
+            result = self._request("SNAPSHOT", self.address)
+            data = unpack_values(result["entries"], [result.get("body", b"")])
+            return data, result["ttls"]
+        except Exception as e:
+            logger.error(f"Failed to fetch snapshot: {e}")
+            raise
+
+    def scan(
+        self, cursor: Dict[str, Any], limit: int
+    ) -> Tuple[Dict[str, Value], Optional[Dict[str, Any]]]:
+        logger.debug(f"Scanning page at {self.address} from offset {cursor['offset']}")
+        try:
+            result = self._request("SCAN", self.address, cursor=cursor, limit=limit)
+            items = unpack_values(result["entries"], [result.get("body", b"")])
+            return items, result["cursor"]
+        except Exception as e:
+            logger.error(f"Failed to scan: {e}")
+            raise
+
+    def drop_range(self, start: int, end: int) -> int:
+        logger.info(f"Dropping keys in ({start}, {end}] at {self.address}")
+        try:
+            result = self._request("DROP_RANGE", self.address, start=start, end=end)
+            return result["dropped"]
+        except Exception as e:
+            logger.error(f"Failed to drop range: {e}")
+            raise
+
+    def take_range(
+        self, start: int, end: int
+    ) -> Tuple[Dict[str, Value], Dict[str, float]]:
+        logger.info(f"Taking keys in ({start}, {end}] from {self.address}")
+        try:
+            result = self._request("TAKE_RANGE", self.address, start=start, end=end)
+            data = unpack_values(result["entries"], [result.get("body", b"")])
+            return data, result["ttls"]
+        except Exception as e:
+            logger.error(f"Failed to take range: {e}")
+            raise
+
+    def replica_put(
+        self,
+        values: Dict[str, Value],
+        ttls: Dict[str, float],
+        versions: Dict[str, int],
+    ) -> None:
+        logger.debug(f"Writing {len(values)} replicas at {self.address}")
+        try:
+            entries, body = pack_values(values)
+            self._request(
+                "REPLICA_PUT",
+                self.address,
+                body=body,
+                entries=entries,
+                ttls=ttls,
+                versions=versions,
+            )
+        except Exception as e:
+            logger.error(f"Failed to write replicas: {e}")
+            raise
+
+    def replica_get(self, key: str) -> Optional[Tuple[Value, int, Optional[float]]]:
+        logger.debug(f"Reading replica of '{key}' at {self.address}")
+        try:
+            result = self._request("REPLICA_GET", self.address, key=key)
+            if not result["found"]:
+                return None
+            value = decode_value(result["value_type"], result.get("body", b""))
+            return value, result["version"], result["ttl"]
+        except Exception as e:
+            logger.error(f"Failed to read replica: {e}")
+            raise
+
+    def read_range(
+        self, start: int, end: int
+    ) -> Tuple[Dict[str, Value], Dict[str, float], Dict[str, int]]:
+        logger.debug(f"Reading keys in ({start}, {end}] from {self.address}")
+        try:
+            result = self._request("READ_RANGE", self.address, start=start, end=end)
+            data = unpack_values(result["entries"], [result.get("body", b"")])
+            return data, result["ttls"], result["versions"]
+        except Exception as e:
+            logger.error(f"Failed to read range: {e}")
+            raise
+
+    def merkle_digests(self, start: int, end: int, indices: List[int]) -> List[int]:
+        logger.debug(f"Fetching {len(indices)} Merkle digests from {self.address}")
+        try:
+            result = self._request(
+                "MERKLE", self.address, start=start, end=end, indices=indices
+            )
+            return result["digests"]
+        except Exception as e:
+            logger.error(f"Failed to fetch Merkle digests: {e}")
+            raise
+
     def get(
-        self, key: str, history: Optional[list]
-    ) -> Tuple[str, Optional[Address], List[str]]:
+        self, key: str, trace: Optional[Trace], r: Optional[int] = None
+    ) -> Tuple[Value, Optional[Address], Optional[Trace]]:
+        if trace is None:
+            trace = tracer.sampled()
+        result, chunks = self.get_stream(key, trace, r)
+        data = b"".join(chunks) if chunks is not None else b""
+        if not result["found"]:
+            return "Key not found", None, trace
+
+        node_address_tuple = result["node_address"]
+        node_address = Address(node_address_tuple[0], node_address_tuple[1])
+        return (
+            decode_value(result["value_type"], data),
+            node_address,
+            trace,
+        )
+
+    def get_stream(
+        self, key: str, trace: Optional[Trace], r: Optional[int] = None
+    ) -> Tuple[Dict[str, Any], Optional[Iterator[bytes]]]:
         logger.info(f"Retrieving key '{key}' from remote node {self.address}")
-        self_log: str = f"Get designado para {self.address}"
-        if history is not None:
-            history.append(self_log)
-        else:
-            history = [self_log]
+        # Only sampled lookups ask the next hops to record themselves
+        params: Dict[str, Any] = {"key": key, "r": r}
+        if trace is not None:
+            params["trace"] = len(trace)
 
         try:
-            result = self._request("LOOKUP", self.address, key=key, history=history)
-            value = result["value"]
-            node_address_tuple = result.get("node_address")
-            node_address = (
-                Address(node_address_tuple[0], node_address_tuple[1])
-                if node_address_tuple
-                else None
-            )
-            return value, node_address, history
+            connection, result, body = self._exchange("LOOKUP", self.address, **params)
+            if result.get("success") is False:
+                connection.close()
+                raise ValueError(result["message"])
+            if trace is not None:
+                trace.extend(result.pop("trace", []))
+            return result, self._stream(connection, body)
 
         except Exception as e:
             logger.error(f"Failed to retrieve key '{key}': {e}")
             raise
 
+    def get_load(self) -> Dict[str, Any]:
+        logger.debug(f"Fetching load of node {self.address}")
+        load = self._request("GET_LOAD", self.address)
+        self._id = load["id"]
+        return load
+
+    def profile(
+        self,
+        action: str,
+        mode: str = "sample",
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+        limit: int = DEFAULT_REPORT_LIMIT,
+    ) -> Dict[str, Any]:
+        logger.info(f"Sending profiler {action} to node {self.address}")
+        result = self._request(
+            "PROFILE",
+            self.address,
+            action=action,
+            mode=mode,
+            interval=interval,
+            limit=limit,
+        )
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result
+
     def find_successor(self, key: int, iterations: int = 0) -> "RemoteNode":
         logger.info(f"Finding successor for key {key} at node {self.address}")
         try:
-            successor_address_tuple: list = self._request(
+            result = self._request(
                 "FIND_SUCCESSOR", self.address, key=key, iterations=iterations
-            )["successor"]
+            )
+            successor_address_tuple: list = result["successor"]
             return RemoteNode(
-                Address(successor_address_tuple[0], successor_address_tuple[1])
+                Address(successor_address_tuple[0], successor_address_tuple[1]),
+                result.get("successor_id"),
             )
         except Exception as e:
             logger.error(f"Failed to find successor: {e}")
@@ -149,11 +494,14 @@ class RemoteNode(Node):
             logger.error(f"Failed to notify node: {e}")
             raise
 
-    def join(self, existing_node: "RemoteNode") -> None:
+    def join(self, existing_node: "RemoteNode", balanced: bool = False) -> None:
         logger.info(f"Joining network through {existing_node.address}")
         try:
             self._request(
-                "JOIN", self.address, existing_node=existing_node.address.as_tuple
+                "JOIN",
+                self.address,
+                existing_node=existing_node.address.as_tuple,
+                balanced=balanced,
             )
         except Exception as e:
             logger.error(f"Failed to join network: {e}")
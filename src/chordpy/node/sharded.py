@@ -0,0 +1,396 @@
+import multiprocessing
+import socket
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from address import Address
+from node.interface import Node
+from node.local import KEY_SPACE, LocalNode
+from node.remote import RemoteNode
+from tracing import Trace
+from transport import remove_unix, unix_path
+from utils import Value, hash, in_interval
+from logger import logger
+
+
+T = TypeVar("T")
+
+
+def _free_port() -> int:
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+    finally:
+        probe.close()
+
+
+def _proxy(
+    address: Address, request: Dict, body: Optional[Iterator[bytes]]
+) -> Dict[str, Any]:
+    target = RemoteNode(address)
+    connection, result, response_body = target._exchange(
+        request["type"], address, body, **request["parameters"]
+    )
+    if response_body is None:
+        connection.close()
+    else:
+        result["body"] = RemoteNode._stream(connection, response_body)
+    return result
+
+
+# A worker process of a multi-core node. It shares the public port with the
+# coordinator through SO_REUSEPORT and serves key lookups and writes for its
+# shard of the node's range; everything else goes to the coordinator.
+class ShardWorker(LocalNode):
+    def __init__(
+        self,
+        shard: int,
+        shards: int,
+        host: str,
+        port: int,
+        address: Address,
+        private_addresses: List[Address],
+        ring: Any,
+        compression: bool = False,
+        replicated: bool = False,
+    ) -> None:
+        super().__init__(host, port, compression, address)
+        self._replicated: bool = replicated
+        self._shard: int = shard
+        self._shards: int = shards
+        self._private: List[Address] = private_addresses
+        self._ring = ring
+        self._reuse_port = True
+        self._prev = self
+        self._next = self
+
+    @property
+    def id(self) -> int:
+        return self._ring[0]
+
+    def _in_node_range(self, key_hash: int) -> bool:
+        node_id, prev_id = self._ring[0], self._ring[1]
+        return prev_id == node_id or in_interval(key_hash, prev_id, node_id)
+
+    def _owns(self, key_hash: int) -> bool:
+        if not self._in_node_range(key_hash):
+            return False
+        return key_hash % self._shards == self._shard
+
+    def find_successor(self, key: int, iterations: int = 0) -> Node:
+        if self._in_node_range(key):
+            shard = key % self._shards
+            if shard == self._shard:
+                return self
+            return RemoteNode(self._private[shard + 1])
+        return RemoteNode(self._private[0]).find_successor(key, iterations)
+
+    def server_start(self) -> None:
+        self._running = True
+        private_socket = self._listen(self._private[self._shard + 1])
+        # Requests between the processes of a node take the priority lane, so
+        # workers waiting on the coordinator never starve it and vice versa
+        private_thread = threading.Thread(
+            target=self._accept_loop,
+            args=(private_socket, self._process_request, True),
+        )
+        private_thread.daemon = True
+        private_thread.start()
+        self._serve_unix(self._private[self._shard + 1], priority=True)
+
+        logger.info(f"Shard {self._shard} serving {self._host}")
+        self._server_socket = self._listen(self._host, reuse_port=True)
+        try:
+            self._accept_loop(self._server_socket, self._process_public_request)
+        finally:
+            self.server_stop()
+
+    def _neighbourhood(self) -> List[Optional[Dict[str, Any]]]:
+        # Workers only know the node they belong to
+        return [self._node_ref(self)]
+
+    def _process_public_request(
+        self, request: Dict, body: Optional[Iterator[bytes]] = None
+    ) -> Dict:
+        # Replicated keys need the coordinator to reach the other replicas
+        if not self._replicated and request["type"] in ("LOOKUP", "PUT"):
+            return self._process_request(request, body)
+        return _proxy(self._private[0], request, body)
+
+
+def run_worker(*args: Any) -> None:
+    ShardWorker(*args).server_start()
+
+
+# Keeps the ring identity, routing state and maintenance of a multi-core node
+# and stores no keys itself; owned keys live in the worker processes.
+class ShardCoordinator(LocalNode):
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8008,
+        compression: bool = False,
+        advertise: Optional[Address] = None,
+        workers: int = 2,
+    ) -> None:
+        super().__init__(host, port, compression, advertise)
+        self._reuse_port = True
+        self._shards: int = workers
+        self._private: List[Address] = [
+            Address("127.0.0.1", _free_port()) for _ in range(workers + 1)
+        ]
+        self._workers: List[RemoteNode] = [
+            RemoteNode(address) for address in self._private[1:]
+        ]
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+        # Node id and predecessor id, read by the workers for ownership checks
+        context = multiprocessing.get_context("spawn")
+        self._ring = context.Array("q", [self.id, self.id])
+
+    # Workers learn of every change of predecessor, whether set by a joining
+    # or leaving neighbour or found by stabilization
+    def _set_prev(self, new_prev: Optional[Node]) -> None:
+        super()._set_prev(new_prev)
+        prev_id = self.id if new_prev is None or new_prev == self else new_prev.id
+        with self._ring.get_lock():
+            self._ring[0] = self.id
+            self._ring[1] = prev_id
+
+    def server_start(self) -> None:
+        self._running = True
+        context = multiprocessing.get_context("spawn")
+        for shard in range(self._shards):
+            process = context.Process(
+                target=run_worker,
+                args=(
+                    shard,
+                    self._shards,
+                    self._host.ip,
+                    self._host.port,
+                    self.address,
+                    self._private,
+                    self._ring,
+                    self._compression,
+                    self._replicas > 1,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+        logger.info(f"Started {self._shards} shard workers")
+
+        private_socket = self._listen(self._private[0])
+        private_thread = threading.Thread(
+            target=self._accept_loop,
+            args=(private_socket, self._process_request, True),
+        )
+        private_thread.daemon = True
+        private_thread.start()
+        self._serve_unix(self._private[0], priority=True)
+        super().server_start()
+
+    def server_stop(self) -> None:
+        super().server_stop()
+        for process in self._processes:
+            process.terminate()
+        self._processes.clear()
+        # Terminated workers cannot remove their own Unix sockets
+        for address in self._private[1:]:
+            path = unix_path(address)
+            if path is not None:
+                remove_unix(path)
+
+    def _shard_of(self, key_hash: int) -> RemoteNode:
+        return self._workers[key_hash % self._shards]
+
+    def _owner(self, key_hash: int) -> Node:
+        node = self.find_successor(key_hash)
+        return self._shard_of(key_hash) if node == self else node
+
+    def _fan_out(self, call: Callable[[int, RemoteNode], T]) -> List[T]:
+        with ThreadPoolExecutor(self._shards) as pool:
+            return list(pool.map(call, range(self._shards), self._workers))
+
+    # With replication on, keys go through the quorum paths of LocalNode, whose
+    # local replica reads and writes are routed to the shards below
+    def get_stream(
+        self, key: str, trace: Optional[Trace] = None, r: Optional[int] = None
+    ) -> Tuple[Dict[str, Any], Optional[Iterator[bytes]]]:
+        if self._replicas > 1:
+            return super().get_stream(key, trace, r)
+        return self._owner(hash(key)).get_stream(key, trace)
+
+    def put(
+        self,
+        key: str,
+        value: Value,
+        ttl: Optional[float] = None,
+        w: Optional[int] = None,
+    ) -> None:
+        if self._replicas > 1:
+            super().put(key, value, ttl, w)
+        else:
+            self._forward_put(self._owner(hash(key)), key, value, ttl)
+
+    def put_stream(
+        self,
+        key: str,
+        value_type: str,
+        chunks: Iterable[bytes],
+        ttl: Optional[float] = None,
+        w: Optional[int] = None,
+    ) -> None:
+        if self._replicas > 1:
+            super().put_stream(key, value_type, chunks, ttl, w)
+        else:
+            self._owner(hash(key)).put_stream(key, value_type, chunks, ttl)
+
+    def _split(
+        self, values: Dict[str, Value], ttls: Dict[str, float]
+    ) -> List[Tuple[Dict[str, Value], Dict[str, float]]]:
+        parts: List[Tuple[Dict[str, Value], Dict[str, float]]] = [
+            ({}, {}) for _ in range(self._shards)
+        ]
+        for key, value in values.items():
+            shard_values, shard_ttls = parts[hash(key) % self._shards]
+            shard_values[key] = value
+            if key in ttls:
+                shard_ttls[key] = ttls[key]
+        return parts
+
+    def put_batch(self, values: Dict[str, Value], ttls: Dict[str, float]) -> None:
+        if self._replicas > 1:
+            super().put_batch(values, ttls)
+            return
+        parts = self._split(values, ttls)
+        self._fan_out(lambda shard, worker: worker.put_batch(*parts[shard]))
+
+    def replica_put(
+        self,
+        values: Dict[str, Value],
+        ttls: Dict[str, float],
+        versions: Dict[str, int],
+    ) -> None:
+        parts = self._split(values, ttls)
+        self._fan_out(
+            lambda shard, worker: worker.replica_put(*parts[shard], versions)
+        )
+
+    def replica_get(self, key: str) -> Optional[Tuple[Value, int, Optional[float]]]:
+        return self._shard_of(hash(key)).replica_get(key)
+
+    def read_range(
+        self, start: int, end: int
+    ) -> Tuple[Dict[str, Value], Dict[str, float], Dict[str, int]]:
+        data: Dict[str, Value] = {}
+        ttls: Dict[str, float] = {}
+        versions: Dict[str, int] = {}
+        for shard_data, shard_ttls, shard_versions in self._fan_out(
+            lambda _, worker: worker.read_range(start, end)
+        ):
+            data.update(shard_data)
+            ttls.update(shard_ttls)
+            versions.update(shard_versions)
+        return data, ttls, versions
+
+    def update_data(
+        self,
+        new_data: Dict[str, Value],
+        ttls: Optional[Dict[str, float]] = None,
+        overwrite: bool = True,
+    ) -> None:
+        parts = self._split(new_data, ttls or {})
+        self._fan_out(
+            lambda shard, worker: worker.update_data(*parts[shard], overwrite)
+        )
+
+    def merkle_digests(self, start: int, end: int, indices: List[int]) -> List[int]:
+        # Shards hold disjoint keys, so the node's digests are their XOR
+        digests = [0] * len(indices)
+        for shard_digests in self._fan_out(
+            lambda _, worker: worker.merkle_digests(start, end, indices)
+        ):
+            digests = [a ^ b for a, b in zip(digests, shard_digests)]
+        return digests
+
+    def snapshot(self) -> Tuple[Dict[str, Value], Dict[str, float]]:
+        data: Dict[str, Value] = {}
+        ttls: Dict[str, float] = {}
+        snapshots = self._fan_out(lambda _, worker: worker.snapshot())
+        for shard_data, shard_ttls in snapshots:
+            data.update(shard_data)
+            ttls.update(shard_ttls)
+        return data, ttls
+
+    def _take_range(
+        self, start: int, end: int
+    ) -> Tuple[Dict[str, Value], Dict[str, float]]:
+        data: Dict[str, Value] = {}
+        ttls: Dict[str, float] = {}
+        for shard_data, shard_ttls in self._fan_out(
+            lambda _, worker: worker.take_range(start, end)
+        ):
+            data.update(shard_data)
+            ttls.update(shard_ttls)
+        return data, ttls
+
+    def scan(
+        self, cursor: Dict[str, Any], limit: int
+    ) -> Tuple[Dict[str, Value], Optional[Dict[str, Any]]]:
+        # Each shard returns its first `limit` keys after the cursor, so the
+        # first `limit` of the merged pages are exactly the node's next page
+        ring_size = 2**KEY_SPACE
+        position, segment_end = self._scan_segment(cursor)
+        pages = self._fan_out(lambda _, worker: worker.scan(cursor, limit))
+
+        merged: List[Tuple[int, str, Value]] = []
+        more = False
+        for items, shard_cursor in pages:
+            if shard_cursor is not None and shard_cursor["after"] is not None:
+                more = True
+            for key, value in items.items():
+                offset = cursor["offset"] + (hash(key) - position) % ring_size
+                merged.append((offset, key, value))
+        merged.sort(key=lambda item: (item[0], item[1]))
+
+        if len(merged) > limit:
+            more = True
+            merged = merged[:limit]
+        page = {key: value for _, key, value in merged}
+
+        if more and merged:
+            last_offset, last_key, _ = merged[-1]
+            return page, dict(cursor, offset=last_offset, after=last_key)
+        return page, self._scan_next_node(cursor, segment_end)
+
+    def get_load(self) -> Dict[str, Any]:
+        ring_size = 2**KEY_SPACE
+        prev = self._prev
+        prev_id = self.id if prev is None or prev == self else prev.id
+        loads = self._fan_out(lambda _, worker: worker.get_load())
+
+        # Shards hold uniform slices of the range, so the median of their
+        # split points approximates the split of the whole range
+        splits = sorted(
+            (load["split"] for load in loads if load["split"] is not None),
+            key=lambda split: (split - prev_id) % ring_size,
+        )
+        return {
+            "id": self.id,
+            "keys": sum(load["keys"] for load in loads),
+            "rate": self._request_rate.rate() + sum(load["rate"] for load in loads),
+            "split": splits[len(splits) // 2] if splits else None,
+        }
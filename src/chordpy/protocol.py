@@ -0,0 +1,212 @@
+import json
+import socket
+import struct
+import zlib
+
+from typing import Any, Dict, Final, Iterable, Iterator, List, Optional, Tuple
+
+from utils import Value
+
+
+CHUNK_SIZE: Final[int] = 64 * 1024
+COMPRESSION_MIN_SIZE: Final[int] = 1024
+
+FRAME_HEADER: Final[struct.Struct] = struct.Struct("!BI")
+
+HEADER: Final[int] = 0x01
+CHUNK: Final[int] = 0x02
+END: Final[int] = 0x03
+KIND_MASK: Final[int] = 0x0F
+
+FLAG_BODY: Final[int] = 0x10
+FLAG_ACCEPT_ZLIB: Final[int] = 0x20
+FLAG_COMPRESSED: Final[int] = 0x40
+
+
+# Every message is a JSON header frame, optionally followed by chunk frames
+# and an end frame. Compressed chunks are flagged and always readable, so a
+# side that opted in compresses what it sends unless the peer has said it
+# does not want compression; responses thus go compressed only to requests
+# that asked for it.
+class Connection:
+    def __init__(self, sock: socket.socket, compress: bool = False) -> None:
+        self._sock: socket.socket = sock
+        self._compress: bool = compress
+        # Unknown until the peer's first message
+        self._peer_accepts_zlib: Optional[bool] = None
+        # Bytes read ahead by fill() and not parsed yet
+        self._buffer: bytearray = bytearray()
+
+    @property
+    def socket(self) -> socket.socket:
+        return self._sock
+
+    def send(self, header: str, body: Optional[Iterable[bytes]] = None) -> None:
+        flags = HEADER
+        if body is not None:
+            flags |= FLAG_BODY
+        if self._compress:
+            flags |= FLAG_ACCEPT_ZLIB
+        self._send_frame(flags, header.encode())
+
+        if body is None:
+            return
+
+        compress = self._compress and self._peer_accepts_zlib is not False
+        for chunk in body:
+            self._send_frame(*chunk_frame(chunk, compress))
+        self._send_frame(END, b"")
+
+    def recv(self) -> Tuple[Optional[Dict[str, Any]], Optional[Iterator[bytes]]]:
+        frame = self._recv_frame()
+        if frame is None:
+            return None, None
+
+        flags, payload = frame
+        if flags & KIND_MASK != HEADER:
+            raise ValueError("Expected a header frame")
+        self._peer_accepts_zlib = bool(flags & FLAG_ACCEPT_ZLIB)
+
+        header = json.loads(payload)
+        if not flags & FLAG_BODY:
+            return header, None
+        return header, self._recv_body()
+
+    def close(self) -> None:
+        self._sock.close()
+
+    # For a socket a selector reported readable, where one read never blocks;
+    # False once the peer has closed the connection
+    def fill(self) -> bool:
+        data = self._sock.recv(CHUNK_SIZE)
+        self._buffer += data
+        return bool(data)
+
+    @property
+    def buffered(self) -> bool:
+        return bool(self._buffer)
+
+    # Flags of the next frame once it has been read ahead in full
+    def buffered_frame(self) -> Optional[int]:
+        if len(self._buffer) < FRAME_HEADER.size:
+            return None
+        flags, length = FRAME_HEADER.unpack_from(self._buffer)
+        if len(self._buffer) < FRAME_HEADER.size + length:
+            return None
+        return flags
+
+    def drop_frame(self) -> None:
+        _, length = FRAME_HEADER.unpack_from(self._buffer)
+        del self._buffer[: FRAME_HEADER.size + length]
+
+    def _recv_body(self) -> Iterator[bytes]:
+        while True:
+            frame = self._recv_frame()
+            if frame is None:
+                raise ConnectionError("Connection closed in the middle of a body")
+
+            flags, payload = frame
+            kind = flags & KIND_MASK
+            if kind == END:
+                return
+            if kind != CHUNK:
+                raise ValueError("Expected a chunk frame")
+
+            yield zlib.decompress(payload) if flags & FLAG_COMPRESSED else payload
+
+    def _send_frame(self, flags: int, payload: bytes | memoryview) -> None:
+        self._sock.sendall(FRAME_HEADER.pack(flags, len(payload)))
+        if payload:
+            self._sock.sendall(payload)
+
+    def _recv_frame(self) -> Optional[Tuple[int, bytes]]:
+        head = self._recv_exact(FRAME_HEADER.size)
+        if head is None:
+            return None
+        flags, length = FRAME_HEADER.unpack(head)
+        payload = self._recv_exact(length) if length else b""
+        if payload is None:
+            raise ConnectionError("Connection closed in the middle of a frame")
+        return flags, payload
+
+    def _recv_exact(self, size: int) -> Optional[bytes]:
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = min(size, len(self._buffer))
+        if received:
+            buffer[:received] = self._buffer[:received]
+            del self._buffer[:received]
+        while received < size:
+            n = self._sock.recv_into(view[received:])
+            if n == 0:
+                if received == 0:
+                    return None
+                raise ConnectionError("Connection closed in the middle of a frame")
+            received += n
+        return bytes(buffer)
+
+
+def chunk_frame(
+    chunk: bytes | memoryview, compress: bool
+) -> Tuple[int, bytes | memoryview]:
+    if compress and len(chunk) >= COMPRESSION_MIN_SIZE:
+        packed = zlib.compress(chunk, 1)
+        if len(packed) < len(chunk):
+            return CHUNK | FLAG_COMPRESSED, packed
+    return CHUNK, chunk
+
+
+def encode_value(value: Value) -> Tuple[str, bytes]:
+    if isinstance(value, bytes):
+        return "bytes", value
+    return "str", value.encode()
+
+
+def decode_value(value_type: str, data: bytes) -> Value:
+    if value_type == "bytes":
+        return data
+    return data.decode()
+
+
+def chunked(data: bytes) -> Iterator[memoryview]:
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield view[start : start + CHUNK_SIZE]
+
+
+def pack_values(values: Dict[str, Value]) -> Tuple[List[List[Any]], Iterator[bytes]]:
+    encoded = [(key, *encode_value(value)) for key, value in values.items()]
+    entries = [[key, value_type, len(data)] for key, value_type, data in encoded]
+    return entries, _coalesce(data for _, _, data in encoded)
+
+
+def unpack_values(
+    entries: List[List[Any]], body: Optional[Iterable[bytes]]
+) -> Dict[str, Value]:
+    data = memoryview(b"".join(body or ()))
+    values: Dict[str, Value] = {}
+    offset = 0
+    for key, value_type, size in entries:
+        values[key] = decode_value(value_type, bytes(data[offset : offset + size]))
+        offset += size
+    return values
+
+
+def _coalesce(parts: Iterable[bytes]) -> Iterator[bytes]:
+    # Small values share chunks so a bulk transfer is not one frame per key
+    buffer = bytearray()
+    for data in parts:
+        if len(data) >= CHUNK_SIZE:
+            if buffer:
+                yield bytes(buffer)
+                buffer.clear()
+            yield from chunked(data)
+            continue
+
+        buffer += data
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
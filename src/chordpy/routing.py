@@ -0,0 +1,35 @@
+import contextlib
+import threading
+
+from typing import Any, Callable, Dict, Final, Iterator, List, Optional
+
+
+# Requests whose responses may carry the responder's view of its neighbourhood
+HINTED_REQUESTS: Final[frozenset[str]] = frozenset({"FIND_SUCCESSOR", "LOOKUP", "PUT"})
+
+HintListener = Callable[[List[Dict[str, Any]]], None]
+
+
+# Hands node refs seen in responses to the local node whose request they
+# answer; several nodes may share a process, so each thread says which node
+# it acts for, as with the network emulator
+class RoutingHints:
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def acting_for(self, listener: HintListener) -> Iterator[None]:
+        previous: Optional[HintListener] = getattr(self._local, "listener", None)
+        self._local.listener = listener
+        try:
+            yield
+        finally:
+            self._local.listener = previous
+
+    def offer(self, refs: List[Dict[str, Any]]) -> None:
+        listener: Optional[HintListener] = getattr(self._local, "listener", None)
+        if listener is not None:
+            listener(refs)
+
+
+routing_hints = RoutingHints()
@@ -0,0 +1,29 @@
+import json
+import os
+
+from typing import Dict, Optional, Tuple
+
+from protocol import pack_values, unpack_values
+from utils import Value
+
+
+# Snapshot layout: one JSON line with the entries and TTLs, then the packed values
+def save_snapshot(path: str, data: Dict[str, Value], ttls: Dict[str, float]) -> None:
+    entries, body = pack_values(data)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as snapshot:
+        snapshot.write(json.dumps({"entries": entries, "ttls": ttls}).encode())
+        snapshot.write(b"\n")
+        for chunk in body:
+            snapshot.write(chunk)
+    os.replace(temp_path, path)
+
+
+def load_snapshot(path: str) -> Optional[Tuple[Dict[str, Value], Dict[str, float]]]:
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as snapshot:
+        header = json.loads(snapshot.readline())
+        data = unpack_values(header["entries"], [snapshot.read()])
+    return data, header["ttls"]
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from typing import Callable, Dict, List, Optional
+
+from logger import logger
+
+
+class TimerWheel:
+    def __init__(
+        self,
+        on_expire: Callable[[List[str]], None],
+        tick: float = 0.1,
+        slots: int = 512,
+    ) -> None:
+        self._on_expire = on_expire
+        self._tick: float = tick
+        self._slots: List[Dict[str, float]] = [{} for _ in range(slots)]
+        self._current_tick: int = self._tick_of(time.monotonic()) - 1
+        self._lock: threading.Lock = threading.Lock()
+        self._running: bool = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _tick_of(self, deadline: float) -> int:
+        return int(deadline / self._tick)
+
+    def schedule(self, key: str, deadline: float) -> None:
+        with self._lock:
+            # Deadlines that fall on an already processed tick go in the next slot
+            tick = max(self._tick_of(deadline), self._current_tick + 1)
+            self._slots[tick % len(self._slots)][key] = deadline
+        self.start()
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info("Expiry timer wheel started")
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _run(self) -> None:
+        while self._running:
+            time.sleep(self._tick)
+            self._advance(time.monotonic())
+
+    def _advance(self, now: float) -> None:
+        # A tick is only processed once it has fully elapsed
+        target_tick = self._tick_of(now) - 1
+        with self._lock:
+            # One lap visits every slot and takes all that is due in it, so a
+            # wheel left idle for long need not step through each missed tick
+            lap_start = target_tick - len(self._slots)
+            self._current_tick = max(self._current_tick, lap_start)
+        while self._current_tick < target_tick:
+            with self._lock:
+                self._current_tick += 1
+                slot = self._slots[self._current_tick % len(self._slots)]
+                # Entries for later rotations stay in the slot until their turn
+                due = [key for key, deadline in slot.items() if deadline <= now]
+                for key in due:
+                    del slot[key]
+
+            if due:
+                try:
+                    self._on_expire(due)
+                except Exception as e:
+                    logger.error(f"Error expiring {len(due)} keys: {e}")
@@ -0,0 +1,173 @@
+import bisect
+import json
+import time
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import IO, Any, Dict, Final, List, Optional, Set, Tuple
+
+from bulk import MAX_RING_SIZE
+from node.interface import Node
+from utils import KEY_SPACE, in_interval
+from logger import logger
+
+
+DEFAULT_CRAWL_WORKERS: Final[int] = 16
+
+Probe = Tuple[Dict[str, Any], Dict[str, Any]]
+
+
+def _probe(node: Node) -> Probe:
+    return node.get_state(successors=True, fingers=True), node.get_load()
+
+
+def _node_id(node: Optional[Node]) -> Optional[int]:
+    return node.id if node is not None else None
+
+
+# Visits every node reachable from the entry. Each answer names the node's
+# neighbours, successors and fingers, so the frontier grows by up to
+# O(log n) nodes per probe and the probes of a wave run side by side
+def crawl_ring(
+    entry: Node, workers: int = DEFAULT_CRAWL_WORKERS
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    seen: Set[str] = {str(entry.address)}
+    reports: List[Dict[str, Any]] = []
+    unreachable: List[str] = []
+
+    with ThreadPoolExecutor(workers) as pool:
+        pending: Dict[Future[Probe], Node] = {pool.submit(_probe, entry): entry}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = pending.pop(future)
+                try:
+                    state, load = future.result()
+                except Exception as e:
+                    logger.warning(f"Could not probe node {node.address}: {e}")
+                    unreachable.append(str(node.address))
+                    continue
+
+                reports.append(
+                    {
+                        "id": state["id"],
+                        "address": str(node.address),
+                        "prev": _node_id(state["prev"]),
+                        "next": _node_id(state["next"]),
+                        "successors": [_node_id(n) for n in state["successors"]],
+                        "fingers": [_node_id(n) for n in state["fingers"]],
+                        "keys": load["keys"],
+                        "rate": load["rate"],
+                    }
+                )
+                peers = [state["prev"], state["next"]]
+                for peer in peers + state["successors"] + state["fingers"]:
+                    if peer is None or len(seen) >= MAX_RING_SIZE:
+                        continue
+                    address = str(peer.address)
+                    if address not in seen:
+                        seen.add(address)
+                        pending[pool.submit(_probe, peer)] = peer
+
+    return reports, sorted(unreachable)
+
+
+def _finger_ok(
+    node_id: int, i: int, finger: Optional[int], ids: List[int], members: Set[int]
+) -> bool:
+    if finger is None:
+        return False
+    ring_size = 2**KEY_SPACE
+    target = (node_id + 2**i) % ring_size
+    if finger == ids[bisect.bisect_left(ids, target) % len(ids)]:
+        return True
+    # Fingers may be any live node of [id + 2**i, id + 2**(i+1)), see
+    # LocalNode._proximate_finger
+    end = (node_id + 2 ** (i + 1)) % ring_size
+    return finger in members and in_interval(
+        finger, target, end, include_start=True, include_end=False
+    )
+
+
+# Compares what each node believes about the ring with the ring the crawl
+# actually found, and measures how evenly keys, ranges and requests spread
+def ring_snapshot(entry: Node, workers: int = DEFAULT_CRAWL_WORKERS) -> Dict[str, Any]:
+    started = time.perf_counter()
+    reports, unreachable = crawl_ring(entry, workers)
+    elapsed = time.perf_counter() - started
+    if not reports:
+        raise RuntimeError(f"Node {entry.address} is unreachable")
+
+    reports.sort(key=lambda report: report["id"])
+    ids = [report["id"] for report in reports]
+    members = set(ids)
+    ring_size = 2**KEY_SPACE
+    count = len(reports)
+
+    nodes: List[Dict[str, Any]] = []
+    for index, report in enumerate(reports):
+        node_id = report["id"]
+        prev_id = ids[index - 1]
+        next_id = ids[(index + 1) % count]
+        bad_fingers = [
+            i
+            for i, finger in enumerate(report["fingers"])
+            if not _finger_ok(node_id, i, finger, ids, members)
+        ]
+        issues: List[str] = []
+        if report["prev"] != prev_id:
+            issues.append("prev")
+        if report["next"] != next_id:
+            issues.append("next")
+        if any(successor not in members for successor in report["successors"]):
+            issues.append("successors")
+        if bad_fingers:
+            issues.append("fingers")
+        nodes.append(
+            {
+                "id": node_id,
+                "address": report["address"],
+                "width": (node_id - prev_id) % ring_size or ring_size,
+                "keys": report["keys"],
+                "rate": round(report["rate"], 2),
+                "prev": report["prev"],
+                "next": report["next"],
+                "bad_fingers": bad_fingers,
+                "issues": issues,
+            }
+        )
+
+    keys = sum(node["keys"] for node in nodes)
+    rate = sum(node["rate"] for node in nodes)
+    # Ratios of the largest share to the fair one; 1.0 is a perfect spread
+    summary = {
+        "taken_at": time.time(),
+        "crawl_seconds": round(elapsed, 3),
+        "nodes": count,
+        "unreachable": unreachable,
+        "keys": keys,
+        "rate": round(rate, 2),
+        "max_keys_ratio": _ratio(max(node["keys"] for node in nodes), keys, count),
+        "max_width_ratio": _ratio(
+            max(node["width"] for node in nodes), ring_size, count
+        ),
+        "max_rate_ratio": _ratio(max(node["rate"] for node in nodes), rate, count),
+        "inconsistent": sum(1 for node in nodes if node["issues"]),
+    }
+    logger.info(
+        f"Crawled {count} nodes in {elapsed:.2f}s, {len(unreachable)} unreachable,"
+        f" {summary['inconsistent']} with inconsistent routing state"
+    )
+    return {"summary": summary, "nodes": nodes}
+
+
+def _ratio(largest: float, total: float, count: int) -> float:
+    return round(largest * count / total, 3) if total else 0.0
+
+
+# One compact JSON line for the summary and then one per node in ring order,
+# so large snapshots can be filtered line by line
+def write_snapshot(file: IO[str], snapshot: Dict[str, Any]) -> int:
+    file.write(json.dumps(snapshot["summary"], separators=(",", ":")) + "\n")
+    for node in snapshot["nodes"]:
+        file.write(json.dumps(node, separators=(",", ":")) + "\n")
+    return len(snapshot["nodes"])
@@ -0,0 +1,118 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+
+from collections import Counter
+from typing import Any, Dict, Final, List, Optional
+
+
+DEFAULT_SAMPLE_INTERVAL: Final[float] = 0.005
+DEFAULT_REPORT_LIMIT: Final[int] = 40
+
+Trace = List[Dict[str, Any]]
+
+
+# Decides which lookups carry a trace. Unsampled lookups pass no trace at all,
+# so tracing costs nothing while the rate is zero.
+class Tracer:
+    def __init__(self, sample_rate: float = 0.0) -> None:
+        self.sample_rate: float = sample_rate
+
+    def sampled(self) -> Optional[Trace]:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return []
+        return None
+
+
+def format_trace(trace: Trace) -> str:
+    return " -> ".join(
+        f"{hop['node']} [{hop['action']}, {hop.get('elapsed_ms', 0):.2f}ms"
+        f", queued {hop.get('queue_ms', 0):.2f}ms]"
+        for hop in trace
+    )
+
+
+# Profiles the whole process on demand, either with cProfile or by sampling
+# the stacks of every thread at a fixed interval
+class Profiler:
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._mode: Optional[str] = None
+        self._started: float = 0.0
+        self._profile: Optional[cProfile.Profile] = None
+        self._stacks: Counter = Counter()
+        self._samples: int = 0
+        self._stop: threading.Event = threading.Event()
+
+    @property
+    def mode(self) -> Optional[str]:
+        return self._mode
+
+    def start(self, mode: str, interval: float = DEFAULT_SAMPLE_INTERVAL) -> None:
+        with self._lock:
+            if self._mode is not None:
+                raise RuntimeError(f"Profiler already running in {self._mode} mode")
+            if mode == "cprofile":
+                # Since Python 3.12 this covers every thread, not just the caller
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+            elif mode == "sample":
+                self._stacks = Counter()
+                self._samples = 0
+                self._stop.clear()
+                sampler = threading.Thread(target=self._sample_loop, args=(interval,))
+                sampler.daemon = True
+                sampler.start()
+            else:
+                raise ValueError(f"Unknown profiler mode: {mode}")
+            self._mode = mode
+            self._started = time.monotonic()
+
+    def stop(self, limit: int = DEFAULT_REPORT_LIMIT) -> Dict[str, Any]:
+        with self._lock:
+            if self._mode is None:
+                raise RuntimeError("Profiler is not running")
+            mode, self._mode = self._mode, None
+            report: Dict[str, Any] = {
+                "mode": mode,
+                "seconds": time.monotonic() - self._started,
+            }
+            if mode == "cprofile" and self._profile is not None:
+                self._profile.disable()
+                output = io.StringIO()
+                stats = pstats.Stats(self._profile, stream=output)
+                stats.sort_stats("cumulative").print_stats(limit)
+                report["report"] = output.getvalue()
+                self._profile = None
+            else:
+                self._stop.set()
+                report["samples"] = self._samples
+                report["stacks"] = [
+                    [stack, count] for stack, count in self._stacks.most_common(limit)
+                ]
+            return report
+
+    def _sample_loop(self, interval: float) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                # Collapsed stacks, outermost first, as flame graph tools expect
+                calls: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    module = os.path.basename(code.co_filename)
+                    calls.append(f"{module}:{code.co_name}")
+                    frame = frame.f_back
+                self._stacks[";".join(reversed(calls))] += 1
+            self._samples += 1
+
+
+tracer = Tracer()
+profiler = Profiler()
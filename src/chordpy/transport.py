@@ -0,0 +1,139 @@
+import functools
+import os
+import socket
+import stat
+import tempfile
+
+from typing import Final, Optional, Set
+
+from address import Address
+from logger import logger
+
+
+SOCKET_DIR_MODE: Final[int] = 0o700
+
+
+# Sockets live in a directory only this user can write to, so that no one else
+# can plant a socket for nodes to connect to or have theirs removed; None if
+# there is no such directory and peers should stick to TCP
+@functools.lru_cache(maxsize=1)
+def socket_dir() -> Optional[str]:
+    configured = os.environ.get("CHORDPY_SOCKET_DIR")
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if configured:
+        path = configured
+    elif runtime:
+        path = os.path.join(runtime, "chordpy")
+    else:
+        path = os.path.join(tempfile.gettempdir(), f"chordpy-{os.getuid()}")
+    try:
+        os.makedirs(path, mode=SOCKET_DIR_MODE, exist_ok=True)
+        info = os.lstat(path)
+    except OSError as e:
+        logger.warning(f"Not using Unix sockets, {path} is unusable: {e}")
+        return None
+    private = stat.S_ISDIR(info.st_mode) and not info.st_mode & 0o077
+    if not private or info.st_uid != os.getuid():
+        logger.warning(f"Not using Unix sockets, {path} is not private to this user")
+        return None
+    return path
+
+
+# Nodes on this machine also listen on a Unix socket named after the address
+# they advertise, so a peer can skip the TCP stack when both share a host
+def unix_path(address: Address) -> Optional[str]:
+    directory = socket_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, f"chordpy-{address.ip}-{address.port}.sock")
+
+
+def _own_socket(path: str) -> bool:
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+
+def remove_unix(path: str) -> None:
+    if not _own_socket(path):
+        return
+    try:
+        os.unlink(path)
+    except OSError as e:
+        logger.warning(f"Could not remove Unix socket {path}: {e}")
+
+
+@functools.lru_cache(maxsize=1)
+def local_ips() -> Set[str]:
+    ips = {"127.0.0.1", "localhost", "0.0.0.0"}
+    try:
+        ips.update(socket.gethostbyname_ex(socket.gethostname())[2])
+    except OSError:
+        pass
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe.connect(("8.8.8.8", 80))
+        ips.add(probe.getsockname()[0])
+    except OSError:
+        pass
+    finally:
+        probe.close()
+    return ips
+
+
+def local_path(address: Address) -> Optional[str]:
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    if address.ip not in local_ips() and not address.ip.startswith("127."):
+        return None
+    path = unix_path(address)
+    return path if path is not None and _own_socket(path) else None
+
+
+def connect(
+    address: Address, unix: bool = True, timeout: Optional[float] = None
+) -> socket.socket:
+    path = local_path(address) if unix else None
+    if path is not None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+            return sock
+        except OSError as e:
+            # Left behind by a node that did not shut down cleanly
+            logger.debug(f"Unix socket {path} unusable, falling back to TCP: {e}")
+            sock.close()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address.as_tuple)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def listen_unix(address: Address) -> Optional[socket.socket]:
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = unix_path(address)
+    if path is None:
+        return None
+    server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # Left behind by a node that did not shut down cleanly
+        if _own_socket(path):
+            os.unlink(path)
+        server_socket.bind(path)
+        # Unix sockets refuse connections once the backlog is full instead of
+        # letting the client retry like TCP does, so take the system maximum
+        server_socket.listen(socket.SOMAXCONN)
+    except OSError as e:
+        logger.warning(f"Could not listen on Unix socket {path}: {e}")
+        server_socket.close()
+        return None
+    return server_socket
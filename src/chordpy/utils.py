@@ -1,8 +1,10 @@
 import hashlib
-from typing import Final
+from typing import Final, TypeAlias
 
 KEY_SPACE: Final[int] = 16
 
+Value: TypeAlias = str | bytes
+
 
 def hash(key: str) -> int:
     return int(hashlib.sha1(key.encode()).hexdigest(), 16) % (2**KEY_SPACE)
@@ -0,0 +1,12 @@
+from typing import Iterator
+
+import pytest
+
+from tests.helpers import Cluster
+
+
+@pytest.fixture
+def cluster() -> Iterator[Cluster]:
+    cluster = Cluster()
+    yield cluster
+    cluster.stop()
@@ -0,0 +1,84 @@
+import socket
+import threading
+import time
+
+from typing import Any, Callable, List, Type
+
+from address import Address
+from node.local import LocalNode
+from node.remote import RemoteNode
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def wait_listening(address: Address, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(address.as_tuple, timeout=0.2).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+
+
+# Runs fn on a thread so that a deadlock fails the test instead of hanging it
+def within(timeout: float, fn: Callable[..., Any], *args: Any) -> Any:
+    result: List[Any] = []
+    error: List[BaseException] = []
+
+    def run() -> None:
+        try:
+            result.append(fn(*args))
+        except BaseException as e:
+            error.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise AssertionError(f"{fn} did not finish within {timeout}s")
+    if error:
+        raise error[0]
+    return result[0]
+
+
+class Cluster:
+    def __init__(self) -> None:
+        self.nodes: List[LocalNode] = []
+
+    def start(self, cls: Type[LocalNode] = LocalNode, **kwargs: Any) -> LocalNode:
+        port = free_port()
+        address = Address("127.0.0.1", port)
+        node = cls(host="127.0.0.1", port=port, advertise=address, **kwargs)
+        threading.Thread(target=node.server_start, daemon=True).start()
+        wait_listening(address)
+        self.nodes.append(node)
+        return node
+
+    def ring(self, size: int, **kwargs: Any) -> List[LocalNode]:
+        nodes = [self.start(**kwargs) for _ in range(size)]
+        nodes[0].join()
+        for node in nodes[1:]:
+            node.join(RemoteNode(nodes[0].address))
+        self.stabilize(nodes)
+        return sorted(nodes, key=lambda node: node.id)
+
+    @staticmethod
+    def stabilize(nodes: List[LocalNode], rounds: int = 2) -> None:
+        for _ in range(rounds):
+            for node in nodes:
+                within(10.0, node._stabilize)
+
+    def stop(self) -> None:
+        for node in self.nodes:
+            node.server_stop()
+
+
+def remote(node: LocalNode) -> RemoteNode:
+    return RemoteNode(node.address, node.id)
@@ -0,0 +1,156 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pytest
+
+from address import Address
+from admission import RequestPool, waiting_on_peer
+from node.remote import RemoteNode
+from protocol import Connection
+from tests.helpers import free_port, wait_listening, within
+
+
+CHORDPY = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src", "chordpy")
+
+
+class BlockingServer:
+    def __init__(self, workers: int = 1, queue_size: int = 1) -> None:
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.pool = RequestPool(self.serve, workers, 1, queue_size)
+        self.pool.start()
+
+    def serve(
+        self,
+        connection: Connection,
+        request: Dict,
+        body: Optional[Iterator[bytes]],
+        process: Any,
+    ) -> None:
+        self.started.release()
+        if request["type"] == "BLOCK":
+            self.release.wait(10.0)
+        elif request["type"] == "FORWARD":
+            with waiting_on_peer():
+                self.release.wait(10.0)
+        connection.send(json.dumps({"served": request["type"]}))
+
+    def send(self, type: str, **params: Any) -> Connection:
+        ours, theirs = socket.socketpair()
+        connection = Connection(ours)
+        connection.send(json.dumps({"type": type, "parameters": params}))
+        self.pool.add(theirs, "test", lambda request, body: {}, False)
+        return connection
+
+
+@pytest.fixture
+def server() -> Iterator[BlockingServer]:
+    server = BlockingServer()
+    yield server
+    server.release.set()
+    server.pool.stop()
+
+
+def answer(connection: Connection) -> Dict[str, Any]:
+    response, _ = within(5.0, connection.recv)
+    return response
+
+
+def test_full_lane_refuses_with_overloaded(server: BlockingServer) -> None:
+    busy = server.send("BLOCK")
+    assert server.started.acquire(timeout=5.0)
+    queued = server.send("BLOCK")
+    time.sleep(0.2)
+
+    refused = server.send("LOOKUP")
+
+    assert answer(refused)["error"] == "overloaded"
+    server.release.set()
+    assert answer(busy) == {"served": "BLOCK"}
+    assert answer(queued) == {"served": "BLOCK"}
+
+
+def test_priority_requests_skip_a_busy_lane(server: BlockingServer) -> None:
+    server.send("BLOCK")
+    assert server.started.acquire(timeout=5.0)
+    server.send("BLOCK")
+
+    assert answer(server.send("GET_STATE")) == {"served": "GET_STATE"}
+
+
+def test_workers_waiting_on_peers_hand_over_their_slot(
+    server: BlockingServer,
+) -> None:
+    forwarding = server.send("FORWARD")
+    assert server.started.acquire(timeout=5.0)
+
+    assert answer(server.send("LOOKUP")) == {"served": "LOOKUP"}
+    server.release.set()
+    assert answer(forwarding) == {"served": "FORWARD"}
+    # The stand-in leaves once the worker it replaced is back
+    deadline = time.monotonic() + 5.0
+    while server.pool._threads[False] > 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.pool._threads[False] == 1
+
+
+def test_a_slow_header_does_not_hold_up_other_clients(server: BlockingServer) -> None:
+    ours, theirs = socket.socketpair()
+    ours.send(b"\x01\x00\x00")
+    server.pool.add(theirs, "slow", lambda request, body: {}, False)
+
+    assert answer(server.send("LOOKUP")) == {"served": "LOOKUP"}
+    ours.close()
+
+
+def test_forwarded_gets_do_not_freeze_the_ring() -> None:
+    # Client requests hold every worker of both nodes while each forwards to
+    # the other; the nodes run in processes of their own, as in production
+    ports = [free_port() for _ in range(2)]
+    daemons: List[subprocess.Popen] = []
+    try:
+        for port in ports:
+            args = ["--bind", "127.0.0.1", "--port", str(port), "--server-workers", "4"]
+            args += ["--advertise", f"127.0.0.1:{port}", "--no-unix-socket"]
+            if daemons:
+                args += ["--seed", f"127.0.0.1:{ports[0]}"]
+            daemons.append(
+                subprocess.Popen(
+                    [sys.executable, "daemon.py", *args],
+                    cwd=CHORDPY,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            )
+            wait_listening(Address("127.0.0.1", port), timeout=15.0)
+            time.sleep(0.3)
+
+        nodes = [RemoteNode(Address("127.0.0.1", port)) for port in ports]
+        for i in range(100):
+            nodes[0].put(f"key-{i}", f"value-{i}")
+        results: List[Tuple[str, Any]] = []
+
+        def client(n: int) -> None:
+            for j in range(20):
+                key = f"key-{(n * 20 + j) % 100}"
+                results.append((key, nodes[n % 2].get(key, None)[0]))
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30.0)
+
+        assert len(results) == 320
+        assert all(value == "value-" + key[4:] for key, value in results)
+    finally:
+        for daemon in daemons:
+            daemon.kill()
+            daemon.wait()
@@ -0,0 +1,89 @@
+import asyncio
+
+from typing import Any, Coroutine, Dict, Iterator, Optional
+
+import pytest
+
+from aioclient import AsyncChordClient
+from node.local import LocalNode
+from tests.helpers import Cluster, within
+
+
+def run(coroutine: Coroutine[Any, Any, Any]) -> Any:
+    return within(30.0, asyncio.run, coroutine)
+
+
+def test_client_learns_the_ring_and_talks_to_owners(cluster: Cluster) -> None:
+    nodes = cluster.ring(3)
+
+    async def main() -> None:
+        async with AsyncChordClient([nodes[1].address]) as client:
+            assert client.ring == [(node.id, node.address) for node in nodes]
+            await asyncio.gather(
+                *(client.put(f"key-{i}", f"value-{i}") for i in range(100))
+            )
+            values = await asyncio.gather(
+                *(client.get(f"key-{i}") for i in range(100))
+            )
+            assert values == [f"value-{i}" for i in range(100)]
+            assert await client.get("missing") is None
+
+    run(main())
+    assert sum(len(node.data) for node in nodes) == 100
+
+
+def test_binary_values_with_compression(cluster: Cluster) -> None:
+    nodes = cluster.ring(2)
+    value = b"\x00\x01" * 200_000
+
+    async def main() -> Any:
+        async with AsyncChordClient([nodes[0].address], compression=True) as client:
+            await client.put("blob", value, ttl=60.0)
+            return await client.get("blob")
+
+    assert run(main()) == value
+
+
+def test_reads_survive_a_node_leaving(cluster: Cluster) -> None:
+    nodes = cluster.ring(3)
+    seed, leaving = nodes[0], nodes[1]
+
+    async def main() -> None:
+        async with AsyncChordClient([seed.address], pool_size=1) as client:
+            for i in range(30):
+                await client.put(f"key-{i}", f"value-{i}")
+            leaving.exit_network()
+            leaving.server_stop()
+            cluster.stabilize([seed, nodes[2]])
+            for i in range(30):
+                assert await client.get(f"key-{i}") == f"value-{i}"
+
+    run(main())
+
+
+class RefusingNode(LocalNode):
+    def _process_request(
+        self, request: Dict, body: Optional[Iterator[bytes]] = None
+    ) -> Dict:
+        if request["type"] in ("LOOKUP", "PUT"):
+            return {"success": False, "message": "Quórum inválido"}
+        return super()._process_request(request, body)
+
+
+def test_failed_requests_are_not_missing_keys(cluster: Cluster) -> None:
+    node = cluster.start(RefusingNode)
+    node.join()
+
+    async def main() -> None:
+        async with AsyncChordClient([node.address]) as client:
+            with pytest.raises(ValueError, match="Quórum inválido"):
+                await client.get("key")
+            with pytest.raises(ValueError, match="Quórum inválido"):
+                await client.put("key", "value")
+
+    run(main())
+
+
+def test_a_client_needs_a_seed() -> None:
+    with pytest.raises(ValueError):
+        AsyncChordClient([])
@@ -0,0 +1,45 @@
+import pytest
+
+from metrics import RateMeter
+from utils import hash, in_interval
+from tests.helpers import Cluster, remote
+
+
+def test_rate_meter_smooths_per_second_buckets() -> None:
+    meter = RateMeter(alpha=0.5)
+    start = meter._bucket_start
+
+    meter.mark(10)
+    meter._roll(start + 1.0)
+    assert meter._rate == pytest.approx(5.0)
+
+    # Two more seconds: one bucket with nothing in it, then the current one
+    meter._roll(start + 3.0)
+    assert meter._rate == pytest.approx(1.25)
+
+
+def test_load_reports_the_split_of_the_owned_keys(cluster: Cluster) -> None:
+    node = cluster.ring(1)[0]
+    for i in range(10):
+        node.put(f"key-{i}", "value")
+
+    load = remote(node).get_load()
+
+    # Clockwise from the node's own id, half of the keys come up to the split
+    first_half = [
+        i for i in range(10) if in_interval(hash(f"key-{i}"), node.id, load["split"])
+    ]
+    assert load["keys"] == 10 and len(first_half) == 5
+
+
+def test_balanced_join_takes_half_of_the_loaded_range(cluster: Cluster) -> None:
+    loaded = cluster.ring(1)[0]
+    for i in range(100):
+        loaded.put(f"key-{i}", "value")
+    joining = cluster.start()
+
+    joining.join(remote(loaded), balanced=True)
+    cluster.stabilize([loaded, joining])
+
+    assert 40 <= len(joining.data) <= 60
+    assert len(joining.data) + len(loaded.data) == 100
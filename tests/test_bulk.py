@@ -0,0 +1,68 @@
+import io
+
+from typing import List
+
+import pytest
+
+from bulk import (
+    Record,
+    export_records,
+    import_records,
+    read_records,
+    ring_members,
+    write_records,
+)
+from utils import hash
+from tests.helpers import Cluster, remote
+
+
+def test_import_spreads_records_over_their_owners(cluster: Cluster) -> None:
+    nodes = cluster.ring(3)
+    records: List[Record] = [(f"key-{i}", f"value-{i}", None) for i in range(200)]
+
+    assert import_records(remote(nodes[0]), records, batch_size=16) == 200
+
+    for key, value, _ in records:
+        owners = [node for node in nodes if key in node.data]
+        assert len(owners) == 1 and owners[0].data[key] == value
+        assert owners[0] == nodes[0].find_successor(hash(key))
+
+
+def test_export_returns_every_key_once_with_its_ttl(cluster: Cluster) -> None:
+    nodes = cluster.ring(3)
+    records: List[Record] = [(f"key-{i}", b"\x00" * i, None) for i in range(50)]
+    records.append(("expiring", "value", 60.0))
+    import_records(remote(nodes[1]), records)
+
+    exported = {key: (value, ttl) for key, value, ttl in export_records(nodes[2])}
+
+    assert len(exported) == len(records)
+    assert exported["key-7"] == (b"\x00" * 7, None)
+    value, ttl = exported["expiring"]
+    assert value == "value" and ttl is not None and 0 < ttl <= 60.0
+
+
+def test_ring_members_walks_the_whole_ring(cluster: Cluster) -> None:
+    nodes = cluster.ring(4)
+
+    members = ring_members(remote(nodes[2]))
+
+    assert [member.id for member in members] == [node.id for node in nodes]
+
+
+@pytest.mark.parametrize("format", ["jsonl", "csv"])
+def test_records_survive_a_file_round_trip(format: str) -> None:
+    records: List[Record] = [("a", "1", None), ("b", "dois, três", 30.0)]
+    if format == "jsonl":
+        records.append(("c", b"\xff\x00", None))
+    file = io.StringIO()
+
+    assert write_records(file, records, format) == len(records)
+    file.seek(0)
+
+    assert list(read_records(file, format)) == records
+
+
+def test_csv_refuses_binary_values() -> None:
+    with pytest.raises(ValueError):
+        write_records(io.StringIO(), [("key", b"\x00", None)], "csv")
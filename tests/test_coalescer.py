@@ -0,0 +1,113 @@
+import threading
+import time
+
+from typing import Dict, List, Optional
+
+import pytest
+
+from address import Address
+from coalescer import WriteCoalescer
+from utils import Value
+from tests.helpers import Cluster, remote
+
+
+class FakeOwner:
+    def __init__(self, port: int = 1, error: Optional[Exception] = None) -> None:
+        self.address = Address("127.0.0.1", port)
+        self.error = error
+        self.batches: List[Dict[str, Value]] = []
+        self.ttls: List[Dict[str, float]] = []
+
+    def put_batch(self, values: Dict[str, Value], ttls: Dict[str, float]) -> None:
+        self.batches.append(dict(values))
+        self.ttls.append(dict(ttls))
+        if self.error is not None:
+            raise self.error
+
+
+def put_concurrently(
+    coalescer: WriteCoalescer, owner: FakeOwner, keys: List[str]
+) -> List[BaseException]:
+    errors: List[BaseException] = []
+
+    def put(key: str) -> None:
+        try:
+            coalescer.put(owner, key, key, 10.0)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put, args=(key,)) for key in keys]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+    return errors
+
+
+def test_concurrent_puts_to_one_owner_share_a_batch() -> None:
+    owner = FakeOwner()
+    keys = [f"key-{i}" for i in range(20)]
+
+    assert not put_concurrently(WriteCoalescer(window=0.5), owner, keys)
+
+    assert sum(len(batch) for batch in owner.batches) == 20
+    assert len(owner.batches) < 20
+    assert owner.ttls[0] == {key: 10.0 for key in owner.batches[0]}
+
+
+def test_a_full_batch_is_sent_without_waiting_for_the_window() -> None:
+    owner = FakeOwner()
+    keys = [f"key-{i}" for i in range(8)]
+
+    assert not put_concurrently(WriteCoalescer(window=60.0, max_batch=4), owner, keys)
+
+    assert all(len(batch) <= 4 for batch in owner.batches)
+    assert sum(len(batch) for batch in owner.batches) == 8
+
+
+def test_every_caller_sees_the_batch_error() -> None:
+    owner = FakeOwner(error=ConnectionError("down"))
+    keys = [f"key-{i}" for i in range(5)]
+
+    errors = put_concurrently(WriteCoalescer(window=0.5), owner, keys)
+
+    assert len(errors) == 5 and all(isinstance(e, ConnectionError) for e in errors)
+
+
+def test_last_put_of_a_key_wins_and_drops_its_ttl() -> None:
+    owner = FakeOwner()
+    coalescer = WriteCoalescer(window=0.5)
+    first = threading.Thread(target=coalescer.put, args=(owner, "key", "old", 1.0))
+    first.start()
+    while not coalescer._open:
+        time.sleep(0.001)
+
+    coalescer.put(owner, "key", "new", None)
+    first.join(5.0)
+
+    assert owner.batches == [{"key": "new"}] and owner.ttls == [{}]
+
+
+def test_forwarded_puts_arrive_through_batches(
+    cluster: Cluster, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first, second = cluster.ring(2)
+    first.enable_write_coalescing(window=0.01)
+    batched: List[int] = []
+    original = second.put_batch
+
+    def put_batch(values: Dict[str, Value], ttls: Dict[str, float]) -> None:
+        batched.append(len(values))
+        original(values, ttls)
+
+    monkeypatch.setattr(second, "put_batch", put_batch)
+    keys = [f"key-{i}" for i in range(50)]
+    threads = [threading.Thread(target=first.put, args=(key, key)) for key in keys]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+
+    assert sum(batched) == len([key for key in keys if key in second.data])
+    for key in keys:
+        assert remote(second).get(key, None)[0] == key
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from typing import List
+
+from timer_wheel import TimerWheel
+from tests.helpers import Cluster, remote, within
+
+
+def test_wheel_expires_keys_once_their_deadline_passes() -> None:
+    expired: List[str] = []
+    wheel = TimerWheel(expired.extend, tick=10.0, slots=4)
+    start = (wheel._current_tick + 1) * 10.0
+    wheel.schedule("soon", start + 5.0)
+    # Lands in the same slot one rotation later
+    wheel.schedule("later", start + 45.0)
+    wheel.stop()
+
+    wheel._advance(start + 19.0)
+    assert expired == ["soon"]
+
+    wheel._advance(start + 45.0)
+    assert expired == ["soon"]
+    wheel._advance(start + 59.0)
+    assert expired == ["soon", "later"]
+
+
+def test_wheel_catches_up_on_deadlines_already_behind_it() -> None:
+    expired = threading.Event()
+    wheel = TimerWheel(lambda keys: expired.set(), tick=0.01)
+
+    wheel.schedule("key", time.monotonic() - 60.0)
+
+    assert expired.wait(2.0)
+    wheel.stop()
+
+
+def test_an_idle_wheel_catches_up_in_one_lap() -> None:
+    expired: List[str] = []
+    wheel = TimerWheel(expired.extend, tick=1.0, slots=4)
+    wheel.schedule("key", time.monotonic() + 2.0)
+    wheel.stop()
+
+    within(1.0, wheel._advance, time.monotonic() + 1e9)
+
+    assert expired == ["key"]
+
+
+def test_keys_with_a_ttl_disappear_from_the_ring(cluster: Cluster) -> None:
+    first, second = cluster.ring(2)
+
+    remote(first).put("short", "value", 0.2)
+    remote(first).put("kept", "value")
+    owner = first if "short" in first.data else second
+    assert remote(second).get("short", None)[0] == "value"
+
+    time.sleep(0.5)
+    assert remote(second).get("short", None)[0] == "Key not found"
+    assert remote(second).get("kept", None)[0] == "value"
+    assert "short" not in owner.data
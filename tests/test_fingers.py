@@ -0,0 +1,82 @@
+from typing import List, Tuple
+
+import pytest
+
+from address import Address
+from latency import LatencyTracker
+from netem import NetworkEmulator
+from node.interface import Node
+from node.local import LocalNode
+from node.remote import RemoteNode
+from utils import KEY_SPACE, in_interval
+from tests.helpers import Cluster
+
+
+def test_tracker_smooths_round_trip_times() -> None:
+    tracker = LatencyTracker(alpha=0.5)
+    address = Address("127.0.0.1", 1)
+
+    tracker.record(address, 0.1)
+    tracker.record(address, 0.3)
+
+    assert tracker.rtt(address) == pytest.approx(0.2)
+    assert tracker.rtt(Address("127.0.0.1", 2)) is None
+    assert tracker.snapshot() == {"127.0.0.1:1": pytest.approx(0.2)}
+
+
+def finger_with_choice(nodes: List[LocalNode]) -> Tuple[LocalNode, int, Node]:
+    # A node, a finger and a second node that would serve that finger as well
+    # as the exact successor of its target
+    ring = 2**KEY_SPACE
+    for node in nodes:
+        for i in range(KEY_SPACE - 1, 0, -1):
+            start, end = (node.id + 2**i) % ring, (node.id + 2 ** (i + 1)) % ring
+            inside = [
+                other
+                for other in nodes
+                if other != node and in_interval(other.id, start, end, True, False)
+            ]
+            exact = node.find_successor(start)
+            if exact in inside and exact.next in inside:
+                return node, i, exact.next
+    raise AssertionError("No finger has two candidates in this ring")
+
+
+def test_fingers_prefer_the_closest_valid_peer(
+    cluster: Cluster, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    nodes = cluster.ring(6)
+    node, i, faster = finger_with_choice(nodes)
+    tracker = LatencyTracker()
+    monkeypatch.setattr("node.local.latency_tracker", tracker)
+    for other in nodes:
+        tracker.record(other.address, 0.001 if other == faster else 0.05)
+
+    target = (node.id + 2**i) % (2**KEY_SPACE)
+    finger = node._proximate_finger(i, node.find_successor(target))
+
+    assert finger == faster
+    assert node._proximate_finger(0, node.next) == node.next
+
+
+def test_unmeasured_candidates_are_probed_for_their_latency(
+    cluster: Cluster, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    nodes = cluster.ring(6)
+    node, i, faster = finger_with_choice(nodes)
+    target = (node.id + 2**i) % (2**KEY_SPACE)
+    exact = node.find_successor(target)
+    tracker = LatencyTracker()
+    monkeypatch.setattr("node.local.latency_tracker", tracker)
+    monkeypatch.setattr("node.remote.latency_tracker", tracker)
+    network = NetworkEmulator()
+    # Every other candidate is slow, so only probing finds the fast one
+    network.set_link(node.address, None, delay=0.02)
+    network.set_link(node.address, faster.address, delay=0.0)
+    monkeypatch.setattr(RemoteNode, "network", network)
+
+    with node._acting():
+        finger = node._proximate_finger(i, RemoteNode(exact.address, exact.id))
+
+    assert finger == faster
+    assert tracker.rtt(faster.address) is not None
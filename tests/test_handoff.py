@@ -0,0 +1,77 @@
+import threading
+
+from typing import List
+
+from node.local import LocalNode
+from utils import hash, in_interval
+from tests.helpers import Cluster, remote
+
+
+def fill(node: LocalNode, count: int) -> List[str]:
+    keys = [f"key-{i}" for i in range(count)]
+    node.put_batch({key: key for key in keys}, {keys[0]: 600.0})
+    return keys
+
+
+def test_join_takes_over_exactly_its_range(cluster: Cluster) -> None:
+    nodes = cluster.ring(2)
+    keys = fill(nodes[0], 500)
+    joining = cluster.start()
+
+    joining.join(remote(nodes[0]))
+    cluster.stabilize(nodes + [joining])
+
+    successor = next(node for node in nodes if node == joining.next)
+    owned = {key for key in keys if in_interval(hash(key), joining.prev.id, joining.id)}
+    assert set(joining.data) == owned
+    assert not owned & set(successor.data)
+    assert sum(len(node.data) for node in nodes + [joining]) == len(keys)
+    if keys[0] in owned:
+        assert 0 < joining._remaining_ttls([keys[0]])[keys[0]] <= 600.0
+
+
+def test_leave_hands_every_key_to_the_successor(cluster: Cluster) -> None:
+    nodes = cluster.ring(3)
+    keys = fill(nodes[0], 500)
+    leaving = nodes[1]
+    successor = nodes[2]
+    handed = set(leaving.data)
+
+    leaving.exit_network()
+    cluster.stabilize([nodes[0], successor])
+
+    assert not leaving.data
+    assert handed <= set(successor.data)
+    for key in keys:
+        assert remote(nodes[0]).get(key, None)[0] == key
+
+
+def test_reads_never_miss_while_nodes_join_and_leave(cluster: Cluster) -> None:
+    nodes = cluster.ring(3)
+    keys = fill(nodes[0], 2000)
+    misses: List[str] = []
+    done = threading.Event()
+
+    def read(entry: LocalNode) -> None:
+        i = 0
+        while not done.is_set():
+            key = keys[i % len(keys)]
+            if remote(entry).get(key, None)[0] != key:
+                misses.append(key)
+            i += 7
+
+    readers = [threading.Thread(target=read, args=(node,)) for node in nodes[:2]]
+    for reader in readers:
+        reader.start()
+    try:
+        joining = cluster.start()
+        joining.join(remote(nodes[0]))
+        cluster.stabilize(nodes + [joining])
+        nodes[2].exit_network()
+        cluster.stabilize(nodes[:2] + [joining])
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join(10.0)
+
+    assert not misses
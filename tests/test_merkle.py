@@ -0,0 +1,72 @@
+from datastore import DataStore
+from merkle import LEAF_WIDTH, ROOT, range_spans
+from utils import KEY_SPACE, hash, in_interval
+from tests.helpers import Cluster, remote
+
+
+RING = 2**KEY_SPACE
+
+
+def root(store: DataStore) -> int:
+    return store.merkle_digests(0, 0, [ROOT])[0]
+
+
+def test_range_spans_split_intervals_that_wrap() -> None:
+    assert range_spans(10, 20) == [(11, 21)]
+    assert range_spans(RING - 10, 5) == [(RING - 9, RING), (0, 6)]
+    assert range_spans(RING - 1, 5) == [(0, 6)]
+    assert range_spans(7, 7) == [(0, RING)]
+
+
+def test_digests_of_disjoint_stores_combine_by_xor() -> None:
+    both, odd, even = DataStore(), DataStore(), DataStore()
+    for i in range(100):
+        key = f"key-{i}"
+        both[key] = "value"
+        (odd if hash(key) % 2 else even)[key] = "value"
+
+    assert root(both) == root(odd) ^ root(even)
+
+
+def test_digests_follow_every_write() -> None:
+    store = DataStore()
+    store["key"] = "one"
+    first = root(store)
+
+    store["key"] = "two"
+    assert root(store) != first
+    store["key"] = "one"
+    assert root(store) == first
+    store.pop("key")
+    assert root(store) == 0
+
+
+def test_partial_leaves_only_count_keys_in_range() -> None:
+    store = DataStore()
+    store["key"] = "value"
+    key_hash = hash("key")
+
+    assert store.merkle_digests(key_hash, key_hash - 1, [ROOT]) == [0]
+    assert store.merkle_digests(key_hash - 1, key_hash, [ROOT]) != [0]
+
+
+def test_anti_entropy_pulls_a_stray_key_from_a_neighbour(cluster: Cluster) -> None:
+    first, second = cluster.ring(2)
+    for i in range(200):
+        first.put(f"key-{i}", "value")
+    stray = next(
+        f"stray-{i}"
+        for i in range(1000)
+        if in_interval(hash(f"stray-{i}"), second.id, first.id)
+    )
+    # Left on the wrong node, as by a write that raced a join
+    second._data[stray] = "lost"
+
+    ranges = first._differing_ranges(remote(second), second.id, first.id, False)
+    assert len(ranges) == 1
+    start, end = ranges[0]
+    assert in_interval(hash(stray), start, end)
+    assert (end - start) % RING <= LEAF_WIDTH
+
+    assert first.anti_entropy() == 1
+    assert first.data[stray] == "lost" and stray not in second.data
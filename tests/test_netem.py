@@ -0,0 +1,98 @@
+import json
+import socket
+
+from pathlib import Path
+
+import pytest
+
+import bench
+
+from address import Address
+from netem import NetworkEmulator
+from node.local import LocalNode
+from node.remote import RemoteNode
+from tests.helpers import Cluster, free_port, remote
+
+
+A = Address("127.0.0.1", 1)
+B = Address("127.0.0.1", 2)
+
+
+def test_dropped_messages_cost_a_timeout() -> None:
+    network = NetworkEmulator(timeout=0.01, seed=1)
+    network.set_link(drop=1.0)
+
+    with network.acting_as(A), pytest.raises(socket.timeout):
+        network.transmit(B)
+
+
+def test_partition_cuts_both_directions_until_healed() -> None:
+    network = NetworkEmulator(timeout=0.01)
+    network.partition([A], [B])
+
+    with network.acting_as(A), pytest.raises(socket.timeout):
+        network.transmit(B)
+    with network.acting_as(B), pytest.raises(socket.timeout):
+        network.transmit(A)
+
+    network.heal()
+    with network.acting_as(A):
+        network.transmit(B)
+
+
+def test_report_counts_timeouts_per_request_type() -> None:
+    network = NetworkEmulator()
+    network.record("GET", 0.01)
+    network.record("GET", 1.0, timed_out=True)
+    network.record("PUT", 0.02, failed=True)
+
+    report = network.report()
+
+    assert report["GET"]["requests"] == 2 and report["GET"]["timeout_rate"] == 0.5
+    assert report["PUT"]["failures"] == 1 and report["PUT"]["timeouts"] == 0
+
+
+def test_lost_requests_surface_on_remote_nodes(
+    cluster: Cluster, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first, second = cluster.ring(2)
+    network = NetworkEmulator(timeout=0.01)
+    monkeypatch.setattr(RemoteNode, "network", network)
+    network.partition([first.address], [second.address])
+
+    with network.acting_as(first.address), pytest.raises(OSError):
+        remote(second).get_state()
+    assert network.report()
+
+
+def free_ports(count: int) -> int:
+    # The benchmark numbers its nodes' ports up from a single base
+    while True:
+        base = free_port()
+        probes = [
+            socket.socket(socket.AF_INET, socket.SOCK_STREAM) for _ in range(count)
+        ]
+        try:
+            for offset, probe in enumerate(probes):
+                probe.bind(("127.0.0.1", base + offset))
+            return base
+        except OSError:
+            continue
+        finally:
+            for probe in probes:
+                probe.close()
+
+
+def test_bench_survives_churn_on_a_lossy_network(tmp_path: Path) -> None:
+    network, unix_socket = RemoteNode.network, LocalNode.unix_socket
+    output = str(tmp_path / "report.json")
+    args = ["--nodes", "3", "--base-port", str(free_ports(3)), "--keys", "5"]
+    args += ["--drop", "1.0", "--timeout", "0.05", "--churn", "--output", output]
+
+    assert bench.main(args) == 0
+    assert RemoteNode.network is network and LocalNode.unix_socket == unix_socket
+
+    with open(output) as report:
+        churn = json.load(report)["churn"]
+    assert churn["operations"] == 2
+    assert churn["failures"] == len(churn["errors"]) > 0
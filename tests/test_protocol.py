@@ -0,0 +1,111 @@
+import json
+import socket
+import threading
+
+from typing import Any, Iterable, List, Optional, Tuple
+
+import pytest
+
+from node.remote import RemoteNode
+from protocol import (
+    CHUNK_SIZE,
+    FLAG_COMPRESSED,
+    FRAME_HEADER,
+    Connection,
+    chunked,
+    pack_values,
+    unpack_values,
+)
+from tests.helpers import Cluster, remote
+
+
+def raw_frames(sock: socket.socket) -> List[Tuple[int, int]]:
+    # Flags and wire size of every frame until the peer closes its side
+    frames: List[Tuple[int, int]] = []
+    stream = sock.makefile("rb")
+    while True:
+        head = stream.read(FRAME_HEADER.size)
+        if not head:
+            return frames
+        flags, length = FRAME_HEADER.unpack(head)
+        stream.read(length)
+        frames.append((flags, length))
+
+
+def send_then_close(
+    connection: Connection, header: str, body: Optional[Iterable[bytes]]
+) -> threading.Thread:
+    def send() -> None:
+        connection.send(header, body)
+        connection.socket.shutdown(socket.SHUT_WR)
+
+    thread = threading.Thread(target=send)
+    thread.start()
+    return thread
+
+
+def test_header_and_body_round_trip() -> None:
+    ours, theirs = socket.socketpair()
+    data = bytes(range(256)) * 1000
+    sender = send_then_close(Connection(ours), '{"type": "PUT"}', chunked(data))
+
+    header, body = Connection(theirs).recv()
+    assert header == {"type": "PUT"}
+    assert body is not None and b"".join(body) == data
+    sender.join()
+
+
+def test_request_body_is_compressed_before_hearing_from_the_peer() -> None:
+    ours, theirs = socket.socketpair()
+    data = b"a" * (4 * CHUNK_SIZE)
+    sender = send_then_close(Connection(ours, True), "{}", chunked(data))
+
+    frames = raw_frames(theirs)
+    sender.join()
+    chunks = frames[1:-1]
+    assert chunks and all(flags & FLAG_COMPRESSED for flags, _ in chunks)
+    assert sum(length for _, length in chunks) < len(data) // 10
+
+
+def test_response_is_not_compressed_for_a_peer_that_did_not_ask() -> None:
+    ours, theirs = socket.socketpair()
+    Connection(ours).send("{}")
+    server = Connection(theirs, True)
+    server.recv()
+    sender = send_then_close(server, "{}", chunked(b"a" * CHUNK_SIZE))
+
+    frames = raw_frames(ours)
+    sender.join()
+    assert not any(flags & FLAG_COMPRESSED for flags, _ in frames)
+
+
+def test_compressed_body_reads_back_without_compression_enabled() -> None:
+    ours, theirs = socket.socketpair()
+    data = b"chord " * 50_000
+    sender = send_then_close(Connection(ours, True), "{}", chunked(data))
+
+    _, body = Connection(theirs, False).recv()
+    assert body is not None and b"".join(body) == data
+    sender.join()
+
+
+def test_values_pack_into_one_body() -> None:
+    values: Any = {"text": "olá", "blob": b"\x00\xff" * 40_000, "empty": ""}
+
+    entries, body = pack_values(values)
+
+    assert unpack_values(json.loads(json.dumps(entries)), body) == values
+
+
+def test_binary_put_with_compression_on_both_ends(
+    cluster: Cluster, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(RemoteNode, "compression", True)
+    first, second = cluster.ring(2, compression=True)
+    value = b"\x01\x02" * 1_000_000
+
+    remote(first).put("blob", value)
+
+    found = [node for node in (first, second) if "blob" in node.data]
+    assert len(found) == 1 and found[0].data["blob"] == value
+    assert remote(second).get("blob", None)[0] == value
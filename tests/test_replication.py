@@ -0,0 +1,73 @@
+import time
+
+from typing import List
+
+import pytest
+
+from node.local import LocalNode
+from tests.helpers import Cluster, remote, within
+
+
+def replicated_ring(cluster: Cluster, size: int = 3, n: int = 3) -> List[LocalNode]:
+    nodes = [cluster.start() for _ in range(size)]
+    for node in nodes:
+        node.enable_replication(n)
+    nodes[0].join()
+    for node in nodes[1:]:
+        node.join(remote(nodes[0]))
+    cluster.stabilize(nodes)
+    return nodes
+
+
+def test_writes_reach_every_replica(cluster: Cluster) -> None:
+    nodes = replicated_ring(cluster)
+
+    remote(nodes[0]).put("key", "value", None, 3)
+
+    for node in nodes:
+        answer = node.replica_get("key")
+        assert answer is not None and answer[0] == "value"
+
+
+def test_quorum_read_returns_the_newest_version_and_repairs(cluster: Cluster) -> None:
+    nodes = replicated_ring(cluster)
+    remote(nodes[1]).put("key", "old", None, 3)
+    newest = max(node.replica_get("key")[1] for node in nodes) + 1
+    nodes[0].replica_put({"key": "new"}, {}, {"key": newest})
+
+    assert remote(nodes[2]).get("key", None, 3)[0] == "new"
+
+    def repaired() -> bool:
+        return all(node.replica_get("key")[0] == "new" for node in nodes)
+
+    for _ in range(50):
+        if repaired():
+            break
+        time.sleep(0.05)
+    assert repaired()
+
+
+@pytest.mark.parametrize("r, w", [(4, None), (None, 4), (0, None)])
+def test_invalid_quorum_is_reported_to_the_client(
+    cluster: Cluster, r: int, w: int
+) -> None:
+    nodes = replicated_ring(cluster)
+
+    with pytest.raises(ValueError, match="N=3"):
+        if w is None:
+            within(5.0, remote(nodes[0]).get, "key", None, r)
+        else:
+            within(5.0, remote(nodes[0]).put, "key", "value", None, w)
+
+    # The node keeps serving the same client afterwards
+    remote(nodes[0]).put("key", "value")
+    assert remote(nodes[1]).get("key", None)[0] == "value"
+
+
+def test_replication_factor_is_bounded() -> None:
+    node = LocalNode(host="127.0.0.1", port=0)
+
+    with pytest.raises(ValueError):
+        node.enable_replication(10)
+    with pytest.raises(ValueError):
+        node.enable_replication(3, read_quorum=4)
@@ -0,0 +1,84 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from address import Address
+from latency import LatencyTracker
+from node.local import LocalNode
+from node.remote import RemoteNode
+from routing import RoutingHints, routing_hints
+from utils import KEY_SPACE
+from tests.helpers import Cluster, remote
+
+
+def ref(port: int, node_id: int) -> Dict[str, Any]:
+    return {"address": ("127.0.0.1", port), "id": node_id}
+
+
+def test_hints_reach_only_the_node_a_thread_acts_for() -> None:
+    hints = RoutingHints()
+    seen: List[List[Dict[str, Any]]] = []
+
+    hints.offer([ref(1, 1)])
+    with hints.acting_for(seen.append):
+        hints.offer([ref(2, 2)])
+    hints.offer([ref(3, 3)])
+
+    assert seen == [[ref(2, 2)]]
+
+
+@pytest.fixture
+def node(cluster: Cluster, monkeypatch: pytest.MonkeyPatch) -> LocalNode:
+    node = cluster.start()
+    monkeypatch.setattr("node.local.latency_tracker", LatencyTracker())
+    # Fingers of node 0 cover [2**i, 2**(i+1)); their ids are known, so folding
+    # hints never has to ask the made-up nodes below for them
+    monkeypatch.setattr(node, "_id", 0)
+    return node
+
+
+def test_a_hint_closer_to_a_stale_finger_target_replaces_it(node: LocalNode) -> None:
+    i = KEY_SPACE - 2
+    node.finger_table[0] = node
+    node.finger_table[i] = RemoteNode.from_ref(ref(1, 3 * 2**i))
+
+    node._fold_hints([None, ref(2, 2 ** (i + 1) + 1), ref(3, 2**i + 5)])
+
+    assert node.finger_table[i].id == 2**i + 5
+    assert node.finger_table[0] == node
+
+
+def test_hints_only_displace_a_placed_finger_when_faster(node: LocalNode) -> None:
+    i = KEY_SPACE - 1
+    finger = RemoteNode.from_ref(ref(1, 2**i + 100))
+    node.finger_table[i] = finger
+    hint = ref(2, 2**i + 10)
+
+    node._fold_hints([hint])
+    assert node.finger_table[i] is finger
+
+    tracker = LatencyTracker()
+    tracker.record(finger.address, 0.05)
+    tracker.record(Address("127.0.0.1", 2), 0.001)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr("node.local.latency_tracker", tracker)
+        node._fold_hints([hint])
+    assert node.finger_table[i].id == 2**i + 10
+
+
+def test_responses_carry_hints_to_the_requesting_node(
+    cluster: Cluster, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first, second = cluster.ring(2)
+    monkeypatch.setattr(RemoteNode, "hints", True)
+    seen: List[List[List[Dict[str, Any]]]] = [[], []]
+    for node, hints in zip((first, second), seen):
+        monkeypatch.setattr(node, "_fold_hints", hints.append)
+
+    # Answered by the second node itself, which asks no one else
+    with first._acting():
+        remote(second).find_successor(second.id)
+    remote(second).find_successor(second.id)
+
+    assert len(seen[0]) == 1 and not seen[1]
+    assert {ref["id"] for ref in seen[0][0] if ref} == {first.id, second.id}
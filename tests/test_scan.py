@@ -0,0 +1,84 @@
+import threading
+
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from address import Address
+from controller import ChordController
+from datastore import DataStore
+from utils import KEY_SPACE, hash, in_interval
+from tests.helpers import Cluster, free_port, wait_listening
+
+
+@pytest.fixture
+def controllers() -> Iterator[List[ChordController]]:
+    controllers: List[ChordController] = []
+    for _ in range(3):
+        port = free_port()
+        address = Address("127.0.0.1", port)
+        controller = ChordController(port, host="127.0.0.1", advertise=address)
+        threading.Thread(target=controller.start_server, daemon=True).start()
+        wait_listening(address)
+        if controllers:
+            assert controller.join_network(controllers[0].get_address())["success"]
+        else:
+            controller.start_network()
+        controllers.append(controller)
+    Cluster.stabilize([controller._node for controller in controllers])
+    yield controllers
+    for controller in controllers:
+        controller._node.server_stop()
+
+
+def test_scan_pages_never_exceed_the_limit(controllers: List[ChordController]) -> None:
+    values = {f"key-{i}": f"value-{i}" for i in range(60)}
+    for key, value in values.items():
+        assert controllers[0].put(key, value)["success"]
+    # Keys spread over several nodes, so pages span node boundaries
+    assert sum(bool(controller._node.data) for controller in controllers) >= 2
+
+    scanned: Dict[str, Any] = {}
+    cursor = None
+    while True:
+        result = controllers[1].scan(limit=7, cursor=cursor)
+        assert result["success"] and len(result["items"]) <= 7
+        assert not scanned.keys() & result["items"].keys()
+        scanned.update(result["items"])
+        cursor = result["cursor"]
+        if cursor is None:
+            break
+
+    assert scanned == values
+
+
+def test_scan_stays_within_the_hash_interval(
+    controllers: List[ChordController],
+) -> None:
+    keys = [f"key-{i}" for i in range(60)]
+    for key in keys:
+        assert controllers[0].put(key, key)["success"]
+    # An interval that wraps around zero
+    start, end = 3 * 2**KEY_SPACE // 4, 2**KEY_SPACE // 4
+
+    result = controllers[2].scan(start, end, limit=1000)
+
+    assert result["success"] and result["cursor"] is None
+    assert all(in_interval(hash(key), start, end, True) for key in result["items"])
+    inside = {key for key in keys if in_interval(hash(key), start, end - 1)}
+    assert inside <= result["items"].keys()
+
+
+def test_the_hash_index_follows_every_write() -> None:
+    store = DataStore()
+    store.update({f"key-{i}": "value" for i in range(50)})
+    store["key-50"] = "value"
+    store["key-0"] = "other"
+    del store["key-1"]
+    store.pop("key-2")
+    store.pop("missing", None)
+
+    assert store.hash_index() == sorted((hash(key), key) for key in store)
+    assert store.keys_in(0, 0) == [key for _, key in store.hash_index()]
+    store.clear()
+    assert store.hash_index() == []
@@ -0,0 +1,79 @@
+from typing import Dict, List, Tuple
+
+import pytest
+
+from bulk import scan_pages, start_cursor
+from node.local import LocalNode
+from node.sharded import ShardCoordinator
+from utils import KEY_SPACE, Value, hash
+from tests.helpers import Cluster, remote, wait_listening, within
+
+
+@pytest.fixture
+def ring(cluster: Cluster) -> Tuple[ShardCoordinator, LocalNode]:
+    coordinator = cluster.start(ShardCoordinator, workers=2)
+    assert isinstance(coordinator, ShardCoordinator)
+    for address in coordinator._private[1:]:
+        wait_listening(address, timeout=30.0)
+    plain = cluster.start()
+    coordinator.join()
+    plain.join(remote(coordinator))
+    cluster.stabilize([coordinator, plain])
+    return coordinator, plain
+
+
+def test_keys_live_in_the_shard_of_their_hash(
+    ring: Tuple[ShardCoordinator, LocalNode],
+) -> None:
+    coordinator, plain = ring
+    values = {f"key-{i}": f"value-{i}" for i in range(100)}
+    for key, value in values.items():
+        remote(plain).put(key, value)
+
+    for key, value in values.items():
+        assert remote(coordinator).get(key, None)[0] == value
+    assert not coordinator.data
+    sharded, _ = coordinator.snapshot()
+    assert sharded and set(sharded) | set(plain.data) == set(values)
+    for shard, worker in enumerate(coordinator._workers):
+        data, _ = worker.snapshot()
+        assert all(hash(key) % 2 == shard for key in data)
+
+
+def test_scan_merges_the_shards_in_ring_order(
+    ring: Tuple[ShardCoordinator, LocalNode],
+) -> None:
+    coordinator, plain = ring
+    for i in range(60):
+        remote(plain).put(f"key-{i}", str(i))
+
+    scanned: Dict[str, Value] = {}
+    hashes: List[int] = []
+    cursor = start_cursor(coordinator, coordinator.id)
+    for page, _ in scan_pages(coordinator, cursor, page_size=7):
+        assert len(page) <= 7
+        scanned.update(page)
+        hashes += [(hash(key) - coordinator.id) % 2**KEY_SPACE for key in page]
+
+    assert len(scanned) == 60
+    assert hashes == sorted(hashes)
+
+
+def test_workers_follow_a_predecessor_found_by_stabilization(
+    ring: Tuple[ShardCoordinator, LocalNode], cluster: Cluster
+) -> None:
+    coordinator, plain = ring
+    joining = cluster.start()
+    gap = (coordinator.id - plain.id) % 2**KEY_SPACE
+    joining._id = (plain.id + gap // 2) % 2**KEY_SPACE
+    # As in Chord's original join, the successor only learns of the new node
+    # when it notifies
+    joining.prev = remote(plain)
+    joining.next = remote(coordinator)
+    within(10.0, joining._stabilize)
+    cluster.stabilize([plain, joining, coordinator])
+
+    assert coordinator.prev == joining
+    for worker in coordinator._workers:
+        assert worker.find_successor(joining.id) == joining
+        assert worker.find_successor(coordinator.id) != joining
@@ -0,0 +1,45 @@
+from utils import KEY_SPACE
+from tests.helpers import Cluster, remote, within
+
+
+def test_two_nodes_stabilize_into_a_ring(cluster: Cluster) -> None:
+    a, b = cluster.start(), cluster.start()
+    a.join()
+    b.join(remote(a))
+    # A node that lost its predecessor must take the next one it is told of
+    a._prev = None
+
+    cluster.stabilize([a, b], rounds=3)
+
+    assert a.next == b and b.next == a
+    assert a.prev == b and b.prev == a
+
+
+def test_notify_moves_prev_to_a_closer_node(cluster: Cluster) -> None:
+    first, middle, last = cluster.ring(3)
+    last._prev = remote(first)
+
+    within(5.0, middle._stabilize)
+
+    assert last.prev == middle
+    assert within(5.0, last.get_state)["prev"] == middle
+
+
+def test_notify_keeps_a_closer_prev(cluster: Cluster) -> None:
+    first, middle, last = cluster.ring(3)
+
+    within(5.0, last.notify, remote(first))
+
+    assert last.prev == middle
+
+
+def test_stabilize_picks_up_a_new_id_of_the_successor(cluster: Cluster) -> None:
+    first, second = cluster.ring(2)
+    successor = first.next
+    assert successor.id == second.id
+    # As when the node rejoins at the same address with another id
+    second._id = (second.id + 1) % 2**KEY_SPACE
+
+    within(5.0, first._stabilize)
+
+    assert successor.id == second.id
@@ -0,0 +1,60 @@
+import io
+import json
+
+from typing import List
+
+import pytest
+
+from address import Address
+from node.local import LocalNode
+from node.remote import RemoteNode
+from topology import ring_snapshot, write_snapshot
+from utils import KEY_SPACE
+from tests.helpers import Cluster, free_port, remote
+
+
+@pytest.fixture
+def ring(cluster: Cluster) -> List[LocalNode]:
+    nodes = cluster.ring(4)
+    # Fingers set at join time miss the nodes that joined later
+    for node in nodes:
+        node._update_finger_table()
+    for i in range(100):
+        nodes[0].put(f"key-{i}", "value")
+    return nodes
+
+
+def test_snapshot_of_a_settled_ring(ring: List[LocalNode]) -> None:
+    snapshot = ring_snapshot(remote(ring[2]), workers=4)
+
+    summary = snapshot["summary"]
+    assert summary["nodes"] == 4 and summary["unreachable"] == []
+    assert summary["keys"] == 100 and summary["inconsistent"] == 0
+    assert [node["id"] for node in snapshot["nodes"]] == [node.id for node in ring]
+    assert sum(node["width"] for node in snapshot["nodes"]) == 2**KEY_SPACE
+    assert summary["max_keys_ratio"] >= 1.0 and summary["max_width_ratio"] >= 1.0
+
+
+def test_snapshot_flags_stale_links_and_dead_fingers(ring: List[LocalNode]) -> None:
+    ring[1]._prev = remote(ring[3])
+    dead_id = (ring[0].id + 1) % 2**KEY_SPACE
+    dead = RemoteNode(Address("127.0.0.1", free_port()), dead_id)
+    ring[0].finger_table[KEY_SPACE - 1] = dead
+
+    snapshot = ring_snapshot(remote(ring[0]))
+
+    issues = {node["id"]: node["issues"] for node in snapshot["nodes"]}
+    assert issues[ring[1].id] == ["prev"]
+    assert "fingers" in issues[ring[0].id]
+    assert snapshot["summary"]["unreachable"] == [str(dead.address)]
+    assert snapshot["summary"]["nodes"] == 4
+
+
+def test_snapshot_writes_one_line_per_node(ring: List[LocalNode]) -> None:
+    snapshot = ring_snapshot(remote(ring[0]))
+    file = io.StringIO()
+
+    assert write_snapshot(file, snapshot) == 4
+
+    lines = [json.loads(line) for line in file.getvalue().splitlines()]
+    assert lines[0] == snapshot["summary"] and lines[1:] == snapshot["nodes"]
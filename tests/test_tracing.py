@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from tracing import Profiler, Tracer, format_trace, tracer
+from utils import hash
+from tests.helpers import Cluster, remote
+
+
+def test_tracer_samples_at_its_rate() -> None:
+    assert Tracer(0.0).sampled() is None
+    assert Tracer(1.0).sampled() == []
+
+
+def test_traces_format_one_hop_after_another() -> None:
+    trace = [
+        {"node": "a:1", "action": "forward", "elapsed_ms": 2.0, "queue_ms": 0.5},
+        {"node": "b:2", "action": "found", "elapsed_ms": 1.0},
+    ]
+
+    assert format_trace(trace) == (
+        "a:1 [forward, 2.00ms, queued 0.50ms] -> b:2 [found, 1.00ms, queued 0.00ms]"
+    )
+
+
+def test_sampled_lookups_record_every_hop(
+    cluster: Cluster, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    nodes = cluster.ring(3)
+    entry = nodes[0]
+    key = next(
+        key
+        for key in (f"key-{i}" for i in range(1000))
+        if entry.find_successor(hash(key)) != entry
+    )
+    entry.put(key, "value")
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+
+    value, _, trace = entry.get(key)
+
+    assert value == "value" and trace is not None
+    assert [hop["hop"] for hop in trace] == list(range(len(trace)))
+    assert trace[0]["node"] == str(entry.address) and trace[0]["action"] == "forward"
+    owner = entry.find_successor(hash(key))
+    assert trace[-1]["node"] == str(owner.address) and trace[-1]["action"] == "found"
+
+
+def test_sampling_profiler_collects_stacks() -> None:
+    profiler = Profiler()
+    profiler.start("sample", interval=0.001)
+    with pytest.raises(RuntimeError):
+        profiler.start("cprofile")
+    time.sleep(0.05)
+
+    report = profiler.stop()
+
+    assert report["mode"] == "sample" and report["samples"] > 0
+    assert all(count > 0 for _, count in report["stacks"])
+    with pytest.raises(RuntimeError):
+        profiler.stop()
+
+
+def test_nodes_profile_on_request(cluster: Cluster) -> None:
+    node = remote(cluster.start())
+
+    assert node.profile("start", "cprofile") == {"running": True, "mode": "cprofile"}
+    assert node.profile("status")["running"]
+    report = node.profile("stop")
+
+    assert not report["running"] and "cumulative" in report["report"]
+    with pytest.raises(RuntimeError):
+        node.profile("stop")
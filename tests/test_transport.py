@@ -0,0 +1,98 @@
+import os
+import socket
+import stat
+
+from pathlib import Path
+
+import pytest
+
+from address import Address
+from node.local import LocalNode
+from node.remote import RemoteNode
+from transport import connect, local_path, socket_dir, unix_path
+from tests.helpers import Cluster, free_port, remote
+
+
+@pytest.fixture(autouse=True)
+def unix_sockets(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(LocalNode, "unix_socket", True)
+    monkeypatch.setattr(RemoteNode, "unix_socket", True)
+
+
+def test_nodes_serve_a_unix_socket_while_running(cluster: Cluster) -> None:
+    node = cluster.start()
+    path = unix_path(node.address)
+    assert local_path(node.address) == path
+
+    with connect(node.address) as sock:
+        assert sock.family == socket.AF_UNIX
+    with connect(node.address, unix=False) as sock:
+        assert sock.family == socket.AF_INET
+
+    node.server_stop()
+    assert not os.path.exists(path)
+
+
+def test_peers_talk_over_the_unix_socket(cluster: Cluster) -> None:
+    first, second = cluster.ring(2)
+
+    remote(first).put("key", b"\x00" * 100_000)
+
+    assert remote(second).get("key", None)[0] == b"\x00" * 100_000
+
+
+def test_a_stale_socket_file_falls_back_to_tcp() -> None:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+        server.bind(("127.0.0.1", free_port()))
+        server.listen()
+        address = Address("127.0.0.1", server.getsockname()[1])
+        path = unix_path(address)
+        assert path is not None
+        # Bound and closed without being removed, as by a node that crashed
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(path)
+        try:
+            with connect(address, timeout=5.0) as sock:
+                assert sock.family == socket.AF_INET
+        finally:
+            os.unlink(path)
+
+
+def test_nodes_leave_files_that_are_not_their_sockets_alone() -> None:
+    address = Address("127.0.0.1", free_port())
+    path = unix_path(address)
+    assert path is not None
+    open(path, "w").close()
+    try:
+        node = LocalNode("127.0.0.1", address.port, advertise=address)
+        node._serve_unix(address)
+        node.server_stop()
+
+        assert os.path.isfile(path) and local_path(address) is None
+    finally:
+        os.unlink(path)
+
+
+def test_sockets_live_in_a_private_directory(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    directory = socket_dir()
+    assert directory is not None
+    info = os.stat(directory)
+    assert info.st_uid == os.getuid() and stat.S_IMODE(info.st_mode) == 0o700
+
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+    monkeypatch.setenv("CHORDPY_SOCKET_DIR", str(shared))
+    socket_dir.cache_clear()
+    try:
+        assert socket_dir() is None
+        assert local_path(Address("127.0.0.1", 8008)) is None
+    finally:
+        monkeypatch.undo()
+        socket_dir.cache_clear()
+
+
+def test_remote_hosts_never_use_a_unix_socket() -> None:
+    assert local_path(Address("192.0.2.1", 8008)) is None